@@ -1,5 +1,5 @@
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 # ============================================================================
 # Core Settings
 # ============================================================================
@@ -18,13 +18,18 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Ahead of SQL instrumentation, so its periodic read of the admin targets is not counted as the request's.
+    'main_app.profiler.ProfilerMiddleware',
+    'main_app.instrumentation.SQLInstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'main_app.routers.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -41,6 +46,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'main_app.context_processors.unread_notifications',
+                'main_app.context_processors.live_progress',
             ],
         },
     },
@@ -59,6 +65,40 @@ DATABASES = {
         'PORT': config('DATABASE_PORT', default='5432')
     }
 }
+# Read replicas share the primary's credentials; each host becomes a 'replicaN' alias.
+DATABASE_REPLICAS = []
+for number, host in enumerate(config('DATABASE_REPLICA_HOSTS', default='', cast=Csv()), start=1):
+    alias = f'replica{number}'
+    DATABASES[alias] = {**DATABASES['default'], 'HOST': host, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['main_app.routers.ReplicaRouter']
+# After writing, a visitor reads from the primary for this long so they see their own changes.
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=15, cast=int)
+# ============================================================================
+# Cache
+# ============================================================================
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='hayyakom'),
+    }
+}
+# ============================================================================
+# Logging
+# ============================================================================
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'main_app': {
+            'handlers': ['console'],
+            'level': config('APP_LOG_LEVEL', default='INFO'),
+        },
+    },
+}
 # ============================================================================
 # Password Validation
 # ============================================================================
@@ -85,4 +125,85 @@ LOGIN_REDIRECT_URL = '/fundings/'
 LOGOUT_REDIRECT_URL = '/'
 # --- Stripe Configuration ---
 STRIPE_PUBLISHABLE_KEY = config('STRIPE_PUBLISHABLE_KEY')
-STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY')
\ No newline at end of file
+STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY')
+STRIPE_WEBHOOK_SECRET = config('STRIPE_WEBHOOK_SECRET', default='')
+# 'stripe' talks to Stripe; 'fake' records events locally for `replay_stripe_events`.
+STRIPE_BACKEND = config('STRIPE_BACKEND', default='stripe')
+FAKE_STRIPE_EVENTS_PATH = config('FAKE_STRIPE_EVENTS_PATH', default=str(BASE_DIR / 'fake_stripe_events.jsonl'))
+FAKE_STRIPE_LATENCY_MS = config('FAKE_STRIPE_LATENCY_MS', default=0, cast=int)
+# Used by the async client; a slow Stripe call fails the checkout instead of piling up requests.
+STRIPE_TIMEOUT_SECONDS = config('STRIPE_TIMEOUT_SECONDS', default=10, cast=float)
+STRIPE_MAX_NETWORK_RETRIES = config('STRIPE_MAX_NETWORK_RETRIES', default=1, cast=int)
+# Capacity is held for the life of the checkout session. Stripe's minimum is 30 minutes, so
+# values below 31 are raised to 31 (see payments.reservation_ttl).
+RESERVATION_TTL_MINUTES = config('RESERVATION_TTL_MINUTES', default=31, cast=int)
+# --- Notification Fan-out ---
+NOTIFICATION_BATCH_SIZE = config('NOTIFICATION_BATCH_SIZE', default=500, cast=int)
+NOTIFICATION_DEFER_THRESHOLD = config('NOTIFICATION_DEFER_THRESHOLD', default=1000, cast=int)
+NOTIFICATION_UNREAD_CACHE_TIMEOUT = config('NOTIFICATION_UNREAD_CACHE_TIMEOUT', default=300, cast=int)
+# Read notifications older than this are moved out of the live table by `archive_notifications`.
+NOTIFICATION_ARCHIVE_AFTER_DAYS = config('NOTIFICATION_ARCHIVE_AFTER_DAYS', default=180, cast=int)
+NOTIFICATION_PARTITION_MONTHS_AHEAD = config('NOTIFICATION_PARTITION_MONTHS_AHEAD', default=3, cast=int)
+# --- Weekly Pulse Interest ---
+# DatabaseInterestBuffer is flushed by `flush_interest`; MemoryInterestBuffer flushes itself in-process.
+INTEREST_BUFFER_BACKEND = config('INTEREST_BUFFER_BACKEND', default='main_app.interest.DatabaseInterestBuffer')
+# `flush_interest` leaves clicks this young for its next run so in-flight transactions are not skipped.
+INTEREST_FLUSH_LAG_SECONDS = config('INTEREST_FLUSH_LAG_SECONDS', default=5, cast=int)
+# --- Campaign Lifecycle ---
+# `run_lifecycle` sleeps until the next due transition, but never longer than this.
+LIFECYCLE_MAX_SLEEP_SECONDS = config('LIFECYCLE_MAX_SLEEP_SECONDS', default=60, cast=int)
+# --- Recommendations ---
+# Built offline by `build_recommendations`; the pages only read the stored neighbours.
+RECOMMENDATIONS_TOP_K = config('RECOMMENDATIONS_TOP_K', default=12, cast=int)
+RECOMMENDATIONS_SHOWN = config('RECOMMENDATIONS_SHOWN', default=4, cast=int)
+RECOMMENDATIONS_RECENT_INVESTMENTS = config('RECOMMENDATIONS_RECENT_INVESTMENTS', default=20, cast=int)
+RECOMMENDATION_INTEREST_WEIGHT = config('RECOMMENDATION_INTEREST_WEIGHT', default=0.5, cast=float)
+RECOMMENDATION_CATEGORY_BOOST = config('RECOMMENDATION_CATEGORY_BOOST', default=0.1, cast=float)
+# --- JSON API ---
+API_PAGE_SIZE = config('API_PAGE_SIZE', default=20, cast=int)
+API_MAX_PAGE_SIZE = config('API_MAX_PAGE_SIZE', default=100, cast=int)
+# Public endpoints may be reused this long by clients and proxies before revalidating with the ETag.
+API_CACHE_MAX_AGE = config('API_CACHE_MAX_AGE', default=30, cast=int)
+# --- Investment Exports ---
+# Rows fetched per cursor round trip, and rows per chunk written to the client.
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+EXPORT_STREAM_BATCH_ROWS = config('EXPORT_STREAM_BATCH_ROWS', default=200, cast=int)
+FUNDING_DETAIL_INVESTOR_ROWS = config('FUNDING_DETAIL_INVESTOR_ROWS', default=50, cast=int)
+# --- Live Funding Progress ---
+# MemoryBroker serves a single ASGI process; use main_app.live.PostgresBroker when several workers share the database.
+LIVE_PROGRESS_BACKEND = config('LIVE_PROGRESS_BACKEND', default='main_app.live.MemoryBroker')
+# A comment is sent on idle streams this often so proxies keep the connection open.
+LIVE_HEARTBEAT_SECONDS = config('LIVE_HEARTBEAT_SECONDS', default=25, cast=int)
+LIVE_MAX_SUBSCRIPTIONS = config('LIVE_MAX_SUBSCRIPTIONS', default=50, cast=int)
+# --- Analytics Rollups ---
+# `rollup_stats` leaves rows this young for its next run so in-flight transactions are not skipped.
+STATS_ROLLUP_LAG_SECONDS = config('STATS_ROLLUP_LAG_SECONDS', default=60, cast=int)
+STATS_DASHBOARD_DAYS = config('STATS_DASHBOARD_DAYS', default=30, cast=int)
+# --- SQL Instrumentation ---
+# Fraction of requests that record their queries, get a Server-Timing header and are stored for the admin report.
+SQL_INSTRUMENTATION_SAMPLE_RATE = config('SQL_INSTRUMENTATION_SAMPLE_RATE', default=0.01, cast=float)
+SQL_INSTRUMENTATION_SLOWEST = config('SQL_INSTRUMENTATION_SLOWEST', default=5, cast=int)
+# The same query shape repeated this many times in one request is reported as an N+1 suspect.
+SQL_INSTRUMENTATION_N_PLUS_ONE_THRESHOLD = config('SQL_INSTRUMENTATION_N_PLUS_ONE_THRESHOLD', default=5, cast=int)
+SQL_INSTRUMENTATION_REPORT_DAYS = config('SQL_INSTRUMENTATION_REPORT_DAYS', default=7, cast=int)
+# Older samples are deleted by `archive_notifications`.
+SQL_INSTRUMENTATION_RETENTION_DAYS = config('SQL_INSTRUMENTATION_RETENTION_DAYS', default=30, cast=int)
+# --- Request Profiler ---
+# Requests are profiled when they carry a signed PROFILER_HEADER (`profiler_token`), when an
+# admin ProfilingTarget covers their view, or at this rate (off unless opted in).
+PROFILER_SAMPLE_RATE = config('PROFILER_SAMPLE_RATE', default=0, cast=float)
+PROFILER_HEADER = config('PROFILER_HEADER', default='X-Profile')
+PROFILER_TOKEN_MAX_AGE = config('PROFILER_TOKEN_MAX_AGE', default=24 * 60 * 60, cast=int)
+PROFILER_INTERVAL_MS = config('PROFILER_INTERVAL_MS', default=5, cast=float)
+PROFILER_TARGET_POLL_SECONDS = config('PROFILER_TARGET_POLL_SECONDS', default=10, cast=int)
+PROFILER_REPORT_DAYS = config('PROFILER_REPORT_DAYS', default=7, cast=int)
+# Older profiles are deleted by `archive_notifications`.
+PROFILER_RETENTION_DAYS = config('PROFILER_RETENTION_DAYS', default=30, cast=int)
+# --- Campaign Detail Caching ---
+# Fragments are keyed by the campaign's version stamp; the timeout only bounds staleness of investor names.
+FUNDING_FRAGMENT_CACHE_TIMEOUT = config('FUNDING_FRAGMENT_CACHE_TIMEOUT', default=60 * 60, cast=int)
+# Version stamps are recreated on a miss, so they only need to outlive the fragments cached under them.
+CAMPAIGN_STAMP_TIMEOUT = config('CAMPAIGN_STAMP_TIMEOUT', default=24 * 60 * 60, cast=int)
+# --- Admin ---
+# Above this many (estimated) rows the admin shows the planner's estimate instead of running COUNT(*).
+ESTIMATED_COUNT_THRESHOLD = config('ESTIMATED_COUNT_THRESHOLD', default=10000, cast=int)
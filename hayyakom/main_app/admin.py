@@ -1,35 +1,79 @@
-from datetime import timedelta, timezone
+from datetime import timedelta
 from django.contrib import admin
-from .models import Profile, Company, Funding, Investment, Notification, Milestone
+from django.db import transaction
+from django.conf import settings
+from django.http import HttpResponse
+from django.urls import path
+from django.utils import timezone
+from django.utils.html import format_html
+from .models import (
+    Profile, Company, Funding, Investment, Notification, Milestone, ProfileSample, ProfilingTarget,
+    RequestSample, start_of_day,
+)
+from .campaign_cache import bump_campaigns_on_commit
+from .exports import stream_investments
+from .listings import refresh_listings_on_commit
+from .instrumentation import worst_views
+from .notifications import create_notifications
+from .pagination import EstimatedCountPaginator
+from .profiler import collapsed_text, merge_stacks, profiled_views
+from .pulse import bump_pulse_version
+
+class LargeTableAdmin(admin.ModelAdmin):
+    # For tables that grow without bound: no full-table COUNT(*) next to the search
+    # box, and estimated totals for the page links.
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'role', 'phone_number')
     list_filter = ('role',)
-    search_fields = ('user__username', 'phone_number')
+    list_select_related = ('user',)
+    search_fields = ('=user__username', 'phone_number')
 
 @admin.register(Company)
 class CompanyAdmin(admin.ModelAdmin):
     list_display = ('company_name', 'owner', 'cr_number')
+    list_select_related = ('owner',)
     search_fields = ('company_name', 'owner__username')
 
 @admin.register(Funding)
-class FundingAdmin(admin.ModelAdmin):
+class FundingAdmin(LargeTableAdmin):
     list_filter = ('is_approved', 'status', 'category')
     list_display = ('campaign_name', 'company', 'status', 'is_approved', 'goal', 'reveal_date')
+    list_select_related = ('company',)
     search_fields = ('campaign_name', 'company__company_name')
+    readonly_fields = ('raised_amount', 'investor_count', 'reserved_amount', 'interest_count')
     actions = ['approve_campaigns', 'add_to_next_pulse']
 
+    def save_model(self, request, obj, form, change):
+        # Only the edited columns; the counters move concurrently through F() updates.
+        changed = [name for name in form.changed_data if not obj._meta.get_field(name).many_to_many]
+        if not change:
+            super().save_model(request, obj, form, change)
+        elif changed:
+            obj.save(update_fields=changed)
+
     def approve_campaigns(self, request, queryset):
-        for campaign in queryset:
-            campaign.is_approved = True
-            campaign.status = 'Pending Pulse'
-            campaign.save()
-            Notification.objects.create(
-                user=campaign.company.owner,
-                message=f"Congratulations! Your campaign '{campaign.campaign_name}' has been approved.",
-                related_funding=campaign
+        # One read, one UPDATE and one bulk INSERT, however many campaigns are selected.
+        campaigns = list(queryset.values_list('id', 'campaign_name', 'company__owner_id'))
+        campaign_ids = [campaign_id for campaign_id, _, _ in campaigns]
+        updated_count = Funding.objects.filter(id__in=campaign_ids).update(
+            is_approved=True, status='Pending Pulse', next_transition_at=None
+        )
+        bump_campaigns_on_commit(campaign_ids)
+        refresh_listings_on_commit(campaign_ids)
+        create_notifications([
+            Notification(
+                user_id=owner_id,
+                message=f"Congratulations! Your campaign '{campaign_name}' has been approved.",
+                related_funding_id=campaign_id
             )
+            for campaign_id, campaign_name, owner_id in campaigns
+        ])
+
+        self.message_user(request, f'{updated_count} campaigns have been approved.')
     
     approve_campaigns.short_description = "Approve selected campaigns"
 
@@ -38,29 +82,130 @@ class FundingAdmin(admin.ModelAdmin):
         days_until_sunday = (6 - today.weekday()) % 7
         next_sunday = today + timedelta(days=days_until_sunday)
 
-        updated_count = queryset.update(
-            status='In Pulse',
-            reveal_date=next_sunday
+        campaigns = list(queryset.values_list('id', 'campaign_name', 'company__owner_id'))
+        campaign_ids = [campaign_id for campaign_id, _, _ in campaigns]
+        # `run_lifecycle` moves them to 'In Pulse' when the reveal Sunday starts.
+        updated_count = Funding.objects.filter(id__in=campaign_ids).update(
+            status='Pending Pulse',
+            reveal_date=next_sunday,
+            next_transition_at=start_of_day(next_sunday),
         )
+        bump_campaigns_on_commit(campaign_ids)
+        # Queryset updates skip the Funding signals that keep the pulse snapshot current.
+        transaction.on_commit(bump_pulse_version)
+        refresh_listings_on_commit(campaign_ids)
+        create_notifications([
+            Notification(
+                user_id=owner_id,
+                message=f"Your campaign '{campaign_name}' will be revealed in the Weekly Pulse on {next_sunday.strftime('%b %d, %Y')}.",
+                related_funding_id=campaign_id
+            )
+            for campaign_id, campaign_name, owner_id in campaigns
+        ])
         
         self.message_user(request, f'{updated_count} campaigns have been added to the Weekly Pulse for {next_sunday.strftime("%b %d, %Y")}.')
 
     add_to_next_pulse.short_description = "Add selected campaigns to next Pulse"    
 
 @admin.register(Investment)
-class InvestmentAdmin(admin.ModelAdmin):
+class InvestmentAdmin(LargeTableAdmin):
     list_display = ('funding', 'investor', 'amount', 'status')
     list_filter = ('status',)
-    search_fields = ('funding__campaign_name', 'investor__username')
+    list_select_related = ('funding', 'investor')
+    search_fields = ('funding__campaign_name', '=investor__username')
+    actions = ['export_csv', 'export_json']
+
+    def export_csv(self, request, queryset):
+        return stream_investments(request, queryset, 'investments', 'csv')
+    export_csv.short_description = "Export selected investments as CSV"
+
+    def export_json(self, request, queryset):
+        return stream_investments(request, queryset, 'investments', 'json')
+    export_json.short_description = "Export selected investments as JSON"
 
 @admin.register(Notification)
-class NotificationAdmin(admin.ModelAdmin):
+class NotificationAdmin(LargeTableAdmin):
     list_display = ('user', 'message', 'is_read', 'created_at')
     list_filter = ('is_read',)
-    search_fields = ('user__username', 'message')
+    list_select_related = ('user',)
+    # Exact usernames hit auth_user's unique index; message search uses notification_message_trgm_gin.
+    search_fields = ('=user__username', 'message')
 
 @admin.register(Milestone)
 class MilestoneAdmin(admin.ModelAdmin):
     list_display = ('title', 'funding', 'target_date', 'is_complete')
     list_filter = ('is_complete',)
-    search_fields = ('title', 'funding__campaign_name')
\ No newline at end of file
+    list_select_related = ('funding',)
+    search_fields = ('title', 'funding__campaign_name')
+
+@admin.register(RequestSample)
+class RequestSampleAdmin(LargeTableAdmin):
+    change_list_template = 'admin/main_app/requestsample/change_list.html'
+    list_display = ('view_name', 'method', 'status_code', 'query_count', 'db_time_ms', 'total_time_ms', 'created_at')
+    list_filter = ('method', 'status_code')
+    search_fields = ('view_name', 'path')
+    date_hierarchy = 'created_at'
+
+    def has_add_permission(self, request):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = {
+            **(extra_context or {}),
+            'worst_views': worst_views(settings.SQL_INSTRUMENTATION_REPORT_DAYS),
+            'report_days': settings.SQL_INSTRUMENTATION_REPORT_DAYS,
+        }
+        return super().changelist_view(request, extra_context=extra_context)
+
+@admin.register(ProfileSample)
+class ProfileSampleAdmin(LargeTableAdmin):
+    change_list_template = 'admin/main_app/profilesample/change_list.html'
+    list_display = ('view_name', 'method', 'status_code', 'trigger', 'duration_ms', 'sample_count', 'created_at')
+    list_filter = ('trigger', 'method', 'status_code')
+    search_fields = ('view_name', 'path')
+    date_hierarchy = 'created_at'
+    exclude = ('stacks',)
+    readonly_fields = ('collapsed_stacks',)
+    actions = ['download_collapsed']
+
+    def has_add_permission(self, request):
+        return False
+
+    def get_urls(self):
+        return [
+            path('collapsed/', self.admin_site.admin_view(self.view_collapsed), name='main_app_profilesample_collapsed'),
+        ] + super().get_urls()
+
+    def collapsed_stacks(self, obj):
+        return format_html('<pre>{}</pre>', collapsed_text(obj.stacks))
+    collapsed_stacks.short_description = "Collapsed stacks"
+
+    def collapsed_response(self, samples, filename):
+        response = HttpResponse(collapsed_text(merge_stacks(samples)), content_type='text/plain')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.folded"'
+        return response
+
+    def view_collapsed(self, request):
+        # Every profile of one view over the report window, merged into a single flame graph.
+        view_name = request.GET.get('view', '')
+        since = timezone.now() - timedelta(days=settings.PROFILER_REPORT_DAYS)
+        samples = ProfileSample.objects.filter(view_name=view_name, created_at__gte=since)
+        return self.collapsed_response(samples, view_name.replace(':', '-') or 'profiles')
+
+    def download_collapsed(self, request, queryset):
+        return self.collapsed_response(queryset, 'profiles')
+    download_collapsed.short_description = "Download merged collapsed stacks"
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = {
+            **(extra_context or {}),
+            'profiled_views': profiled_views(settings.PROFILER_REPORT_DAYS),
+            'report_days': settings.PROFILER_REPORT_DAYS,
+        }
+        return super().changelist_view(request, extra_context=extra_context)
+
+@admin.register(ProfilingTarget)
+class ProfilingTargetAdmin(admin.ModelAdmin):
+    list_display = ('view_name', 'until')
+    list_editable = ('until',)
+    list_display_links = ('view_name',)
@@ -0,0 +1,240 @@
+import hashlib
+import json
+from functools import wraps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Case, F, FloatField, Value, When
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+from .campaign_cache import campaign_stamp
+from .listings import listings_version
+from .models import ActiveCampaignListing, Funding, Investment, Milestone
+from .pagination import paginate_keyset
+from .pulse import current_sunday, get_pulse_snapshot, pulse_version
+from .routers import replica_reads
+from .search import search_fundings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# ============================================================================
+# JSON API (v1)
+# ============================================================================
+# Read-only endpoints for the mobile and partner clients. Rows come from
+# values() queries, never model instances, and ?fields= narrows both the SELECT
+# and the payload. Public endpoints get an ETag from cache-only version stamps,
+# so a revalidation is answered with a 304 before any query runs; the private
+# portfolio is hashed after rendering instead.
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+
+
+def json_response(data, status=200):
+    return HttpResponse(dumps(data), status=status, content_type='application/json')
+
+
+def api_endpoint(etag_func=None, private=False):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                response = json_response({'error': 'Method not allowed.'}, status=405)
+                response['Allow'] = 'GET, HEAD'
+                return response
+            if private and not request.user.is_authenticated:
+                return json_response({'error': 'Authentication required.'}, status=401)
+
+            etag = quote_etag(etag_func(request, *args, **kwargs)) if etag_func else None
+            response = get_conditional_response(request, etag=etag) if etag else None
+            if response is None:
+                try:
+                    response = json_response(view(request, *args, **kwargs))
+                except ApiError as error:
+                    return json_response({'error': error.message}, status=error.status)
+                if etag is None:
+                    etag = quote_etag(hashlib.md5(response.content).hexdigest())
+                response['ETag'] = etag
+                response = get_conditional_response(request, etag=etag, response=response) or response
+
+            if private:
+                patch_cache_control(response, private=True, max_age=0, must_revalidate=True)
+                patch_vary_headers(response, ['Cookie'])
+            else:
+                patch_cache_control(response, public=True, max_age=settings.API_CACHE_MAX_AGE)
+            return response
+        return wrapper
+    return decorator
+
+
+def _fields_key(request):
+    # Part of every ETag: the same resource with another ?fields= is another body.
+    return hashlib.md5(request.GET.urlencode().encode()).hexdigest()[:12]
+
+
+def selected_fields(request, available, default):
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(default)
+    fields = list(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise ApiError(400, f"Unknown fields: {', '.join(unknown)}.")
+    return fields
+
+
+def page_size(request):
+    try:
+        size = int(request.GET.get('limit', settings.API_PAGE_SIZE))
+    except ValueError:
+        raise ApiError(400, 'limit must be an integer.')
+    return max(1, min(size, settings.API_MAX_PAGE_SIZE))
+
+
+def values_for(queryset, fields, columns, extra=()):
+    # columns maps API names to model paths or expressions; names that match a
+    # column are selected as-is, the rest are aliased.
+    plain = [name for name in fields if columns[name] == name]
+    aliased = {name: columns[name] for name in fields if columns[name] != name}
+    aliased = {name: F(path) if isinstance(path, str) else path for name, path in aliased.items()}
+    return queryset.values(*plain, *[key for key in extra if key not in plain], **aliased)
+
+
+def keyset_results(request, queryset, fields):
+    page = paginate_keyset(queryset, request, per_page=page_size(request))
+    return {
+        'results': [{name: row[name] for name in fields} for row in page],
+        'next': f'{request.path}?{page.next_query}' if page.has_next else None,
+        'previous': f'{request.path}?{page.previous_query}' if page.has_previous else None,
+    }
+
+# ----------------------------------------------------------------------------
+# Campaigns
+# ----------------------------------------------------------------------------
+
+LISTING_COLUMNS = {
+    'id': 'funding_id',
+    'campaign_name': 'campaign_name',
+    'company_name': 'company_name',
+    'summary': 'summary',
+    'goal': 'goal',
+    'raised_amount': 'raised_amount',
+    'progress_percentage': 'progress_percentage',
+    'category': 'category',
+    'end_date': 'end_date',
+}
+
+DETAIL_COLUMNS = {
+    'id': 'id',
+    'campaign_name': 'campaign_name',
+    'description': 'description',
+    'company_id': 'company_id',
+    'company_name': 'company__company_name',
+    'goal': 'goal',
+    'raised_amount': 'raised_amount',
+    'investor_count': 'investor_count',
+    'interest_count': 'interest_count',
+    'progress_percentage': Case(
+        When(goal__gt=0, then=F('raised_amount') * 100.0 / F('goal')),
+        default=Value(0.0),
+        output_field=FloatField(),
+    ),
+    'category': 'category',
+    'status': 'status',
+    'end_date': 'end_date',
+    'reveal_date': 'reveal_date',
+}
+# Read with a second query, and only when asked for.
+DETAIL_RELATED = ('milestones',)
+
+PULSE_FIELDS = (
+    'id', 'campaign_name', 'summary', 'company_id', 'company_name', 'interest_count', 'interest_percentage',
+)
+
+
+def campaign_list_etag(request):
+    return f'campaigns-{listings_version()}-{_fields_key(request)}'
+
+
+@replica_reads
+@api_endpoint(etag_func=campaign_list_etag)
+def campaign_list(request):
+    fields = selected_fields(request, LISTING_COLUMNS, LISTING_COLUMNS)
+    listings = ActiveCampaignListing.objects.all()
+    if request.GET.get('category'):
+        listings = listings.filter(category=request.GET['category'])
+    if request.GET.get('query'):
+        listings = search_fundings(listings, request.GET['query'], funding_path='funding__')
+    else:
+        listings = listings.order_by('-end_date', '-pk')
+    sort_keys = [key.lstrip('-') for key in listings.query.order_by]
+    return keyset_results(request, values_for(listings, fields, LISTING_COLUMNS, extra=sort_keys), fields)
+
+
+def campaign_detail_etag(request, pk):
+    return f'campaign-{pk}-{campaign_stamp(pk)["version"]}-{_fields_key(request)}'
+
+
+@replica_reads
+@api_endpoint(etag_func=campaign_detail_etag)
+def campaign_detail(request, pk):
+    fields = selected_fields(request, {**DETAIL_COLUMNS, **dict.fromkeys(DETAIL_RELATED)}, [*DETAIL_COLUMNS, *DETAIL_RELATED])
+    columns = [name for name in fields if name in DETAIL_COLUMNS]
+    campaign = values_for(Funding.objects.filter(pk=pk, is_approved=True), columns, DETAIL_COLUMNS).first()
+    if campaign is None:
+        raise ApiError(404, 'Campaign not found.')
+    if 'milestones' in fields:
+        campaign['milestones'] = list(
+            Milestone.objects.filter(funding_id=pk).order_by('target_date', 'id')
+            .values('id', 'title', 'target_date', 'is_complete')
+        )
+    return {name: campaign[name] for name in fields}
+
+
+def pulse_etag(request):
+    return f'pulse-{current_sunday(timezone.now().date())}-{pulse_version()}-{_fields_key(request)}'
+
+
+@api_endpoint(etag_func=pulse_etag)
+def pulse(request):
+    fields = selected_fields(request, PULSE_FIELDS, PULSE_FIELDS)
+    sunday = current_sunday(timezone.now().date())
+    return {
+        'reveal_date': sunday,
+        'results': [{name: campaign[name] for name in fields} for campaign in get_pulse_snapshot(sunday)],
+    }
+
+# ----------------------------------------------------------------------------
+# Investor Portfolio
+# ----------------------------------------------------------------------------
+
+PORTFOLIO_COLUMNS = {
+    'id': 'id',
+    'campaign_id': 'funding_id',
+    'campaign_name': 'funding__campaign_name',
+    'campaign_status': 'funding__status',
+    'amount': 'amount',
+    'status': 'status',
+    'created_at': 'created_at',
+}
+
+
+@api_endpoint(private=True)
+def portfolio(request):
+    fields = selected_fields(request, PORTFOLIO_COLUMNS, PORTFOLIO_COLUMNS)
+    investments = Investment.objects.filter(investor=request.user).order_by('-id')
+    return keyset_results(request, values_for(investments, fields, PORTFOLIO_COLUMNS, extra=['id']), fields)
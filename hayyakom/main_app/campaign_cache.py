@@ -0,0 +1,71 @@
+import uuid
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from .notifications import unread_count
+from .recommendations import recommendations_version
+
+# ============================================================================
+# Campaign Version Stamps
+# ============================================================================
+# Every campaign has a stamp (version + last change time) that lives only in the
+# cache. Any write to the campaign, its investments or milestones replaces it, so
+# fragments cached under the old version are never served again, and the detail
+# page can answer conditional GETs without touching the ORM. A missing stamp is
+# simply recreated, which costs one re-render; stamps expire after
+# CAMPAIGN_STAMP_TIMEOUT, so ids probed for 404s do not leave keys behind forever.
+
+def _stamp_key(funding_id):
+    return f'funding:stamp:{funding_id}'
+
+
+def _new_stamp():
+    return {'version': uuid.uuid4().hex[:12], 'modified': timezone.now().replace(microsecond=0)}
+
+
+def campaign_stamp(funding_id):
+    key = _stamp_key(funding_id)
+    stamp = cache.get(key)
+    if stamp is None:
+        cache.add(key, _new_stamp(), settings.CAMPAIGN_STAMP_TIMEOUT)
+        stamp = cache.get(key) or _new_stamp()
+    return stamp
+
+
+def bump_campaigns(funding_ids):
+    cache.set_many({_stamp_key(funding_id): _new_stamp() for funding_id in funding_ids}, settings.CAMPAIGN_STAMP_TIMEOUT)
+
+
+def bump_campaigns_on_commit(funding_ids):
+    funding_ids = list(funding_ids)
+    if funding_ids:
+        transaction.on_commit(lambda: bump_campaigns(funding_ids))
+
+
+def is_campaign_investor(funding, user):
+    # Investing bumps the campaign, so the answer is cached under the current version.
+    key = f'funding:investor:{funding.pk}:{campaign_stamp(funding.pk)["version"]}:{user.pk}'
+    answer = cache.get(key)
+    if answer is None:
+        answer = funding.investment_set.filter(investor=user).exists()
+        cache.set(key, answer, settings.FUNDING_FRAGMENT_CACHE_TIMEOUT)
+    return answer
+
+# ============================================================================
+# Conditional GET
+# ============================================================================
+# The page also depends on who is looking (investor contact block, owner table,
+# actions, unread badge), so the viewer's id and badge count are part of the
+# ETag, as is the recommendations version for the "similar campaigns" block.
+# All of them come from the session and the cache, not the database.
+
+def campaign_etag(request, pk):
+    user_id = request.session.get(SESSION_KEY)
+    unread = unread_count(user_id) if user_id else 0
+    return f'{pk}-{campaign_stamp(pk)["version"]}-{recommendations_version()}-{user_id or 0}-{unread}'
+
+
+def campaign_last_modified(request, pk):
+    return campaign_stamp(pk)['modified']
@@ -1,7 +1,11 @@
-from .models import Notification
+from django.conf import settings
+from .notifications import unread_count
 
 def unread_notifications(request):
     if request.user.is_authenticated:
-        count = Notification.objects.filter(user=request.user, is_read=False).count()
-        return {'unread_notification_count': count}
-    return {}
\ No newline at end of file
+        return {'unread_notification_count': unread_count(request.user.pk)}
+    return {}
+
+def live_progress(request):
+    # The page subscribes to at most as many campaigns as funding_progress_stream accepts.
+    return {'live_max_subscriptions': settings.LIVE_MAX_SUBSCRIPTIONS}
@@ -0,0 +1,77 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import time
+import uuid
+from types import SimpleNamespace
+from django.conf import settings
+
+# ============================================================================
+# Local Stripe Stand-in
+# ============================================================================
+# Used when STRIPE_BACKEND = 'fake'. Checkout sessions are "paid" immediately:
+# the matching checkout.session.completed event is appended to
+# FAKE_STRIPE_EVENTS_PATH and delivered to the webhook by `replay_stripe_events`.
+# FAKE_STRIPE_LATENCY_MS simulates the network round trip to Stripe.
+
+def sign_payload(payload, secret, timestamp=None):
+    timestamp = int(timestamp or time.time())
+    signed = f'{timestamp}.{payload}'.encode()
+    signature = hmac.new(secret.encode(), signed, hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={signature}'
+
+
+def _append_event(event):
+    with open(settings.FAKE_STRIPE_EVENTS_PATH, 'a') as events_file:
+        events_file.write(json.dumps(event) + '\n')
+
+
+def load_events():
+    try:
+        with open(settings.FAKE_STRIPE_EVENTS_PATH) as events_file:
+            return [json.loads(line) for line in events_file if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+class _Session:
+    @staticmethod
+    def create(**params):
+        time.sleep(settings.FAKE_STRIPE_LATENCY_MS / 1000)
+        return _Session._complete(params)
+
+    @staticmethod
+    async def create_async(**params):
+        await asyncio.sleep(settings.FAKE_STRIPE_LATENCY_MS / 1000)
+        return _Session._complete(params)
+
+    @staticmethod
+    def expire(session_id):
+        # Fake sessions are paid as soon as they are created; there is nothing left to expire.
+        return SimpleNamespace(id=session_id, status='complete')
+
+    @staticmethod
+    def _complete(params):
+        session_id = f'cs_fake_{uuid.uuid4().hex}'
+        amount = sum(item['price_data']['unit_amount'] * item['quantity'] for item in params['line_items'])
+        session = {
+            'id': session_id,
+            'object': 'checkout.session',
+            'payment_status': 'paid',
+            'amount_total': amount,
+            'client_reference_id': params.get('client_reference_id'),
+            'metadata': params.get('metadata', {}),
+        }
+        _append_event({
+            'id': f'evt_fake_{uuid.uuid4().hex}',
+            'object': 'event',
+            'type': 'checkout.session.completed',
+            'created': int(time.time()),
+            'data': {'object': session},
+        })
+        url = params['success_url'].replace('{CHECKOUT_SESSION_ID}', session_id)
+        return SimpleNamespace(url=url, **session)
+
+
+checkout = SimpleNamespace(Session=_Session)
@@ -40,6 +40,7 @@ class FundingFilterForm(forms.Form):
 class InvestmentForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         self.funding = kwargs.pop('funding', None)
+        self.investor = kwargs.pop('investor', None)
         super(InvestmentForm, self).__init__(*args, **kwargs)
     class Meta:
         model = Investment
@@ -48,7 +49,7 @@ class InvestmentForm(forms.ModelForm):
     def clean_amount(self):
         amount = self.cleaned_data.get('amount')
         if self.funding:
-            remaining_amount = self.funding.goal - self.funding.total_invested()
+            remaining_amount = self.funding.remaining_capacity(self.investor)
             if amount > remaining_amount:
                 raise forms.ValidationError(
                     f"This investment would exceed the goal. The maximum you can invest is {remaining_amount} BD."
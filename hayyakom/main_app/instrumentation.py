@@ -0,0 +1,162 @@
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+from datetime import timedelta
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.db.models import Avg, Count, Max, Q
+from django.utils import timezone
+from .models import RequestSample
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# SQL Instrumentation
+# ============================================================================
+# Sampled requests run with an execute_wrapper on every connection. The wrapper
+# only times the call and keeps the SQL text (placeholders, not parameters), so
+# two executions with the same text are the same query shape.
+
+IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+
+
+def query_shape(sql):
+    return IN_LIST.sub('(...)', sql)
+
+
+class QueryRecorder:
+    def __init__(self, keep_slowest=5):
+        self.keep_slowest = keep_slowest
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            self.shapes[query_shape(sql)] += 1
+            self.slowest.append((elapsed, sql))
+            if len(self.slowest) > self.keep_slowest * 4:
+                self.trim()
+
+    def trim(self):
+        self.slowest = sorted(self.slowest, key=lambda item: item[0], reverse=True)[:self.keep_slowest]
+
+    def n_plus_one(self, threshold):
+        return [{'sql': sql, 'count': count} for sql, count in self.shapes.most_common() if count >= threshold]
+
+    def slowest_queries(self):
+        self.trim()
+        return [{'sql': sql, 'ms': round(elapsed * 1000, 2)} for elapsed, sql in self.slowest]
+
+
+class SQLInstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if random.random() >= settings.SQL_INSTRUMENTATION_SAMPLE_RATE:
+            return self.get_response(request)
+
+        recorder = QueryRecorder(settings.SQL_INSTRUMENTATION_SLOWEST)
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            self.wrap_connections(stack, recorder)
+            response = self.get_response(request)
+        self.finish(request, response, recorder, start)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= settings.SQL_INSTRUMENTATION_SAMPLE_RATE:
+            return await self.get_response(request)
+
+        # Connections are per thread; the async ORM runs in the request's thread-sensitive
+        # executor, so the wrappers have to be installed (and removed) from there.
+        recorder = QueryRecorder(settings.SQL_INSTRUMENTATION_SLOWEST)
+        start = time.perf_counter()
+        stack = ExitStack()
+        await sync_to_async(self.wrap_connections)(stack, recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        await sync_to_async(self.finish)(request, response, recorder, start)
+        return response
+
+    def wrap_connections(self, stack, recorder):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+
+    def finish(self, request, response, recorder, start):
+        db_ms = recorder.duration * 1000
+        total_ms = (time.perf_counter() - start) * 1000
+        response['Server-Timing'] = (
+            f'db;dur={db_ms:.2f};desc="{recorder.count} queries", app;dur={total_ms - db_ms:.2f}'
+        )
+        self.record(request, response, recorder, db_ms, total_ms)
+
+    def record(self, request, response, recorder, db_ms, total_ms):
+        match = request.resolver_match
+        view_name = (match.view_name or match._func_path) if match else 'unresolved'
+        suspects = recorder.n_plus_one(settings.SQL_INSTRUMENTATION_N_PLUS_ONE_THRESHOLD)
+        logger.info(
+            '%s %s %s: %d queries, %.1fms db, %.1fms total',
+            request.method, view_name, response.status_code, recorder.count, db_ms, total_ms,
+        )
+        for suspect in suspects:
+            logger.warning('Possible N+1 in %s: %d x %s', view_name, suspect['count'], suspect['sql'])
+        try:
+            RequestSample.objects.create(
+                view_name=view_name[:200],
+                method=request.method,
+                path=request.path[:500],
+                status_code=response.status_code,
+                query_count=recorder.count,
+                db_time_ms=db_ms,
+                total_time_ms=total_ms,
+                slowest_queries=recorder.slowest_queries(),
+                n_plus_one=suspects,
+            )
+        except Exception:
+            # Losing a sample must never fail the request it describes.
+            logger.exception('Could not store request sample for %s', view_name)
+
+
+# ============================================================================
+# Reporting
+# ============================================================================
+
+def worst_views(days, limit=20):
+    # Aggregated by the database: the sample table grows with traffic, the report does not.
+    since = timezone.now() - timedelta(days=days)
+    rows = (
+        RequestSample.objects.filter(created_at__gte=since)
+        .values('view_name')
+        .annotate(
+            samples=Count('id'),
+            avg_db_ms=Avg('db_time_ms'),
+            max_db_ms=Max('db_time_ms'),
+            max_queries=Max('query_count'),
+            n_plus_one_samples=Count('id', filter=~Q(n_plus_one=[])),
+        )
+        .order_by('-avg_db_ms')
+    )
+    return list(rows[:limit])
@@ -0,0 +1,163 @@
+import atexit
+import logging
+import threading
+from collections import Counter
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .campaign_cache import bump_campaigns_on_commit
+from .models import Funding, InterestClick, JobCheckpoint
+from .pulse import bump_pulse_version
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = 'flush_interest_clicks'
+
+# ============================================================================
+# Interest Ingestion
+# ============================================================================
+# show_interest only appends a click to a buffer and returns. A flusher later
+# dedupes the clicks, writes the new interested_users rows in bulk and bumps
+# Funding.interest_count, so the pulse page never has to COUNT(*).
+
+def apply_interest(pairs):
+    pairs = set(pairs)
+    if not pairs:
+        return 0
+    Through = Funding.interested_users.through
+    funding_ids = {funding_id for funding_id, _ in pairs}
+    user_ids = {user_id for _, user_id in pairs}
+    existing = set(
+        Through.objects.filter(funding_id__in=funding_ids, user_id__in=user_ids)
+        .values_list('funding_id', 'user_id')
+    )
+    new_pairs = pairs - existing
+    Through.objects.bulk_create(
+        [Through(funding_id=funding_id, user_id=user_id) for funding_id, user_id in new_pairs],
+        ignore_conflicts=True,
+    )
+    added_by_funding = Counter(funding_id for funding_id, _ in new_pairs)
+    for funding_id, added in added_by_funding.items():
+        Funding.objects.filter(pk=funding_id).update(interest_count=F('interest_count') + added)
+    if new_pairs:
+        # interest_count is on the detail page and API payloads, so their stamps move too.
+        bump_campaigns_on_commit(added_by_funding)
+        transaction.on_commit(bump_pulse_version)
+    return new_pairs
+
+
+class DatabaseInterestBuffer:
+    def push(self, funding_id, user_id):
+        InterestClick.objects.create(funding_id=funding_id, user_id=user_id)
+
+    def pending_for(self, user_id, funding_ids):
+        return set(
+            InterestClick.objects.filter(user_id=user_id, funding_id__in=funding_ids)
+            .values_list('funding_id', flat=True)
+        )
+
+    def flush(self, batch_size=5000, lag_seconds=None):
+        lag = settings.INTEREST_FLUSH_LAG_SECONDS if lag_seconds is None else lag_seconds
+        horizon = timezone.now() - timedelta(seconds=lag)
+        flushed = 0
+        while True:
+            with transaction.atomic():
+                # The locked checkpoint row serialises flushers without blocking writers.
+                JobCheckpoint.objects.get_or_create(name=CHECKPOINT_NAME)
+                checkpoint = JobCheckpoint.objects.select_for_update().get(name=CHECKPOINT_NAME)
+                clicks = self.claim(checkpoint, horizon, batch_size)
+                if not clicks:
+                    return flushed
+                new_pairs = apply_interest((funding_id, user_id) for _, funding_id, user_id, _ in clicks)
+                flushed += len(new_pairs)
+                self.prune(clicks, new_pairs)
+                checkpoint.position = clicks[-1][0]
+                checkpoint.save(update_fields=['position', 'updated_at'])
+
+    def claim(self, checkpoint, horizon, batch_size):
+        clicks = list(
+            InterestClick.objects.filter(id__gt=checkpoint.position).order_by('id')
+            .values_list('id', 'funding_id', 'user_id', 'created_at')[:batch_size]
+        )
+        # Like the stats rollups: stop at the first click inside the lag window, so an id
+        # from a transaction that commits late is not skipped by the watermark.
+        for index, click in enumerate(clicks):
+            if click[3] > horizon:
+                return clicks[:index]
+        return clicks
+
+    def prune(self, clicks, new_pairs):
+        # Only the click that created each interest is kept (the daily rollups count
+        # those); repeats are deleted, so the table grows with interests, not clicks.
+        first = {}
+        for click_id, funding_id, user_id, _ in clicks:
+            first.setdefault((funding_id, user_id), click_id)
+        kept = {first[pair] for pair in new_pairs}
+        InterestClick.objects.filter(id__in=[click[0] for click in clicks if click[0] not in kept]).delete()
+
+
+class MemoryInterestBuffer:
+    # Process-local queue for single-process deployments and local runs. A daemon thread
+    # flushes it every flush_interval seconds (sooner once flush_size clicks are queued)
+    # and once more at exit; pushes never touch the database.
+    flush_size = 100
+    flush_interval = 5
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clicks = []
+        self.wake = threading.Event()
+        self.flusher = None
+
+    def push(self, funding_id, user_id):
+        with self.lock:
+            self.clicks.append((funding_id, user_id))
+            if self.flusher is None:
+                self.flusher = threading.Thread(target=self.run, name='interest-flusher', daemon=True)
+                self.flusher.start()
+                atexit.register(self.flush_quietly)
+            if len(self.clicks) >= self.flush_size:
+                self.wake.set()
+
+    def pending_for(self, user_id, funding_ids):
+        with self.lock:
+            return {f_id for f_id, u_id in self.clicks if u_id == user_id and f_id in funding_ids}
+
+    def run(self):
+        while True:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            close_old_connections()
+            self.flush_quietly()
+
+    def flush_quietly(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Could not flush buffered interest clicks; keeping them for the next attempt.')
+
+    def flush(self, batch_size=5000):
+        with self.lock:
+            clicks, self.clicks = self.clicks, []
+        if not clicks:
+            return 0
+        try:
+            with transaction.atomic():
+                return len(apply_interest(clicks))
+        except Exception:
+            with self.lock:
+                self.clicks[:0] = clicks
+            raise
+
+
+_buffer = None
+
+
+def get_interest_buffer():
+    global _buffer
+    if _buffer is None:
+        _buffer = import_string(settings.INTEREST_BUFFER_BACKEND)()
+    return _buffer
@@ -0,0 +1,129 @@
+import time
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .campaign_cache import bump_campaigns_on_commit
+from .listings import refresh_listings_on_commit
+from .models import Funding
+from .notifications import notify_many
+from .pulse import bump_pulse_version
+from .settlement import settle_chunk
+
+# ============================================================================
+# Campaign Lifecycle Scheduler
+# ============================================================================
+# Every campaign with a pending transition carries next_transition_at, covered by
+# a partial index. The worker reads the earliest due time, sleeps until then and
+# claims only the rows that are due, so a wake-up costs the same whether there
+# are a hundred campaigns or a million.
+#
+#   Pending Pulse (with reveal_date) -> In Pulse       on the reveal Sunday
+#   In Pulse                         -> Early Access   EARLY_ACCESS_AFTER_DAYS later
+#   Early Access                     -> In Process     LAUNCH_AFTER_DAYS after the reveal
+#   In Process                       -> Completed / Failed, via the settlement engine
+
+NEXT_STATUS = {
+    'Pending Pulse': 'In Pulse',
+    'In Pulse': 'Early Access',
+    'Early Access': 'In Process',
+}
+
+
+def due_campaigns(now):
+    return Funding.objects.filter(next_transition_at__lte=now)
+
+
+def next_due_time():
+    return (
+        Funding.objects.filter(next_transition_at__isnull=False)
+        .order_by('next_transition_at')
+        .values_list('next_transition_at', flat=True)
+        .first()
+    )
+
+
+def advance_chunk(campaigns):
+    # Pulse steps are one bulk UPDATE each; expired campaigns go through settlement.
+    expired = [c for c in campaigns if c.status == 'In Process']
+    moved = [c for c in campaigns if c.status in NEXT_STATUS]
+    unscheduled = [c for c in campaigns if c.status != 'In Process' and c.status not in NEXT_STATUS]
+
+    for campaign in moved:
+        campaign.status = NEXT_STATUS[campaign.status]
+        campaign.next_transition_at = campaign.lifecycle_due_at()
+    for campaign in unscheduled:
+        # Moved out of the schedule by a bulk update that did not clear the column.
+        campaign.next_transition_at = None
+    Funding.objects.bulk_update(moved + unscheduled, ['status', 'next_transition_at'])
+
+    if expired:
+        settle_chunk(expired)
+    if moved:
+        moved_ids = [c.id for c in moved]
+        bump_campaigns_on_commit(moved_ids)
+        refresh_listings_on_commit(moved_ids)
+        transaction.on_commit(bump_pulse_version)
+    for campaign in moved:
+        if campaign.status == 'Early Access':
+            notify_many(
+                'interested',
+                f"Early access to '{campaign.campaign_name}' is now open for interested investors.",
+                campaign,
+            )
+    return len(moved), len(expired)
+
+
+def run_due_transitions(now=None, chunk_size=500):
+    now = now or timezone.now()
+    moved_count = 0
+    settled_count = 0
+    while True:
+        with transaction.atomic():
+            # skip_locked lets several workers (and update_campaign_statuses) share the queue.
+            campaigns = list(
+                due_campaigns(now)
+                .order_by('next_transition_at', 'id')
+                .select_for_update(skip_locked=True)
+                .only('id', 'status', 'campaign_name', 'goal', 'raised_amount', 'reveal_date', 'end_date')[:chunk_size]
+            )
+            if not campaigns:
+                return moved_count, settled_count
+            moved, settled = advance_chunk(campaigns)
+        moved_count += moved
+        settled_count += settled
+
+
+def run_worker(chunk_size=500, max_sleep=None, log=None):
+    # Sleeps until the earliest due transition, capped so newly scheduled campaigns
+    # that are due sooner are picked up within max_sleep seconds.
+    max_sleep = settings.LIFECYCLE_MAX_SLEEP_SECONDS if max_sleep is None else max_sleep
+    while True:
+        moved, settled = run_due_transitions(chunk_size=chunk_size)
+        if log and (moved or settled):
+            log(f'Advanced {moved} campaigns and settled {settled}.')
+        due_at = next_due_time()
+        delay = max_sleep if due_at is None else (due_at - timezone.now()).total_seconds()
+        time.sleep(min(max(delay, 0), max_sleep))
+
+
+def reschedule_all(chunk_size=2000):
+    # Backfills next_transition_at, e.g. after adding the column or bulk-loading campaigns.
+    updated = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            campaigns = list(
+                Funding.objects.filter(id__gt=last_id).order_by('id')
+                .only('id', 'status', 'reveal_date', 'end_date', 'next_transition_at')[:chunk_size]
+            )
+            if not campaigns:
+                return updated
+            changed = []
+            for campaign in campaigns:
+                due_at = campaign.lifecycle_due_at()
+                if due_at != campaign.next_transition_at:
+                    campaign.next_transition_at = due_at
+                    changed.append(campaign)
+            Funding.objects.bulk_update(changed, ['next_transition_at'])
+        updated += len(changed)
+        last_id = campaigns[-1].id
@@ -0,0 +1,81 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.text import Truncator
+from .models import ActiveCampaignListing, Funding
+from .routers import read_primary
+
+SUMMARY_WORDS = 20
+VERSION_KEY = 'listings:version'
+
+# ============================================================================
+# Active Campaign Listings
+# ============================================================================
+# Every write that can change whether a campaign is listed, or what its card
+# shows, refreshes that campaign's row after commit: signals cover model saves,
+# and code that uses queryset .update() calls refresh_listings_on_commit itself.
+# `rebuild_listings` recreates the whole table.
+
+def listings_version():
+    # Bumped whenever any listing row changes; the JSON API's list ETag is built on it.
+    cache.add(VERSION_KEY, 1, None)
+    return cache.get(VERSION_KEY, 1)
+
+
+def bump_listings_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, None)
+
+
+def listed_campaigns():
+    return read_primary(Funding).filter(status='In Process', is_approved=True)
+
+
+def build_listings(fundings):
+    rows = fundings.values(
+        'id', 'campaign_name', 'company__company_name', 'description', 'goal', 'raised_amount', 'category', 'end_date'
+    )
+    return [
+        ActiveCampaignListing(
+            funding_id=row['id'],
+            campaign_name=row['campaign_name'],
+            company_name=row['company__company_name'],
+            summary=Truncator(row['description']).words(SUMMARY_WORDS),
+            goal=row['goal'],
+            raised_amount=row['raised_amount'],
+            progress_percentage=row['raised_amount'] / row['goal'] * 100 if row['goal'] > 0 else 0,
+            category=row['category'],
+            end_date=row['end_date'],
+        )
+        for row in rows
+    ]
+
+
+def refresh_listings(funding_ids):
+    funding_ids = list(funding_ids)
+    with transaction.atomic():
+        ActiveCampaignListing.objects.filter(funding_id__in=funding_ids).delete()
+        ActiveCampaignListing.objects.bulk_create(build_listings(listed_campaigns().filter(id__in=funding_ids)))
+        transaction.on_commit(bump_listings_version)
+
+
+def refresh_listings_on_commit(funding_ids):
+    funding_ids = list(funding_ids)
+    if funding_ids:
+        transaction.on_commit(lambda: refresh_listings(funding_ids))
+
+
+def rebuild_listings(batch_size=1000):
+    last_id = 0
+    listed = 0
+    with transaction.atomic():
+        ActiveCampaignListing.objects.all().delete()
+        transaction.on_commit(bump_listings_version)
+        while True:
+            batch = build_listings(listed_campaigns().filter(id__gt=last_id).order_by('id')[:batch_size])
+            if not batch:
+                return listed
+            ActiveCampaignListing.objects.bulk_create(batch)
+            last_id = batch[-1].funding_id
+            listed += len(batch)
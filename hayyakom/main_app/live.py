@@ -0,0 +1,156 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.db import connection, connections
+from django.utils.module_loading import import_string
+from .models import Funding
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# Live Funding Progress
+# ============================================================================
+# Each investment is published once, after commit, to a broker. The broker fans
+# it out to the open Server-Sent Events streams subscribed to that campaign. A
+# subscription is an asyncio.Event plus a dict of pending updates: while idle it
+# costs no thread, no DB connection and no polling, and a burst of pledges for
+# one campaign collapses into its latest value.
+
+
+class Subscription:
+    def __init__(self, funding_ids):
+        self.funding_ids = frozenset(funding_ids)
+        self.loop = asyncio.get_running_loop()
+        self.pending = {}
+        self.ready = asyncio.Event()
+
+    def deliver(self, funding_id, progress):
+        # Called from whichever thread published; hand over to the stream's event loop.
+        self.loop.call_soon_threadsafe(self._deliver, funding_id, progress)
+
+    def _deliver(self, funding_id, progress):
+        self.pending[funding_id] = progress
+        self.ready.set()
+
+    async def next_updates(self, timeout):
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return {}
+        self.ready.clear()
+        updates, self.pending = self.pending, {}
+        return updates
+
+
+class LocalFanout:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = defaultdict(set)
+
+    def subscribe(self, funding_ids):
+        subscription = Subscription(funding_ids)
+        with self.lock:
+            for funding_id in subscription.funding_ids:
+                self.subscribers[funding_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for funding_id in subscription.funding_ids:
+                subscribers = self.subscribers.get(funding_id)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self.subscribers[funding_id]
+
+    def dispatch(self, funding_id, progress):
+        with self.lock:
+            subscribers = list(self.subscribers.get(funding_id, ()))
+        for subscription in subscribers:
+            subscription.deliver(funding_id, progress)
+
+
+class MemoryBroker(LocalFanout):
+    # Single-process deployments and local runs: publishers and streams share the process.
+    def publish(self, funding_id, progress):
+        self.dispatch(funding_id, progress)
+
+
+class PostgresBroker(LocalFanout):
+    # Several ASGI workers: publish with NOTIFY, and one LISTEN connection per process
+    # feeds that process's streams.
+    channel = 'funding_progress'
+
+    def __init__(self):
+        super().__init__()
+        self.listener = None
+
+    def publish(self, funding_id, progress):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.channel, json.dumps({'id': funding_id, **progress})])
+
+    def subscribe(self, funding_ids):
+        with self.lock:
+            if self.listener is None:
+                self.listener = threading.Thread(target=self.listen, name='funding-progress-listener', daemon=True)
+                self.listener.start()
+        return super().subscribe(funding_ids)
+
+    def listen(self):
+        import psycopg2
+        while True:
+            try:
+                conn = psycopg2.connect(**connections['default'].get_connection_params())
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN {self.channel}')
+                while True:
+                    if select.select([conn], [], [], 60) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        progress = json.loads(conn.notifies.pop(0).payload)
+                        self.dispatch(progress.pop('id'), progress)
+            except Exception:
+                logger.exception('Funding progress listener lost its connection; reconnecting.')
+                time.sleep(1)
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(settings.LIVE_PROGRESS_BACKEND)()
+    return _broker
+
+
+def current_progress(funding_ids):
+    rows = Funding.objects.filter(pk__in=funding_ids).values('id', 'raised_amount', 'goal', 'investor_count', 'status')
+    return {row['id']: progress_payload(row) for row in rows}
+
+
+def progress_payload(row):
+    return {
+        'raised_amount': row['raised_amount'],
+        'goal': row['goal'],
+        'investor_count': row['investor_count'],
+        'progress_percentage': round(row['raised_amount'] / row['goal'] * 100, 2) if row['goal'] > 0 else 0,
+        'status': row['status'],
+    }
+
+
+def publish_progress(funding_id):
+    row = Funding.objects.filter(pk=funding_id).values('raised_amount', 'goal', 'investor_count', 'status').first()
+    if row is not None:
+        get_broker().publish(funding_id, progress_payload(row))
+
+
+def sse_event(funding_id, progress):
+    return f"event: progress\ndata: {json.dumps({'id': funding_id, **progress})}\n\n"
@@ -0,0 +1,50 @@
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from main_app.retention import (
+    archive_file_writer, archive_partition, archive_read_notifications, is_partitioned,
+    monthly_partitions, partitioning_supported, prune_all_samples, write_archive_table,
+)
+
+class Command(BaseCommand):
+    help = 'Moves read notifications older than the retention age into compressed archive chunks and prunes old diagnostic samples.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=settings.NOTIFICATION_ARCHIVE_AFTER_DAYS)
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Notifications archived per transaction.')
+        parser.add_argument('--destination', choices=['table', 'file'], default='table')
+        parser.add_argument('--path', help='Directory for .jsonl.gz chunks when --destination=file.')
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between chunks.')
+        parser.add_argument('--drop-partitions', action='store_true', help='Archive and drop whole monthly partitions past the cutoff first (PostgreSQL).')
+
+    def handle(self, *args, **options):
+        if options['destination'] == 'file':
+            if not options['path']:
+                raise CommandError('--path is required with --destination=file.')
+            write = archive_file_writer(options['path'])
+        else:
+            write = write_archive_table
+
+        cutoff_day = timezone.now().date() - timedelta(days=options['older_than_days'])
+        cutoff = timezone.make_aware(datetime.combine(cutoff_day, time.min))
+        chunk_size = options['chunk_size']
+
+        if options['drop_partitions']:
+            if not partitioning_supported() or not is_partitioned():
+                raise CommandError('The notification table is not partitioned; run partition_notifications --convert first.')
+            for name, _, upper in monthly_partitions():
+                if upper > cutoff_day:
+                    break
+                archived = archive_partition(name, write, chunk_size=chunk_size)
+                if archived is None:
+                    self.stdout.write(self.style.WARNING(f'Kept {name}: it still has unread notifications.'))
+                else:
+                    self.stdout.write(f'Archived {archived} notifications and dropped {name}.')
+
+        self.stdout.write(f'Archiving read notifications created before {cutoff_day}...')
+        archived = archive_read_notifications(cutoff, write, chunk_size=chunk_size, pause=options['pause'])
+        self.stdout.write(self.style.SUCCESS(f'Archived {archived} notifications.'))
+
+        for model, pruned in prune_all_samples(chunk_size=chunk_size, pause=options['pause']).items():
+            self.stdout.write(f'Pruned {pruned} {model._meta.verbose_name_plural}.')
@@ -0,0 +1,150 @@
+import asyncio
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from main_app.models import Company, Funding
+
+CHECKOUT_AMOUNT = 2000
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares request throughput of the WSGI (thread per request) and ASGI (event loop) handlers '
+        'against a local Stripe stub that takes --stripe-latency-ms to answer.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', choices=['checkout', 'home'], default='checkout')
+        parser.add_argument('--requests', type=int, default=100)
+        parser.add_argument('--wsgi-workers', type=int, default=8, help='Threads serving WSGI requests.')
+        parser.add_argument('--concurrency', type=int, default=100, help='In-flight requests on the ASGI event loop.')
+        parser.add_argument('--stripe-latency-ms', type=int, default=300)
+
+    def handle(self, *args, **options):
+        events_file = tempfile.NamedTemporaryFile(suffix='.jsonl', delete=False)
+        events_file.close()
+        test_settings = override_settings(
+            ALLOWED_HOSTS=['testserver'],
+            STRIPE_BACKEND='fake',
+            FAKE_STRIPE_LATENCY_MS=options['stripe_latency_ms'],
+            FAKE_STRIPE_EVENTS_PATH=events_file.name,
+            SQL_INSTRUMENTATION_SAMPLE_RATE=0,
+        )
+        with test_settings:
+            try:
+                if options['scenario'] == 'checkout':
+                    self.benchmark_checkout(options)
+                else:
+                    self.benchmark_home(options)
+            finally:
+                os.unlink(events_file.name)
+
+    # ------------------------------------------------------------------------
+    # Scenarios
+    # ------------------------------------------------------------------------
+
+    def benchmark_checkout(self, options):
+        count = options['requests']
+        investors = list(User.objects.filter(profile__role='Investor').order_by('id')[:count * 2])
+        company = Company.objects.order_by('id').first()
+        if len(investors) < count * 2 or company is None:
+            raise CommandError(f'Needs a company and {count * 2} investors; run seed_marketplace first.')
+
+        # A throwaway campaign big enough for every checkout in both runs.
+        funding = Funding.objects.create(
+            company=company,
+            campaign_name=f'Checkout benchmark {timezone.now():%Y%m%d%H%M%S}',
+            description='Temporary campaign created by benchmark_asgi.',
+            goal=CHECKOUT_AMOUNT * count * 2,
+            end_date=timezone.now().date() + timedelta(days=30),
+            status='In Process',
+            is_approved=True,
+        )
+        url = reverse('add_investment', args=[funding.pk])
+        try:
+            wsgi = self.run_wsgi(investors[:count], 'post', url, {'amount': CHECKOUT_AMOUNT}, options['wsgi_workers'])
+            asgi = self.run_asgi(investors[count:], 'post', url, {'amount': CHECKOUT_AMOUNT}, options['concurrency'])
+        finally:
+            funding.delete()
+        self.report(wsgi, asgi, expected_status=302)
+
+    def benchmark_home(self, options):
+        users = [None] * options['requests']
+        wsgi = self.run_wsgi(users, 'get', reverse('home'), None, options['wsgi_workers'])
+        asgi = self.run_asgi(users, 'get', reverse('home'), None, options['concurrency'])
+        self.report(wsgi, asgi, expected_status=200)
+
+    # ------------------------------------------------------------------------
+    # Runners
+    # ------------------------------------------------------------------------
+
+    def run_wsgi(self, users, method, url, data, workers):
+        clients = []
+        for user in users:
+            client = Client()
+            if user is not None:
+                client.force_login(user)
+            clients.append(client)
+
+        def send(client):
+            try:
+                start = time.perf_counter()
+                response = getattr(client, method)(url, data)
+                return response.status_code, time.perf_counter() - start
+            finally:
+                connections.close_all()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(send, clients))
+        return results, time.perf_counter() - start
+
+    def run_asgi(self, users, method, url, data, concurrency):
+        async def login(user):
+            client = AsyncClient()
+            if user is not None:
+                await client.aforce_login(user)
+            return client
+
+        async def send(client, limit):
+            async with limit:
+                # Like ASGIHandler, give each request its own thread for sync ORM work.
+                async with ThreadSensitiveContext():
+                    start = time.perf_counter()
+                    response = await getattr(client, method)(url, data)
+                    elapsed = time.perf_counter() - start
+                    await sync_to_async(connections.close_all)()
+                return response.status_code, elapsed
+
+        async def main():
+            clients = [await login(user) for user in users]
+            limit = asyncio.Semaphore(concurrency)
+            start = time.perf_counter()
+            results = await asyncio.gather(*(send(client, limit) for client in clients))
+            return results, time.perf_counter() - start
+
+        return asyncio.run(main())
+
+    # ------------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------------
+
+    def report(self, wsgi, asgi, expected_status):
+        for name, (results, elapsed) in (('WSGI', wsgi), ('ASGI', asgi)):
+            latencies = sorted(latency for _, latency in results)
+            failures = sum(1 for status, _ in results if status != expected_status)
+            self.stdout.write(
+                f'{name}: {len(results)} requests in {elapsed:.2f}s = {len(results) / elapsed:.1f} req/s, '
+                f'p50 {latencies[len(latencies) // 2] * 1000:.0f}ms, '
+                f'p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f}ms, '
+                f'{failures} unexpected responses'
+            )
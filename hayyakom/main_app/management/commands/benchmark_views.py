@@ -0,0 +1,200 @@
+import json
+import math
+import statistics
+import subprocess
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from main_app.models import Funding, Investment, Notification
+from main_app.profiler import targets as profiler_targets
+from main_app.settlement import expired_campaigns, settle_expired
+
+# Maximum queries per request (per settled chunk for 'settlement'). A view that
+# starts issuing a query per row blows through these on any seeded dataset.
+# Settlement leaves room for SQLite, which splits bulk inserts into 999-parameter batches.
+QUERY_BUDGETS = {
+    'home': 2,
+    'home_search': 2,
+    'home_category': 2,
+    'funding_detail_anonymous': 2,
+    'funding_detail_investor': 6,
+    'funding_detail_owner': 6,
+    'funding_list_investor': 5,
+    'funding_list_owner': 5,
+    'notification_list': 5,
+    'weekly_pulse_anonymous': 1,
+    'weekly_pulse_investor': 6,
+    'settlement': 40,
+}
+SETTLEMENT_CHUNK_SIZE = 500
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(math.ceil(fraction * len(ordered))) - 1)]
+
+
+class Command(BaseCommand):
+    help = 'Measures latency and query counts of the main views against the current database and enforces query budgets.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--only', nargs='*', help='Scenario names to run.')
+        parser.add_argument('--output', help='Write the machine-readable report to this JSON file.')
+        parser.add_argument('--compare', help='A previous report to print deltas against.')
+        parser.add_argument('--no-enforce', action='store_true', help='Report budget overruns without failing.')
+
+    def handle(self, *args, **options):
+        scenarios = self.build_scenarios()
+        if options['only']:
+            scenarios = {name: run for name, run in scenarios.items() if name in options['only']}
+
+        results = {}
+        for name, run in scenarios.items():
+            if run is None:
+                self.stdout.write(f'{name:<28} skipped (no data)')
+                continue
+            results[name] = self.measure(name, run, options['runs'], options['warmup'])
+
+        report = {
+            'generated_at': timezone.now().isoformat(),
+            'git_commit': self.git_commit(),
+            'database': connection.vendor,
+            'row_counts': {
+                'fundings': Funding.objects.count(),
+                'investments': Investment.objects.count(),
+                'notifications': Notification.objects.count(),
+            },
+            'scenarios': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                json.dump(report, report_file, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
+        if options['compare']:
+            self.print_comparison(report, options['compare'])
+
+        over_budget = [name for name, result in results.items() if result['queries'] > result['budget']]
+        if over_budget:
+            if options['no_enforce']:
+                self.stdout.write(self.style.WARNING(f"Query budget exceeded: {', '.join(over_budget)}"))
+                return
+            raise CommandError(f"Query budget exceeded: {', '.join(over_budget)}")
+        self.stdout.write(self.style.SUCCESS('All scenarios within their query budgets.'))
+
+    # ------------------------------------------------------------------------
+    # Scenarios
+    # ------------------------------------------------------------------------
+
+    def build_scenarios(self):
+        campaign = Funding.objects.filter(is_approved=True).order_by('-investor_count').select_related('company').first()
+        heavy_investor = (
+            Investment.objects.values('investor').annotate(total=Count('id')).order_by('-total').first()
+        )
+        heavy_reader = (
+            Notification.objects.values('user').annotate(total=Count('id')).order_by('-total').first()
+        )
+        investor = User.objects.filter(pk=heavy_investor['investor']).first() if heavy_investor else None
+        reader = User.objects.filter(pk=heavy_reader['user']).first() if heavy_reader else None
+        owner = campaign.company.owner if campaign else None
+        search_term = campaign.campaign_name.split()[0] if campaign else 'coffee'
+
+        def view(url, user=None):
+            client = Client()
+            if user is not None:
+                client.force_login(user)
+
+            def run():
+                response = client.get(url)
+                if response.status_code != 200:
+                    raise CommandError(f'{url} returned {response.status_code}')
+            return run
+
+        detail_url = f'/fundings/{campaign.pk}/' if campaign else None
+        return {
+            'home': view('/'),
+            'home_search': view(f'/?query={search_term}'),
+            'home_category': view('/?category=Technology'),
+            'funding_detail_anonymous': view(detail_url) if campaign else None,
+            'funding_detail_investor': view(detail_url, investor) if campaign and investor else None,
+            'funding_detail_owner': view(detail_url, owner) if campaign else None,
+            'funding_list_investor': view('/fundings/', investor) if investor else None,
+            'funding_list_owner': view('/fundings/', owner) if owner else None,
+            'notification_list': view('/notifications/', reader) if reader else None,
+            'weekly_pulse_anonymous': view('/pulse/'),
+            'weekly_pulse_investor': view('/pulse/', investor) if investor else None,
+            'settlement': self.settlement_run,
+        }
+
+    def settlement_run(self):
+        # Settle everything that is due, then roll back so every run sees the same data.
+        with transaction.atomic():
+            due = expired_campaigns(timezone.now().date()).count()
+            settle_expired(timezone.now().date(), chunk_size=SETTLEMENT_CHUNK_SIZE, resume=False)
+            transaction.set_rollback(True)
+        return max(1, math.ceil(due / SETTLEMENT_CHUNK_SIZE))
+
+    # ------------------------------------------------------------------------
+    # Measurement & Reporting
+    # ------------------------------------------------------------------------
+
+    # Sampled and profiled requests write a RequestSample/ProfileSample row, and the
+    # profiler re-reads its targets periodically; none of those queries are the view's.
+    @override_settings(
+        ALLOWED_HOSTS=['testserver'], SQL_INSTRUMENTATION_SAMPLE_RATE=0,
+        PROFILER_SAMPLE_RATE=0, PROFILER_TARGET_POLL_SECONDS=float('inf'),
+    )
+    def measure(self, name, run, runs, warmup):
+        profiler_targets.load()
+        for _ in range(warmup):
+            run()
+        timings = []
+        queries = 0
+        for _ in range(runs):
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                units = run() or 1
+                timings.append((time.perf_counter() - start) * 1000)
+            queries = max(queries, math.ceil(len(captured) / units))
+
+        result = {
+            'queries': queries,
+            'budget': QUERY_BUDGETS[name],
+            'runs': runs,
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(percentile(timings, 0.95), 2),
+            'max_ms': round(max(timings), 2),
+        }
+        status = self.style.SUCCESS('ok') if queries <= result['budget'] else self.style.ERROR('OVER BUDGET')
+        self.stdout.write(
+            f"{name:<28} queries {queries:>3}/{result['budget']:<3} "
+            f"p50 {result['p50_ms']:>8.2f}ms  p95 {result['p95_ms']:>8.2f}ms  {status}"
+        )
+        return result
+
+    def print_comparison(self, report, path):
+        with open(path) as previous_file:
+            previous = json.load(previous_file)
+        self.stdout.write(f"Compared with {previous.get('git_commit') or path}:")
+        for name, result in report['scenarios'].items():
+            before = previous.get('scenarios', {}).get(name)
+            if not before:
+                continue
+            self.stdout.write(
+                f"{name:<28} queries {before['queries']:>3} -> {result['queries']:<3} "
+                f"p95 {before['p95_ms']:>8.2f} -> {result['p95_ms']:.2f}ms"
+            )
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,25 @@
+import time
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from main_app.recommendations import build_recommendations
+
+class Command(BaseCommand):
+    help = 'Rebuilds the "similar campaigns" table from co-investment and Weekly Pulse interest data.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, help='Neighbours kept per campaign (default RECOMMENDATIONS_TOP_K).')
+        parser.add_argument('--block-size', type=int, default=2000, help='Campaigns scored per sparse product.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        try:
+            written = build_recommendations(
+                top_k=options['top_k'],
+                block_size=options['block_size'],
+                batch_size=options['batch_size'],
+                log=self.stdout.write,
+            )
+        except ImproperlyConfigured as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} recommendations in {time.monotonic() - start:.1f}s.'))
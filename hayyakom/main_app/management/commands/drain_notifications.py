@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from main_app.models import NotificationFanout
+from main_app.notifications import drain_fanout
+
+class Command(BaseCommand):
+    help = 'Delivers notification fan-outs that were too large to write during the request.'
+
+    def handle(self, *args, **options):
+        pending = list(NotificationFanout.objects.filter(is_done=False).order_by('id').values_list('id', flat=True))
+        self.stdout.write(f'Found {len(pending)} pending notification fan-outs...')
+
+        for fanout_id in pending:
+            drain_fanout(fanout_id)
+
+        delivered = sum(NotificationFanout.objects.filter(id__in=pending).values_list('delivered_count', flat=True))
+        self.stdout.write(self.style.SUCCESS(f'Delivered {delivered} notifications.'))
@@ -0,0 +1,20 @@
+import time
+from django.core.management.base import BaseCommand
+from main_app.interest import get_interest_buffer
+
+class Command(BaseCommand):
+    help = 'Applies buffered Weekly Pulse interest clicks to campaigns.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep flushing every --interval seconds.')
+        parser.add_argument('--interval', type=float, default=2.0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        buffer = get_interest_buffer()
+        while True:
+            added = buffer.flush(batch_size=options['batch_size'])
+            self.stdout.write(f'Recorded {added} new interests.')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
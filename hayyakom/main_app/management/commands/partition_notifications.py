@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from main_app.retention import (
+    convert_to_partitioned, create_partitions, is_partitioned, month_start, partitioning_supported,
+)
+
+class Command(BaseCommand):
+    help = 'Partitions the notification table by month and creates the partitions for the coming months (PostgreSQL only).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true', help='Convert the existing table. Takes an exclusive lock; run it in a maintenance window.')
+        parser.add_argument('--months-ahead', type=int, default=settings.NOTIFICATION_PARTITION_MONTHS_AHEAD)
+
+    def handle(self, *args, **options):
+        if not partitioning_supported():
+            raise CommandError('Notification partitioning needs PostgreSQL.')
+
+        months_ahead = options['months_ahead']
+        if not is_partitioned():
+            if not options['convert']:
+                raise CommandError('The notification table is not partitioned yet; pass --convert.')
+            convert_to_partitioned(months_ahead)
+            self.stdout.write(self.style.SUCCESS('Converted the notification table to monthly partitions.'))
+            return
+
+        created = create_partitions(month_start(timezone.now().date()), months_ahead + 1)
+        self.stdout.write(self.style.SUCCESS(f"Created {len(created)} partitions{': ' + ', '.join(created) if created else ''}."))
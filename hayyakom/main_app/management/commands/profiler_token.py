@@ -0,0 +1,12 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from main_app.profiler import make_profile_token
+
+class Command(BaseCommand):
+    help = 'Prints a signed token; requests sending it in the profiler header are profiled.'
+
+    def handle(self, *args, **options):
+        token = make_profile_token()
+        hours = settings.PROFILER_TOKEN_MAX_AGE // 3600
+        self.stdout.write(f'{settings.PROFILER_HEADER}: {token}')
+        self.stdout.write(self.style.SUCCESS(f'Valid for {hours} hours.'))
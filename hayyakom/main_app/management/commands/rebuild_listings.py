@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from main_app.listings import rebuild_listings
+
+class Command(BaseCommand):
+    help = 'Recreates the ActiveCampaignListing read model from the Funding table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        listed = rebuild_listings(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Listed {listed} active campaigns.'))
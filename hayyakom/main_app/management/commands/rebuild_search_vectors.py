@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from main_app.models import Funding
+from main_app.search import search_enabled, update_search_vectors
+
+class Command(BaseCommand):
+    help = 'Backfills Funding.search_vector for every campaign in id-ordered batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not search_enabled():
+            self.stdout.write('Full-text search needs PostgreSQL; nothing to rebuild.')
+            return
+
+        updated = 0
+        last_id = 0
+        while True:
+            ids = list(
+                Funding.objects.filter(id__gt=last_id).order_by('id')
+                .values_list('id', flat=True)[:options['batch_size']]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            updated += update_search_vectors(Funding.objects.filter(id__in=ids))
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt search vectors for {updated} campaigns.'))
@@ -0,0 +1,87 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from main_app.campaign_cache import bump_campaigns_on_commit
+from main_app.listings import refresh_listings_on_commit
+from main_app.models import Funding, Investment, Reservation
+
+class Command(BaseCommand):
+    help = 'Finds and repairs drift between Funding counters and their Investment rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without writing.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+
+        per_funding = Investment.objects.filter(funding=OuterRef('pk')).values('funding')
+        actual_amount = Coalesce(
+            Subquery(per_funding.annotate(total=Sum('amount')).values('total'), output_field=IntegerField()),
+            Value(0),
+        )
+        actual_count = Coalesce(
+            Subquery(per_funding.annotate(total=Count('id')).values('total'), output_field=IntegerField()),
+            Value(0),
+        )
+        held_amount = Coalesce(
+            Subquery(
+                Reservation.objects.filter(funding=OuterRef('pk'), status='Held').values('funding')
+                .annotate(total=Sum('amount')).values('total'),
+                output_field=IntegerField(),
+            ),
+            Value(0),
+        )
+        interest = Coalesce(
+            Subquery(
+                Funding.interested_users.through.objects.filter(funding=OuterRef('pk')).values('funding')
+                .annotate(total=Count('id')).values('total'),
+                output_field=IntegerField(),
+            ),
+            Value(0),
+        )
+
+        checked = 0
+        repaired = 0
+        last_id = 0
+        while True:
+            # Keyset batches keep each pass cheap no matter how many campaigns exist.
+            batch = list(
+                Funding.objects.filter(id__gt=last_id)
+                .order_by('id')
+                .annotate(
+                    actual_amount=actual_amount, actual_count=actual_count,
+                    held_amount=held_amount, actual_interest=interest,
+                )
+                .only('id', 'raised_amount', 'investor_count', 'reserved_amount', 'interest_count')[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+            checked += len(batch)
+
+            drifted = [
+                funding.id for funding in batch
+                if funding.raised_amount != funding.actual_amount
+                or funding.investor_count != funding.actual_count
+                or funding.reserved_amount != funding.held_amount
+                or funding.interest_count != funding.actual_interest
+            ]
+            repaired += len(drifted)
+
+            if drifted and not dry_run:
+                # Recompute inside the UPDATE itself so a concurrent investment is never overwritten.
+                with transaction.atomic():
+                    Funding.objects.filter(id__in=drifted).update(
+                        raised_amount=actual_amount, investor_count=actual_count,
+                        reserved_amount=held_amount, interest_count=interest,
+                    )
+                    bump_campaigns_on_commit(drifted)
+                    refresh_listings_on_commit(drifted)
+
+        verb = 'Found' if dry_run else 'Repaired'
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {checked} campaigns. {verb} {repaired} with drifted totals.'
+        ))
@@ -0,0 +1,36 @@
+from collections import defaultdict
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from main_app.models import Funding, Reservation
+
+class Command(BaseCommand):
+    help = 'Releases checkout capacity holds whose TTL has passed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        released_count = 0
+
+        while True:
+            with transaction.atomic():
+                expired = list(
+                    Reservation.objects.filter(status='Held', expires_at__lt=now)
+                    .order_by('id')
+                    .select_for_update(skip_locked=True)
+                    .values_list('id', 'funding_id', 'amount')[:options['batch_size']]
+                )
+                if not expired:
+                    break
+                Reservation.objects.filter(id__in=[row[0] for row in expired]).update(status='Released')
+                held_by_funding = defaultdict(int)
+                for _, funding_id, amount in expired:
+                    held_by_funding[funding_id] += amount
+                for funding_id, amount in held_by_funding.items():
+                    Funding.objects.filter(pk=funding_id).update(reserved_amount=F('reserved_amount') - amount)
+            released_count += len(expired)
+
+        self.stdout.write(self.style.SUCCESS(f'Released {released_count} expired reservations.'))
@@ -0,0 +1,59 @@
+import json
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from main_app.fake_stripe import load_events, sign_payload
+from main_app.payments import InvalidWebhook, parse_webhook, record_event
+
+class Command(BaseCommand):
+    help = 'Delivers events recorded by the fake Stripe backend to the webhook, signed like Stripe would.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Post to a running server instead of dispatching in-process.')
+        parser.add_argument('--last', type=int, help='Only replay the N most recent events.')
+
+    def handle(self, *args, **options):
+        if not settings.STRIPE_WEBHOOK_SECRET:
+            raise CommandError('Set STRIPE_WEBHOOK_SECRET so replayed events can be signed.')
+
+        events = load_events()
+        if options['last']:
+            events = events[-options['last']:]
+        self.stdout.write(f'Replaying {len(events)} events...')
+
+        failed = 0
+        for event in events:
+            payload = json.dumps(event)
+            signature = sign_payload(payload, settings.STRIPE_WEBHOOK_SECRET)
+            if options['url']:
+                accepted, outcome = self.post(options['url'], payload, signature)
+            else:
+                accepted, outcome = self.dispatch(payload, signature)
+            failed += not accepted
+            self.stdout.write(f"{event['id']} {event['type']} -> {outcome}")
+
+        if failed:
+            raise CommandError(f'{failed} of {len(events)} events were not accepted.')
+        self.stdout.write(self.style.SUCCESS('Replay complete.'))
+
+    def dispatch(self, payload, signature):
+        # The same path as the webhook view, without going through the HTTP stack.
+        try:
+            event = parse_webhook(payload, signature)
+        except InvalidWebhook as e:
+            return False, f'rejected: {e}'
+        return True, 'recorded' if record_event(event) else 'already recorded'
+
+    def post(self, url, payload, signature):
+        request = Request(url, data=payload.encode(), method='POST', headers={
+            'Content-Type': 'application/json', 'Stripe-Signature': signature,
+        })
+        try:
+            with urlopen(request) as response:
+                status = response.status
+        except HTTPError as e:
+            status = e.code
+        except URLError as e:
+            raise CommandError(f'Could not reach {url}: {e.reason}') from e
+        return 200 <= status < 300, status
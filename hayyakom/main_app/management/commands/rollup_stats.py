@@ -0,0 +1,25 @@
+import time
+from django.core.management.base import BaseCommand
+from main_app.stats import SOURCES, reset_rollups, rollup_source
+
+class Command(BaseCommand):
+    help = 'Folds investments and interest clicks added since the last run into the daily funding rollups.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--lag-seconds', type=int, help='Leave rows younger than this for the next run.')
+        parser.add_argument('--rebuild', action='store_true', help='Drop the rollups and watermarks and aggregate everything again.')
+        parser.add_argument('--loop', action='store_true', help='Keep rolling up every --interval seconds.')
+        parser.add_argument('--interval', type=float, default=60.0)
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            reset_rollups()
+            self.stdout.write('Cleared the daily rollups.')
+        while True:
+            for name in SOURCES:
+                count = rollup_source(name, batch_size=options['batch_size'], lag_seconds=options['lag_seconds'])
+                self.stdout.write(f'Rolled up {count} new {name}.')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from main_app.lifecycle import reschedule_all, run_due_transitions, run_worker
+
+class Command(BaseCommand):
+    help = 'Applies due campaign lifecycle transitions (pulse reveal, early access, launch, settlement), sleeping until the next one is due.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Apply the transitions due now and exit.')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Campaigns advanced per transaction.')
+        parser.add_argument('--max-sleep', type=int, help='Longest sleep between checks, in seconds.')
+        parser.add_argument('--reschedule', action='store_true', help='Recompute next_transition_at for every campaign first.')
+
+    def handle(self, *args, **options):
+        if options['reschedule']:
+            self.stdout.write(f'Rescheduled {reschedule_all()} campaigns.')
+        if options['once']:
+            moved, settled = run_due_transitions(chunk_size=options['chunk_size'])
+            self.stdout.write(self.style.SUCCESS(f'Advanced {moved} campaigns and settled {settled}.'))
+            return
+        self.stdout.write('Waiting for due campaign transitions...')
+        run_worker(chunk_size=options['chunk_size'], max_sleep=options['max_sleep'], log=self.stdout.write)
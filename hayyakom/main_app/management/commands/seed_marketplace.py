@@ -0,0 +1,168 @@
+import random
+from datetime import timedelta
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from main_app.models import (
+    CATEGORY_CHOICES, Company, Funding, Investment, Milestone, Notification, Profile
+)
+from main_app.pulse import current_sunday
+
+WORDS = (
+    'coffee roastery bakery fitness studio pearl diving tours boutique tailoring app delivery '
+    'clinic gallery courier dates farm solar kiosk workshop gaming cafe spices logistics'
+).split()
+
+
+class Command(BaseCommand):
+    help = 'Generates a synthetic marketplace with bulk_create for benchmarking. All seeded users share the password "bench".'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fundings', type=int, default=100_000)
+        parser.add_argument('--investments', type=int, default=1_000_000)
+        parser.add_argument('--notifications', type=int, default=5_000_000)
+        parser.add_argument('--investors', type=int, default=50_000)
+        parser.add_argument('--owners', type=int, default=20_000)
+        parser.add_argument('--pulse-campaigns', type=int, default=12)
+        parser.add_argument('--interests-per-pulse', type=int, default=5_000)
+        parser.add_argument('--scale', type=float, default=1.0, help='Multiplies every volume, e.g. 0.01 for a quick run.')
+        parser.add_argument('--batch-size', type=int, default=5_000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        scale = options['scale']
+        self.batch_size = options['batch_size']
+        self.rng = random.Random(options['seed'])
+        counts = {
+            key: max(1, int(options[key] * scale))
+            for key in ('fundings', 'investments', 'notifications', 'investors', 'owners', 'interests_per_pulse')
+        }
+        self.prefix = f'bench{timezone.now():%Y%m%d%H%M%S}'
+
+        owner_ids = self.create_users('owner', counts['owners'], 'Owner')
+        investor_ids = self.create_users('investor', counts['investors'], 'Investor')
+        company_ids = self.create_companies(owner_ids)
+        funding_ids = self.create_fundings(company_ids, counts['fundings'], options['pulse_campaigns'])
+        self.create_investments(funding_ids, investor_ids, counts['investments'])
+        self.create_interests(funding_ids[:options['pulse_campaigns']], investor_ids, counts['interests_per_pulse'])
+        self.create_notifications(investor_ids, funding_ids, counts['notifications'])
+
+        self.stdout.write('Rebuilding stored campaign totals...')
+        call_command('reconcile_funding_totals', stdout=self.stdout)
+        call_command('rebuild_search_vectors', stdout=self.stdout)
+        call_command('rebuild_listings', stdout=self.stdout)
+        call_command('rollup_stats', rebuild=True, lag_seconds=0, stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'Seeded marketplace with prefix {self.prefix}.'))
+
+    def write(self, model, rows):
+        created = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == self.batch_size:
+                model.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        if batch:
+            model.objects.bulk_create(batch)
+            created += len(batch)
+        self.stdout.write(f'  {created} {model.__name__} rows')
+
+    def create_users(self, kind, count, role):
+        password = make_password('bench')
+        self.write(User, (
+            User(username=f'{self.prefix}_{kind}_{i}', first_name=f'{kind.title()}{i}', password=password)
+            for i in range(count)
+        ))
+        user_ids = list(
+            User.objects.filter(username__startswith=f'{self.prefix}_{kind}_').order_by('id').values_list('id', flat=True)
+        )
+        self.write(Profile, (Profile(user_id=user_id, role=role, phone_number='3300' + str(user_id)[-4:]) for user_id in user_ids))
+        return user_ids
+
+    def create_companies(self, owner_ids):
+        self.write(Company, (
+            Company(owner_id=owner_id, company_name=f'{self.rng.choice(WORDS).title()} Co {owner_id}', cr_number=str(owner_id))
+            for owner_id in owner_ids
+        ))
+        return list(Company.objects.filter(owner_id__in=owner_ids).order_by('id').values_list('id', flat=True))
+
+    def create_fundings(self, company_ids, count, pulse_campaigns):
+        today = timezone.now().date()
+        sunday = current_sunday(today)
+        categories = [value for value, _ in CATEGORY_CHOICES]
+        statuses = ['In Process'] * 6 + ['Completed', 'Failed', 'Pending Approval', 'Pending Pulse']
+
+        def rows():
+            for i in range(count):
+                in_pulse = i < pulse_campaigns
+                status = 'In Pulse' if in_pulse else self.rng.choice(statuses)
+                funding = Funding(
+                    company_id=company_ids[i % len(company_ids)],
+                    campaign_name=f'{self.rng.choice(WORDS).title()} {self.rng.choice(WORDS)} {i}',
+                    description=' '.join(self.rng.choice(WORDS) for _ in range(60)),
+                    goal=self.rng.choice([20_000, 50_000, 100_000, 250_000]),
+                    end_date=today + timedelta(days=self.rng.randint(-60, 120)),
+                    status=status,
+                    is_approved=status not in ('Pending Approval',),
+                    category=self.rng.choice(categories),
+                    reveal_date=sunday if in_pulse else None,
+                )
+                # bulk_create skips save(), which normally schedules the next transition.
+                funding.next_transition_at = funding.lifecycle_due_at()
+                yield funding
+
+        self.write(Funding, rows())
+        funding_ids = list(
+            Funding.objects.filter(company_id__in=company_ids).order_by('id').values_list('id', flat=True)
+        )
+        self.write(Milestone, (
+            Milestone(funding_id=funding_id, title=f'Phase {n}', target_date=today + timedelta(days=30 * n))
+            for funding_id in funding_ids[:max(1, len(funding_ids) // 10)] for n in range(1, 4)
+        ))
+        return funding_ids
+
+    def create_investments(self, funding_ids, investor_ids, count):
+        # Campaign f gets rounds r = 0, 1, 2...; investor (f * 31 + r) never repeats within a campaign.
+        funding_count = len(funding_ids)
+        investor_count = len(investor_ids)
+        statuses = ['Pledged'] * 8 + ['Collected', 'Returned']
+        now = timezone.now()
+
+        def rows():
+            for i in range(count):
+                f, r = i % funding_count, i // funding_count
+                yield Investment(
+                    investor_id=investor_ids[(f * 31 + r) % investor_count],
+                    funding_id=funding_ids[f],
+                    amount=self.rng.randint(2000, 5000),
+                    status=self.rng.choice(statuses),
+                    # Spread over the last 90 days so the velocity dashboard has a history.
+                    created_at=now - timedelta(minutes=self.rng.randint(0, 90 * 24 * 60)),
+                )
+
+        self.write(Investment, rows())
+
+    def create_interests(self, pulse_ids, investor_ids, per_campaign):
+        Through = Funding.interested_users.through
+        self.write(Through, (
+            Through(funding_id=funding_id, user_id=user_id)
+            for funding_id in pulse_ids
+            for user_id in investor_ids[:per_campaign]
+        ))
+
+    def create_notifications(self, investor_ids, funding_ids, count):
+        # A quarter of the volume lands on the first investor to model a long-lived account.
+        def rows():
+            for i in range(count):
+                user_id = investor_ids[0] if i % 4 == 0 else self.rng.choice(investor_ids)
+                yield Notification(
+                    user_id=user_id,
+                    message=f"A milestone has been completed for campaign #{funding_ids[i % len(funding_ids)]}.",
+                    is_read=self.rng.random() < 0.8,
+                    related_funding_id=funding_ids[i % len(funding_ids)],
+                )
+
+        self.write(Notification, rows())
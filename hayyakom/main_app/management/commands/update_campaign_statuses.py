@@ -1,57 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from main_app.models import Funding, Notification
+from main_app.settlement import expired_campaigns, reset_checkpoint, settle_expired, settle_expired_worker
 
 class Command(BaseCommand):
     help = 'Updates the status of campaigns that have passed their end date.'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Campaigns settled per transaction.')
+        parser.add_argument('--workers', type=int, default=1, help='Parallel settlement workers (rows are claimed with SKIP LOCKED).')
+        parser.add_argument('--restart', action='store_true', help='Ignore the saved checkpoint and start from the first campaign.')
+
     def handle(self, *args, **options):
         # Get the current date
         today = timezone.now().date()
-        
-        # Find all campaigns that are still "In Process" but their end date has passed
-        expired_campaigns = Funding.objects.filter(status='In Process', end_date__lt=today)
-        
-        self.stdout.write(f'Found {expired_campaigns.count()} expired campaigns to process...')
+        chunk_size = options['chunk_size']
+        workers = options['workers']
+
+        self.stdout.write(f'Found {expired_campaigns(today).count()} expired campaigns to process...')
 
-        completed_count = 0
-        failed_count = 0
+        if workers > 1:
+            # Workers always resume, so a restart rewinds the shared checkpoint before they start.
+            if options['restart']:
+                reset_checkpoint()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(lambda _: settle_expired_worker(today, chunk_size), range(workers)))
+        else:
+            results = [settle_expired(today, chunk_size=chunk_size, resume=not options['restart'])]
 
-        # Loop through the expired campaigns
-        for campaign in expired_campaigns:
-            if campaign.total_invested() >= campaign.goal:
-                # --- Handle successful campaigns ---
-                campaign.status = 'Completed'
-                completed_count += 1
-                
-                investments = campaign.investment_set.all()
-                for investment in investments:
-                    investment.status = 'Collected'
-                    investment.save()
-                    Notification.objects.create(
-                        user=investment.investor,
-                        message=f"Good news! The campaign '{campaign.campaign_name}' was successful. Your investment of {investment.amount} BD has been collected.",
-                        related_funding=campaign
-                    )
-            else:
-                # --- Handle failed campaigns ---
-                campaign.status = 'Failed'
-                failed_count += 1
-                
-                investments_to_return = campaign.investment_set.filter(status='Pledged')
-                for investment in investments_to_return:
-                    investment.status = 'Returned'
-                    investment.save()
-                    Notification.objects.create(
-                        user=investment.investor,
-                        message=f"The campaign '{campaign.campaign_name}' did not meet its goal. Your investment of {investment.amount} BD has been marked as returned.",
-                        related_funding=campaign
-                    )
-            
-            # Save the updated campaign status
-            campaign.save()
+        completed_count = sum(completed for completed, _ in results)
+        failed_count = sum(failed for _, failed in results)
 
         # Print a final success message to the terminal
         self.stdout.write(self.style.SUCCESS(
             f'Processing complete. Marked {completed_count} as Completed and {failed_count} as Failed.'
-        ))
\ No newline at end of file
+        ))
@@ -1,7 +1,11 @@
-from django.db import models
+from datetime import datetime, time, timedelta
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.urls import reverse
-from django.db.models import Sum
+from django.utils import timezone
+from django.db.models import F, Sum
 # ============================================================================
 # Choices Tuples
 # ============================================================================
@@ -21,6 +25,19 @@ INVESTMENT_STATUS_CHOICES = (
     ('Returned', 'Returned'),
 )
 
+RESERVATION_STATUS_CHOICES = (
+    ('Held', 'Held'),
+    ('Converted', 'Converted'),
+    ('Released', 'Released'),
+)
+
+# Weekly Pulse schedule, counted from the Sunday reveal: early access for interested
+# investors opens on Thursday and the campaign goes live for everyone on Friday.
+EARLY_ACCESS_AFTER_DAYS = 4
+LAUNCH_AFTER_DAYS = 5
+# Changing any of these can move a campaign's next lifecycle transition.
+LIFECYCLE_FIELDS = {'status', 'reveal_date', 'end_date'}
+
 CATEGORY_CHOICES = (
     ('Technology', 'Technology'),
     ('Food & Beverage', 'Food & Beverage'),
@@ -30,6 +47,10 @@ CATEGORY_CHOICES = (
     ('Business', 'Business'),
     ('Other', 'Other'),
 )
+
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
 # ============================================================================
 # User & Company Models
 # ============================================================================
@@ -62,6 +83,30 @@ class Funding(models.Model):
     category = models.CharField(max_length=50, choices=CATEGORY_CHOICES, default='Other')
     interested_users = models.ManyToManyField(User, related_name='interested_campaigns', blank=True)
     reveal_date = models.DateField(null=True, blank=True)
+    # Maintained by record_investment(); repaired by `reconcile_funding_totals`. Never
+    # written by forms: a full save would overwrite concurrent F() increments.
+    raised_amount = models.IntegerField(default=0, editable=False)
+    investor_count = models.IntegerField(default=0, editable=False)
+    # Maintained by main_app.interest.apply_interest() when buffered clicks are flushed.
+    interest_count = models.IntegerField(default=0, editable=False)
+    # Sum of live checkout holds; see reserve_capacity() and Reservation.release().
+    reserved_amount = models.IntegerField(default=0, editable=False)
+    # Maintained by main_app.search.update_search_vectors() on PostgreSQL.
+    search_vector = SearchVectorField(null=True, editable=False)
+    # When `run_lifecycle` should move the campaign on; kept in step by save() and the bulk paths.
+    next_transition_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='funding_search_vector_gin'),
+            GinIndex(fields=['campaign_name'], opclasses=['gin_trgm_ops'], name='funding_name_trgm_gin'),
+            # Only scheduled campaigns are indexed, so finding the next due one stays cheap.
+            models.Index(
+                fields=['next_transition_at'],
+                condition=models.Q(next_transition_at__isnull=False),
+                name='funding_next_transition_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.campaign_name
@@ -69,17 +114,73 @@ class Funding(models.Model):
     def get_absolute_url(self):
         return reverse('funding_detail', kwargs={'pk': self.id})
 
+    def save(self, *args, **kwargs):
+        self.next_transition_at = self.lifecycle_due_at()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and LIFECYCLE_FIELDS.intersection(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'next_transition_at'}
+        super().save(*args, **kwargs)
+
+    def lifecycle_due_at(self):
+        if self.status == 'Pending Pulse' and self.reveal_date:
+            day = self.reveal_date
+        elif self.status == 'In Pulse' and self.reveal_date:
+            day = self.reveal_date + timedelta(days=EARLY_ACCESS_AFTER_DAYS)
+        elif self.status == 'Early Access' and self.reveal_date:
+            day = self.reveal_date + timedelta(days=LAUNCH_AFTER_DAYS)
+        elif self.status == 'In Process' and self.end_date:
+            # Settled once its end date has fully passed.
+            day = self.end_date + timedelta(days=1)
+        else:
+            return None
+        return start_of_day(day)
+
     def total_invested(self):
-        result = self.investment_set.aggregate(total=Sum('amount'))
-        return result['total'] or 0
+        return self.raised_amount
 
     def progress_percentage(self):
         if self.goal > 0:
-            return (self.total_invested() / self.goal) * 100
+            return (self.raised_amount / self.goal) * 100
         return 0
+
+    def remaining_capacity(self, investor=None):
+        remaining = self.goal - self.raised_amount - self.reserved_amount
+        if investor is not None:
+            # hold_capacity() releases the investor's own holds before reserving again.
+            held = Reservation.objects.filter(funding=self, investor=investor, status='Held').aggregate(total=Sum('amount'))
+            remaining += held['total'] or 0
+        return remaining
+
+    def reserve_capacity(self, investor, amount, ttl):
+        # A single conditional UPDATE claims the capacity: concurrent checkouts near the
+        # goal race on the row, not on a table lock, and the losers simply get None.
+        with transaction.atomic():
+            claimed = Funding.objects.filter(
+                pk=self.pk, goal__gte=F('raised_amount') + F('reserved_amount') + amount
+            ).update(reserved_amount=F('reserved_amount') + amount)
+            if not claimed:
+                return None
+            reservation = Reservation.objects.create(
+                funding=self, investor=investor, amount=amount, expires_at=timezone.now() + ttl
+            )
+        self.refresh_from_db(fields=['raised_amount', 'reserved_amount'])
+        return reservation
+
+    def record_investment(self, investor, amount, reservation=None, **fields):
+        with transaction.atomic():
+            investment = Investment.objects.create(investor=investor, funding=self, amount=amount, **fields)
+            held = reservation.amount if reservation and reservation.convert() else 0
+            Funding.objects.filter(pk=self.pk).update(
+                raised_amount=F('raised_amount') + amount,
+                investor_count=F('investor_count') + 1,
+                reserved_amount=F('reserved_amount') - held,
+            )
+        self.refresh_from_db(fields=['raised_amount', 'investor_count', 'reserved_amount'])
+        return investment
+
     def interest_progress_percentage(self):
         target = 10
-        count = self.interested_users.count()
+        count = self.interest_count
         if target > 0:
             return (count / target) * 100
         return 0
@@ -89,10 +190,81 @@ class Investment(models.Model):
     funding = models.ForeignKey(Funding, on_delete=models.CASCADE)
     amount = models.IntegerField()
     status = models.CharField(max_length=20, choices=INVESTMENT_STATUS_CHOICES, default='Pledged')
+    checkout_session_id = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
 
     def __str__(self):
         return f"{self.amount} by {self.investor.first_name} for {self.funding.campaign_name}"
 
+class Reservation(models.Model):
+    funding = models.ForeignKey(Funding, on_delete=models.CASCADE)
+    investor = models.ForeignKey(User, on_delete=models.CASCADE)
+    amount = models.IntegerField()
+    status = models.CharField(max_length=20, choices=RESERVATION_STATUS_CHOICES, default='Held')
+    expires_at = models.DateTimeField()
+    checkout_session_id = models.CharField(max_length=255, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'expires_at'], name='reservation_status_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.amount} held by {self.investor.username} ({self.status})"
+
+    def convert(self):
+        return Reservation.objects.filter(pk=self.pk, status='Held').update(status='Converted') == 1
+
+    def release(self):
+        with transaction.atomic():
+            released = Reservation.objects.filter(pk=self.pk, status='Held').update(status='Released')
+            if released:
+                Funding.objects.filter(pk=self.funding_id).update(reserved_amount=F('reserved_amount') - self.amount)
+        return released == 1
+
+class ActiveCampaignListing(models.Model):
+    # Read model for the home page: one row per approved 'In Process' campaign holding
+    # exactly what a card renders. Maintained by main_app.listings.
+    funding = models.OneToOneField(Funding, on_delete=models.CASCADE, primary_key=True, related_name='listing')
+    campaign_name = models.CharField(max_length=200)
+    company_name = models.CharField(max_length=100)
+    summary = models.TextField()
+    goal = models.IntegerField()
+    raised_amount = models.IntegerField()
+    progress_percentage = models.FloatField()
+    category = models.CharField(max_length=50)
+    end_date = models.DateField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-end_date', '-funding'], name='listing_end_date_idx'),
+            models.Index(fields=['category', '-end_date', '-funding'], name='listing_category_idx'),
+        ]
+
+    def __str__(self):
+        return self.campaign_name
+
+    @property
+    def id(self):
+        return self.funding_id
+
+class CampaignRecommendation(models.Model):
+    # Top-K similar campaigns per campaign, written by `build_recommendations`.
+    # Serving is one lookup on (funding, rank).
+    funding = models.ForeignKey(Funding, on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey(Funding, on_delete=models.CASCADE, related_name='recommended_in')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['funding', 'rank'], name='recommendation_funding_rank_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.funding_id} -> {self.recommended_id} (#{self.rank})"
+
 # ============================================================================
 # Feature-Specific Models
 # ============================================================================
@@ -103,9 +275,72 @@ class Notification(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     related_funding = models.ForeignKey(Funding, on_delete=models.CASCADE, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'is_read', 'created_at'], name='notification_user_unread_idx'),
+        ]
+
     def __str__(self):
         return f"Notification for {self.user.username}: {self.message[:30]}"
 
+class NotificationArchive(models.Model):
+    # One chunk of archived notifications, stored as gzip-compressed JSON lines.
+    first_id = models.BigIntegerField()
+    last_id = models.BigIntegerField()
+    row_count = models.IntegerField()
+    oldest = models.DateTimeField()
+    newest = models.DateTimeField()
+    payload = models.BinaryField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.row_count} notifications #{self.first_id}-#{self.last_id}"
+
+class NotificationFanout(models.Model):
+    message = models.TextField()
+    related_funding = models.ForeignKey(Funding, on_delete=models.CASCADE)
+    # A key of main_app.notifications.AUDIENCES, resolved against related_funding by `drain_notifications`.
+    audience = models.CharField(max_length=30)
+    last_user_id = models.BigIntegerField(default=0)
+    delivered_count = models.IntegerField(default=0)
+    is_done = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Fan-out of '{self.message[:30]}' ({self.delivered_count} delivered)"
+
+class InterestClick(models.Model):
+    # Append-only buffer written by show_interest; folded into interested_users by `flush_interest`.
+    funding = models.ForeignKey(Funding, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.funding_id}"
+
+class DailyFundingStats(models.Model):
+    # Written by `rollup_stats`. Rows with a funding are per campaign; rows without one
+    # are the totals of their category.
+    day = models.DateField()
+    funding = models.ForeignKey(Funding, on_delete=models.CASCADE, null=True, blank=True)
+    category = models.CharField(max_length=50, choices=CATEGORY_CHOICES)
+    pledges = models.IntegerField(default=0)
+    amount = models.BigIntegerField(default=0)
+    interests = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['funding', 'day'], condition=models.Q(funding__isnull=False), name='daily_stats_funding_day_uniq'
+            ),
+            models.UniqueConstraint(
+                fields=['category', 'day'], condition=models.Q(funding__isnull=True), name='daily_stats_category_day_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.funding_id or self.category} on {self.day}"
+
 class Milestone(models.Model):
     funding = models.ForeignKey(Funding, on_delete=models.CASCADE)
     title = models.CharField(max_length=200)
@@ -116,4 +351,86 @@ class Milestone(models.Model):
         ordering = ['target_date']
 
     def __str__(self):
-        return f"{self.title} for {self.funding.campaign_name}"
\ No newline at end of file
+        return f"{self.title} for {self.funding.campaign_name}"
+
+# ============================================================================
+# Payment Models
+# ============================================================================
+class PaymentEvent(models.Model):
+    event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.event_type} ({self.event_id})"
+
+# ============================================================================
+# Background Job Models
+# ============================================================================
+class JobCheckpoint(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
+# ============================================================================
+# Instrumentation Models
+# ============================================================================
+class RequestSample(models.Model):
+    # One sampled request recorded by SQLInstrumentationMiddleware.
+    view_name = models.CharField(max_length=200)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    status_code = models.PositiveSmallIntegerField()
+    query_count = models.PositiveIntegerField()
+    db_time_ms = models.FloatField()
+    total_time_ms = models.FloatField()
+    slowest_queries = models.JSONField(default=list)
+    n_plus_one = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'view_name'], name='request_sample_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.method} {self.view_name}: {self.query_count} queries in {self.db_time_ms:.1f}ms"
+
+class ProfileSample(models.Model):
+    # One request profiled by ProfilerMiddleware; stacks map collapsed frames to sample counts.
+    TRIGGER_CHOICES = (
+        ('header', 'Signed header'),
+        ('target', 'Admin target'),
+        ('sampled', 'Random sample'),
+    )
+    view_name = models.CharField(max_length=200)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    status_code = models.PositiveSmallIntegerField()
+    trigger = models.CharField(max_length=10, choices=TRIGGER_CHOICES)
+    duration_ms = models.FloatField()
+    interval_ms = models.FloatField()
+    sample_count = models.PositiveIntegerField()
+    stacks = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'view_name'], name='profile_sample_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.method} {self.view_name}: {self.sample_count} samples in {self.duration_ms:.1f}ms"
+
+
+class ProfilingTarget(models.Model):
+    # Admin toggle: every request to view_name (all views when blank) is profiled until `until`.
+    view_name = models.CharField(max_length=200, blank=True)
+    until = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.view_name or 'All views'} until {self.until:%Y-%m-%d %H:%M}"
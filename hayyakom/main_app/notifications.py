@@ -0,0 +1,133 @@
+import time
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from .models import Notification, NotificationFanout
+from .routers import read_primary
+
+# ============================================================================
+# Unread Counter
+# ============================================================================
+# The badge count lives in the cache next to a per-user generation. Writes never
+# adjust the count (an increment on a missing key, or one racing a reader that is
+# still counting, is lost); they bump the generation after commit, and a count
+# stored under an older generation is recounted with an indexed COUNT.
+
+def _unread_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def _generation_key(user_id):
+    return f'notifications:unread-generation:{user_id}'
+
+
+def unread_count(user_id):
+    key, generation_key = _unread_key(user_id), _generation_key(user_id)
+    cached = cache.get_many([key, generation_key])
+    generation = cached.get(generation_key)
+    if generation is None:
+        # A fresh, unpredictable start so counts stored before an eviction never match.
+        cache.add(generation_key, time.time_ns(), None)
+        generation = cache.get(generation_key)
+    entry = cached.get(key)
+    if entry is not None and entry[0] == generation:
+        return entry[1]
+    # The generation was read before counting: a write that commits meanwhile bumps it
+    # afterwards, so this count is stored as already stale instead of as current.
+    count = read_primary(Notification).filter(user_id=user_id, is_read=False).count()
+    cache.set(key, (generation, count), settings.NOTIFICATION_UNREAD_CACHE_TIMEOUT)
+    return count
+
+
+def _forget_unread(user_ids):
+    for user_id in set(user_ids):
+        try:
+            cache.incr(_generation_key(user_id))
+        except ValueError:
+            # No generation yet: nothing cached for this user can be trusted anyway.
+            pass
+
+
+def mark_read(user_id, notifications):
+    unread_ids = [n.pk for n in notifications if not n.is_read]
+    if not unread_ids:
+        return 0
+    updated = Notification.objects.filter(pk__in=unread_ids, user_id=user_id, is_read=False).update(is_read=True)
+    if updated:
+        transaction.on_commit(lambda: _forget_unread([user_id]))
+    return updated
+
+# ============================================================================
+# Notification Service
+# ============================================================================
+
+def notify(user, message, funding=None):
+    notification = Notification.objects.create(user=user, message=message, related_funding=funding)
+    transaction.on_commit(lambda: _forget_unread([notification.user_id]))
+    return notification
+
+
+def create_notifications(notifications):
+    created = Notification.objects.bulk_create(notifications, batch_size=settings.NOTIFICATION_BATCH_SIZE)
+    user_ids = [n.user_id for n in created]
+    transaction.on_commit(lambda: _forget_unread(user_ids))
+    return created
+
+
+def _write_batch(user_ids, message, funding_id):
+    create_notifications([
+        Notification(user_id=user_id, message=message, related_funding_id=funding_id)
+        for user_id in user_ids
+    ])
+
+
+# Recipients are named, not stored as querysets: a deferred fan-out records the
+# audience and its campaign, and the drain rebuilds the queryset from them.
+AUDIENCES = {
+    'investors': lambda funding_id: User.objects.filter(investment__funding_id=funding_id).distinct(),
+    'interested': lambda funding_id: User.objects.filter(interested_campaigns=funding_id),
+}
+
+
+def audience_user_ids(audience, funding_id):
+    return AUDIENCES[audience](funding_id).values_list('pk', flat=True).order_by('pk')
+
+
+def notify_many(audience, message, funding):
+    # Small audiences are written inline in fixed-size batches; larger ones are queued
+    # for `drain_notifications` so the caller's request costs the same at any size.
+    # Returns the number written now, or None when the fan-out was deferred.
+    threshold = settings.NOTIFICATION_DEFER_THRESHOLD
+    head = list(audience_user_ids(audience, funding.pk)[:threshold + 1])
+    if len(head) > threshold:
+        NotificationFanout.objects.create(message=message, related_funding=funding, audience=audience)
+        return None
+    funding_id = funding.pk
+
+    batch_size = settings.NOTIFICATION_BATCH_SIZE
+    for start in range(0, len(head), batch_size):
+        _write_batch(head[start:start + batch_size], message, funding_id)
+    return len(head)
+
+
+def drain_fanout(fanout_id):
+    # Each batch commits with the fan-out's position, so a crash never re-sends.
+    batch_size = settings.NOTIFICATION_BATCH_SIZE
+    while True:
+        with transaction.atomic():
+            fanout = NotificationFanout.objects.select_for_update(skip_locked=True).filter(
+                pk=fanout_id, is_done=False
+            ).first()
+            if fanout is None:
+                return
+            recipients = audience_user_ids(fanout.audience, fanout.related_funding_id)
+            user_ids = list(recipients.filter(pk__gt=fanout.last_user_id)[:batch_size])
+            if user_ids:
+                _write_batch(user_ids, fanout.message, fanout.related_funding_id)
+                fanout.last_user_id = user_ids[-1]
+                fanout.delivered_count += len(user_ids)
+            fanout.is_done = len(user_ids) < batch_size
+            fanout.save(update_fields=['last_user_id', 'delivered_count', 'is_done'])
+            if fanout.is_done:
+                return
@@ -0,0 +1,223 @@
+import base64
+import json
+from datetime import date, datetime
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.dateparse import parse_date, parse_datetime
+
+# ============================================================================
+# Keyset (cursor) Pagination
+# ============================================================================
+# Pages are selected with a WHERE on the sort keys of the last row seen instead
+# of OFFSET, and "has next" comes from fetching one extra row instead of COUNT(*),
+# so page 500 costs the same as page 1. The queryset's own order_by() is the
+# sort key and must end with a unique column such as 'id'.
+
+DEFAULT_PAGE_SIZE = 20
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return parse_datetime(value['dt'])
+        if 'd' in value:
+            return parse_date(value['d'])
+    return value
+
+
+def encode_cursor(direction, values):
+    payload = json.dumps([direction, [_encode_value(v) for v in values]], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if direction not in ('next', 'prev') or not isinstance(values, list):
+            return None
+        return direction, [_decode_value(v) for v in values]
+    except (ValueError, TypeError):
+        return None
+
+
+def _key_field(queryset, key):
+    name = key.lstrip('-')
+    if name in queryset.query.annotations:
+        return queryset.query.annotations[name].output_field
+    if name == 'pk':
+        return queryset.model._meta.pk
+    return queryset.model._meta.get_field(name)
+
+
+def _coerce_cursor_values(queryset, keys, values):
+    # The cursor comes from the query string: every value has to be a valid, non-null
+    # value of its sort key before it reaches the WHERE clause. Anything else is None.
+    if len(values) != len(keys):
+        return None
+    coerced = []
+    for key, value in zip(keys, values):
+        try:
+            field = _key_field(queryset, key)
+            value = field.to_python(value)
+            if value is not None:
+                # Range checks: an id past the column's range fails in the database, not here.
+                field.run_validators(value)
+        except (FieldDoesNotExist, ValidationError, TypeError, ValueError):
+            return None
+        if value is None:
+            return None
+        coerced.append(value)
+    return coerced
+
+
+def _keyset_filter(keys, values, forward):
+    # (a, b, id) > (x, y, z) expanded into OR-ed prefixes, honouring each key's direction.
+    condition = Q()
+    for index, key in enumerate(keys):
+        name = key.lstrip('-')
+        descending = key.startswith('-') == forward
+        term = Q(**{f"{name}__{'lt' if descending else 'gt'}": values[index]})
+        for prefix_key, prefix_value in zip(keys[:index], values[:index]):
+            term &= Q(**{prefix_key.lstrip('-'): prefix_value})
+        condition |= term
+    return condition
+
+
+def _reverse(key):
+    return key[1:] if key.startswith('-') else f'-{key}'
+
+
+class KeysetPage:
+    def __init__(self, object_list, request, cursor_param, next_values, previous_values):
+        self.object_list = object_list
+        self.request = request
+        self.cursor_param = cursor_param
+        self.next_cursor = encode_cursor('next', next_values) if next_values else None
+        self.previous_cursor = encode_cursor('prev', previous_values) if previous_values else None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def _query_for(self, cursor):
+        params = self.request.GET.copy()
+        params[self.cursor_param] = cursor
+        return params.urlencode()
+
+    @property
+    def next_query(self):
+        return self._query_for(self.next_cursor) if self.next_cursor else ''
+
+    @property
+    def previous_query(self):
+        return self._query_for(self.previous_cursor) if self.previous_cursor else ''
+
+
+def _page_query(queryset, request, per_page, cursor_param):
+    keys = list(queryset.query.order_by)
+    if not keys or keys[-1].lstrip('-') not in ('id', 'pk'):
+        raise ValueError('Keyset pagination needs an ordering that ends with the primary key.')
+
+    cursor = decode_cursor(request.GET.get(cursor_param, ''))
+    if cursor:
+        values = _coerce_cursor_values(queryset, keys, cursor[1])
+        cursor = (cursor[0], values) if values is not None else None
+
+    if cursor and cursor[0] == 'prev':
+        queryset = queryset.filter(_keyset_filter(keys, cursor[1], forward=False)).order_by(*[_reverse(k) for k in keys])
+    elif cursor:
+        queryset = queryset.filter(_keyset_filter(keys, cursor[1], forward=True))
+    return keys, cursor, queryset[:per_page + 1]
+
+
+def _build_page(rows, keys, cursor, request, per_page, cursor_param):
+    if cursor and cursor[0] == 'prev':
+        has_more_before = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        has_more_after = True
+    else:
+        has_more_after = len(rows) > per_page
+        rows = rows[:per_page]
+        has_more_before = cursor is not None
+
+    def key_values(row):
+        if isinstance(row, dict):
+            return [row[key.lstrip('-')] for key in keys]
+        return [getattr(row, key.lstrip('-')) for key in keys]
+
+    next_values = key_values(rows[-1]) if rows and has_more_after else None
+    previous_values = key_values(rows[0]) if rows and has_more_before else None
+    return KeysetPage(rows, request, cursor_param, next_values, previous_values)
+
+
+def paginate_keyset(queryset, request, per_page=DEFAULT_PAGE_SIZE, cursor_param='cursor'):
+    keys, cursor, page_query = _page_query(queryset, request, per_page, cursor_param)
+    return _build_page(list(page_query), keys, cursor, request, per_page, cursor_param)
+
+
+async def apaginate_keyset(queryset, request, per_page=DEFAULT_PAGE_SIZE, cursor_param='cursor'):
+    keys, cursor, page_query = _page_query(queryset, request, per_page, cursor_param)
+    rows = [row async for row in page_query]
+    return _build_page(rows, keys, cursor, request, per_page, cursor_param)
+
+
+class KeysetPaginationMixin:
+    page_size = DEFAULT_PAGE_SIZE
+
+    def get_context_data(self, **kwargs):
+        page = paginate_keyset(self.object_list, self.request, self.page_size)
+        context = super().get_context_data(object_list=page.object_list, **kwargs)
+        context['page'] = page
+        return context
+
+# ============================================================================
+# Estimated Counts
+# ============================================================================
+# The admin changelist needs a total to draw page links; on tables with millions
+# of rows an exact COUNT(*) is a full scan. On PostgreSQL the planner's row
+# estimate is used instead once it passes ESTIMATED_COUNT_THRESHOLD; small
+# results are still counted exactly.
+
+def estimated_count(queryset):
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list)
+        if estimate is None or estimate < settings.ESTIMATED_COUNT_THRESHOLD:
+            return super().count
+        return estimate
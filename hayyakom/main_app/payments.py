@@ -0,0 +1,208 @@
+import asyncio
+import json
+import logging
+import weakref
+import stripe
+from asgiref.sync import sync_to_async
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.urls import reverse
+from . import fake_stripe
+from .models import Funding, PaymentEvent, Reservation
+from .notifications import notify
+from .routers import pin_user
+
+logger = logging.getLogger(__name__)
+
+stripe.api_key = settings.STRIPE_SECRET_KEY
+BHD_TO_USD_RATE = 2.65265
+# Stripe rejects a Checkout Session that expires less than 30 minutes after it is created;
+# the margin covers the time between creating the hold and Stripe receiving the request.
+CHECKOUT_MIN_LIFETIME = timedelta(minutes=30)
+CHECKOUT_EXPIRY_MARGIN = timedelta(minutes=1)
+
+# ============================================================================
+# Checkout
+# ============================================================================
+
+def get_stripe():
+    return fake_stripe if settings.STRIPE_BACKEND == 'fake' else stripe
+
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_stripe_client():
+    # One pooled httpx.AsyncClient per event loop: concurrent checkouts on an ASGI worker
+    # share connections, while each async_to_sync loop under WSGI gets its own client
+    # instead of one bound to a loop that has since been closed.
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = stripe.StripeClient(
+            settings.STRIPE_SECRET_KEY,
+            http_client=stripe.HTTPXClient(timeout=settings.STRIPE_TIMEOUT_SECONDS),
+            max_network_retries=settings.STRIPE_MAX_NETWORK_RETRIES,
+        )
+    return client
+
+
+async def acreate_checkout_session(params):
+    if settings.STRIPE_BACKEND == 'fake':
+        return await fake_stripe.checkout.Session.create_async(**params)
+    return await get_async_stripe_client().v1.checkout.sessions.create_async(params)
+
+
+def checkout_params(request, funding, amount_in_bhd, reservation):
+    amount_in_cents = int(amount_in_bhd * BHD_TO_USD_RATE * 100)
+    return {
+        'line_items': [{
+            'price_data': {
+                'currency': 'usd',
+                'product_data': {'name': f"Investment in: {funding.campaign_name}"},
+                'unit_amount': amount_in_cents,
+            },
+            'quantity': 1,
+        }],
+        'mode': 'payment',
+        'client_reference_id': str(reservation.investor_id),
+        # The webhook records the investment from these, never from the success URL.
+        'metadata': {
+            'funding_id': str(funding.pk),
+            'investor_id': str(reservation.investor_id),
+            'amount': str(amount_in_bhd),
+            'reservation_id': str(reservation.pk),
+        },
+        'expires_at': int(reservation.expires_at.timestamp()),
+        'success_url': request.build_absolute_uri(reverse('investment_success')) + '?session_id={CHECKOUT_SESSION_ID}',
+        'cancel_url': request.build_absolute_uri(reverse('investment_cancel')) + f'?reservation={reservation.pk}',
+    }
+
+
+def reservation_ttl():
+    return max(timedelta(minutes=settings.RESERVATION_TTL_MINUTES), CHECKOUT_MIN_LIFETIME + CHECKOUT_EXPIRY_MARGIN)
+
+
+def hold_capacity(investor, funding, amount_in_bhd):
+    for stale in Reservation.objects.filter(funding=funding, investor=investor, status='Held'):
+        stale.release()
+    return funding.reserve_capacity(investor, amount_in_bhd, reservation_ttl())
+
+
+def start_checkout(request, funding, amount_in_bhd):
+    # Returns None when the remaining capacity was claimed by someone else first.
+    reservation = hold_capacity(request.user, funding, amount_in_bhd)
+    if reservation is None:
+        return None
+    try:
+        session = get_stripe().checkout.Session.create(**checkout_params(request, funding, amount_in_bhd, reservation))
+    except Exception:
+        reservation.release()
+        raise
+    Reservation.objects.filter(pk=reservation.pk).update(checkout_session_id=session.id)
+    return session
+
+
+async def astart_checkout(request, investor, funding, amount_in_bhd):
+    # Same as start_checkout, but the Stripe round trip does not hold a thread.
+    reservation = await sync_to_async(hold_capacity)(investor, funding, amount_in_bhd)
+    if reservation is None:
+        return None
+    try:
+        session = await acreate_checkout_session(checkout_params(request, funding, amount_in_bhd, reservation))
+    except Exception:
+        await sync_to_async(reservation.release)()
+        raise
+    await Reservation.objects.filter(pk=reservation.pk).aupdate(checkout_session_id=session.id)
+    return session
+
+def cancel_checkout(investor, reservation_id):
+    # The investor came back from Stripe without paying: give the capacity back now
+    # instead of when the hold expires, and close the session so it cannot be paid later.
+    reservation = Reservation.objects.filter(pk=reservation_id, investor=investor).first()
+    if reservation is None or not reservation.release():
+        return False
+    if reservation.checkout_session_id:
+        try:
+            get_stripe().checkout.Session.expire(reservation.checkout_session_id)
+        except Exception:
+            logger.exception('Could not expire checkout session %s', reservation.checkout_session_id)
+    return True
+
+# ============================================================================
+# Webhook Handling
+# ============================================================================
+
+class InvalidWebhook(Exception):
+    pass
+
+
+def parse_webhook(payload, sig_header):
+    try:
+        # The tolerance rejects captured payloads replayed more than five minutes after signing.
+        stripe.WebhookSignature.verify_header(
+            payload, sig_header, settings.STRIPE_WEBHOOK_SECRET, tolerance=stripe.Webhook.DEFAULT_TOLERANCE
+        )
+        return json.loads(payload)
+    except (stripe.SignatureVerificationError, ValueError) as e:
+        raise InvalidWebhook(str(e)) from e
+
+
+def record_event(event):
+    # Stripe delivers at least once; the unique event_id makes redelivery a no-op, and
+    # the event row commits together with its effects so a failure is retried whole.
+    try:
+        with transaction.atomic():
+            PaymentEvent.objects.create(event_id=event['id'], event_type=event['type'], payload=event)
+            if event['type'] == 'checkout.session.completed':
+                fulfil_checkout_session(event['data']['object'])
+            elif event['type'] == 'checkout.session.expired':
+                release_checkout_session(event['data']['object'])
+    except IntegrityError:
+        return False
+    return True
+
+
+def fulfil_checkout_session(session):
+    if session.get('payment_status') != 'paid':
+        return None
+    metadata = session.get('metadata') or {}
+    funding = Funding.objects.select_related('company__owner').filter(pk=metadata.get('funding_id')).first()
+    investor = User.objects.filter(pk=metadata.get('investor_id')).first()
+    if funding is None or investor is None:
+        return None
+
+    reservation = Reservation.objects.filter(pk=metadata.get('reservation_id'), investor=investor).first()
+    try:
+        with transaction.atomic():
+            investment = funding.record_investment(
+                investor, int(metadata['amount']), reservation=reservation, checkout_session_id=session['id']
+            )
+            notify(
+                funding.company.owner,
+                f"{investor.first_name} invested {investment.amount} BD in your campaign '{funding.campaign_name}'.",
+                funding
+            )
+            notify(
+                investor,
+                f"Thank you! Your investment of {investment.amount} BD in '{funding.campaign_name}' has been confirmed.",
+                funding
+            )
+            if funding.raised_amount >= funding.goal and funding.status != 'Completed':
+                funding.status = 'Completed'
+                funding.save(update_fields=['status'])
+            # The investor returns from Stripe on another request; keep their reads on the primary.
+            transaction.on_commit(lambda: pin_user(investor.pk))
+    except IntegrityError:
+        # Another delivery of the same session already recorded it.
+        return None
+    return investment
+
+
+def release_checkout_session(session):
+    metadata = session.get('metadata') or {}
+    reservation = Reservation.objects.filter(pk=metadata.get('reservation_id')).first()
+    if reservation:
+        reservation.release()
@@ -0,0 +1,250 @@
+import logging
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.db.models import Avg, Count, Max, Sum
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+from .models import ProfileSample, ProfilingTarget
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# Request Profiler
+# ============================================================================
+# A request is profiled when it carries a signed X-Profile header, when an admin
+# ProfilingTarget covers its view, or at PROFILER_SAMPLE_RATE. A sampler thread
+# reads the request thread's stack every PROFILER_INTERVAL_MS, so the view, its
+# forms and the template render are all covered at a fixed cost that does not
+# grow with the number of calls. Stacks are kept in collapsed form
+# ("outer;inner;leaf" -> samples), ready for flamegraph.pl or speedscope.
+
+TOKEN_SALT = 'main_app.profiler'
+# A thread whose innermost frame is in one of these is waiting, not working.
+IDLE_MODULES = frozenset({'threading', 'queue', 'selectors', 'concurrent.futures.thread'})
+
+
+def make_profile_token():
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign('profile')
+
+
+def valid_profile_token(token):
+    try:
+        signing.TimestampSigner(salt=TOKEN_SALT).unsign(token, max_age=settings.PROFILER_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def frame_label(frame):
+    return f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_qualname}"
+
+
+def collapse(frame, root=None, max_depth=256):
+    # Frames from the leaf up to (not including) root. With a root, stacks that do
+    # not pass through it belong to another request on the same thread and are dropped.
+    if frame.f_globals.get('__name__') in IDLE_MODULES:
+        return None
+    labels = []
+    while frame is not None and frame is not root and len(labels) < max_depth:
+        if frame.f_code.co_name == 'thread_handler' and frame.f_globals.get('__name__') == 'asgiref.sync':
+            break
+        labels.append(frame_label(frame).replace(';', ':'))
+        frame = frame.f_back
+    if root is not None and frame is not root:
+        return None
+    return ';'.join(reversed(labels)) or None
+
+
+class StackSampler:
+    def __init__(self, threads, interval):
+        # threads maps thread ids to the root frame their stacks must pass through (or None).
+        self.threads = threads
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='request-profiler', daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.done.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.done.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id, root in self.threads.items():
+                frame = frames.get(thread_id)
+                stack = collapse(frame, root) if frame is not None else None
+                if stack:
+                    self.stacks[stack] += 1
+                    self.samples += 1
+            del frames
+
+
+class ProfilingTargets:
+    # Active admin targets, re-read at most every PROFILER_TARGET_POLL_SECONDS per process.
+    def __init__(self):
+        self.loaded_at = None
+        self.rows = ()
+
+    def stale(self):
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > settings.PROFILER_TARGET_POLL_SECONDS
+
+    def load(self):
+        self.rows = tuple(ProfilingTarget.objects.filter(until__gt=timezone.now()).values_list('view_name', 'until'))
+        self.loaded_at = time.monotonic()
+
+    def match(self, request):
+        now = timezone.now()
+        view_name = None
+        for name, until in self.rows:
+            if until <= now:
+                continue
+            if not name:
+                return True
+            if view_name is None:
+                try:
+                    view_name = resolve(request.path_info).view_name
+                except Resolver404:
+                    view_name = ''
+            if name == view_name:
+                return True
+        return False
+
+
+targets = ProfilingTargets()
+
+
+def profile_trigger(request):
+    token = request.headers.get(settings.PROFILER_HEADER)
+    if token and valid_profile_token(token):
+        return 'header'
+    if targets.rows and targets.match(request):
+        return 'target'
+    if random.random() < settings.PROFILER_SAMPLE_RATE:
+        return 'sampled'
+    return None
+
+
+class ProfilerMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if targets.stale():
+            targets.load()
+        trigger = profile_trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        with StackSampler({threading.get_ident(): sys._getframe()}, settings.PROFILER_INTERVAL_MS / 1000) as sampler:
+            response = self.get_response(request)
+        self.record(request, response, trigger, sampler, start)
+        return response
+
+    async def __acall__(self, request):
+        if targets.stale():
+            await sync_to_async(targets.load)()
+        trigger = profile_trigger(request)
+        if trigger is None:
+            return await self.get_response(request)
+
+        # The event loop runs every request's coroutines, so its stacks must pass through
+        # this call; the request's thread-sensitive executor thread runs only this request.
+        executor_thread = await sync_to_async(threading.get_ident)()
+        threads = {threading.get_ident(): sys._getframe(), executor_thread: None}
+        start = time.perf_counter()
+        with StackSampler(threads, settings.PROFILER_INTERVAL_MS / 1000) as sampler:
+            response = await self.get_response(request)
+        await sync_to_async(self.record)(request, response, trigger, sampler, start)
+        return response
+
+    def record(self, request, response, trigger, sampler, start):
+        match = request.resolver_match
+        view_name = (match.view_name or match._func_path) if match else 'unresolved'
+        try:
+            sample = ProfileSample.objects.create(
+                view_name=view_name[:200],
+                method=request.method,
+                path=request.path[:500],
+                status_code=response.status_code,
+                trigger=trigger,
+                duration_ms=(time.perf_counter() - start) * 1000,
+                interval_ms=settings.PROFILER_INTERVAL_MS,
+                sample_count=sampler.samples,
+                stacks=dict(sampler.stacks),
+            )
+        except Exception:
+            # Losing a profile must never fail the request it describes.
+            logger.exception('Could not store profile for %s', view_name)
+            return
+        if trigger == 'header':
+            response['X-Profile-Sample'] = str(sample.pk)
+
+
+# ============================================================================
+# Reporting
+# ============================================================================
+
+def merge_stacks(samples):
+    merged = Counter()
+    for stacks in samples.values_list('stacks', flat=True).iterator(chunk_size=200):
+        merged.update(stacks)
+    return merged
+
+
+def collapsed_text(stacks):
+    return ''.join(f'{stack} {count}\n' for stack, count in sorted(stacks.items()))
+
+
+def hottest_frames(stacks, limit=3):
+    # Self time: samples in which the function was the innermost frame.
+    total = sum(stacks.values())
+    leaves = Counter()
+    for stack, count in stacks.items():
+        leaves[stack.rsplit(';', 1)[-1]] += count
+    return [
+        {'frame': frame, 'share': count * 100 / total}
+        for frame, count in leaves.most_common(limit)
+    ]
+
+
+def profiled_views(days, limit=20, stack_profiles=50):
+    # Timings are aggregated by the database; hottest frames come from each listed view's
+    # most recent stack_profiles profiles only, so the page cost does not grow with traffic.
+    since = timezone.now() - timedelta(days=days)
+    recent = ProfileSample.objects.filter(created_at__gte=since)
+    report = list(
+        recent.values('view_name')
+        .annotate(
+            profiles=Count('id'),
+            avg_ms=Avg('duration_ms'),
+            max_ms=Max('duration_ms'),
+            samples=Sum('sample_count'),
+        )
+        .order_by('-avg_ms')[:limit]
+    )
+    for row in report:
+        stacks = merge_stacks(recent.filter(view_name=row['view_name']).order_by('-created_at')[:stack_profiles])
+        row['hottest'] = hottest_frames(stacks) if stacks else []
+    return report
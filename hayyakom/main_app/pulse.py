@@ -0,0 +1,63 @@
+from datetime import timedelta
+from django.core.cache import cache
+from django.utils.text import Truncator
+from .models import Funding
+from .routers import read_primary
+
+INTEREST_TARGET = 10
+PULSE_VERSION_KEY = 'pulse:version'
+SNAPSHOT_TIMEOUT = 60 * 60 * 24 * 7
+# A pulse campaign stays on the page through early access and its public launch.
+PULSE_STATUSES = ('In Pulse', 'Early Access', 'In Process')
+
+# ============================================================================
+# Weekly Pulse Snapshot
+# ============================================================================
+# The pulse only changes when campaigns are edited or scheduled or someone shows
+# interest, so each reveal date is built once into plain dicts and cached under a
+# version number that those writes bump (see signals.py for saves and deletes).
+
+def current_sunday(today):
+    days_since_sunday = (today.weekday() + 1) % 7
+    return today - timedelta(days=days_since_sunday)
+
+
+def pulse_version():
+    cache.add(PULSE_VERSION_KEY, 1, None)
+    return cache.get(PULSE_VERSION_KEY, 1)
+
+
+def bump_pulse_version():
+    try:
+        cache.incr(PULSE_VERSION_KEY)
+    except ValueError:
+        cache.set(PULSE_VERSION_KEY, 2, None)
+
+
+def build_pulse_snapshot(reveal_date):
+    rows = (
+        read_primary(Funding).filter(status__in=PULSE_STATUSES, reveal_date=reveal_date)
+        .order_by('id')
+        .values('id', 'campaign_name', 'description', 'company_id', 'company__company_name', 'interest_count')
+    )
+    return [
+        {
+            'id': row['id'],
+            'campaign_name': row['campaign_name'],
+            'summary': Truncator(row['description']).words(20),
+            'company_id': row['company_id'],
+            'company_name': row['company__company_name'],
+            'interest_count': row['interest_count'],
+            'interest_percentage': row['interest_count'] / INTEREST_TARGET * 100,
+        }
+        for row in rows
+    ]
+
+
+def get_pulse_snapshot(reveal_date):
+    key = f'pulse:snapshot:{reveal_date.isoformat()}:{pulse_version()}'
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_pulse_snapshot(reveal_date)
+        cache.set(key, snapshot, SNAPSHOT_TIMEOUT)
+    return snapshot
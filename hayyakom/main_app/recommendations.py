@@ -0,0 +1,158 @@
+import time
+from itertools import chain
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Sum
+from .models import ActiveCampaignListing, CampaignRecommendation, Funding, Investment
+
+try:
+    # Only the offline build needs these; web processes serve from the table.
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = sparse = None
+
+VERSION_KEY = 'recommendations:version'
+
+# ============================================================================
+# Serving
+# ============================================================================
+# Recommendations only point at listed campaigns, so each lookup joins the
+# precomputed rows to the active listing table and returns ready-to-render cards.
+
+def recommendations_version():
+    cache.add(VERSION_KEY, 1, None)
+    return cache.get(VERSION_KEY, 1)
+
+
+def bump_recommendations_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, None)
+
+
+def similar_campaigns(funding_id, limit=None):
+    limit = limit or settings.RECOMMENDATIONS_SHOWN
+    return list(
+        ActiveCampaignListing.objects.filter(funding__recommended_in__funding_id=funding_id)
+        .order_by('funding__recommended_in__rank')[:limit]
+    )
+
+
+def recommended_for_investor(user, limit=None):
+    # Neighbours of the investor's most recent campaigns, ranked by summed similarity.
+    limit = limit or settings.RECOMMENDATIONS_SHOWN
+    invested = Investment.objects.filter(investor=user)
+    recent = invested.order_by('-id').values('funding_id')[:settings.RECOMMENDATIONS_RECENT_INVESTMENTS]
+    return list(
+        ActiveCampaignListing.objects.filter(funding__recommended_in__funding_id__in=recent)
+        .exclude(funding_id__in=invested.values('funding_id'))
+        .annotate(score=Sum('funding__recommended_in__score'))
+        .order_by('-score', '-funding_id')[:limit]
+    )
+
+# ============================================================================
+# Offline Build
+# ============================================================================
+# Campaigns are vectors over investors: 1 for an investment, INTEREST_WEIGHT for
+# a Weekly Pulse interest. Cosine similarity between all campaigns is one sparse
+# product, computed a block of rows at a time so memory stays bounded; only the
+# top K listed neighbours of each row are kept. Pairs in the same category get
+# CATEGORY_BOOST, and campaigns with too few co-investors are topped up with the
+# most backed listed campaigns of their category.
+
+def _load_pairs(queryset, first, second, chunk_size):
+    rows = queryset.values_list(first, second).iterator(chunk_size=chunk_size)
+    flat = np.fromiter(chain.from_iterable(rows), dtype=np.int64)
+    return flat[0::2], flat[1::2]
+
+
+def _top_neighbours(row_ids, scores, own, live, category, fallback, top_k):
+    keep = live[row_ids] & (row_ids != own)
+    row_ids = row_ids[keep]
+    scores = scores[keep] + settings.RECOMMENDATION_CATEGORY_BOOST * (category[row_ids] == category[own])
+    if len(row_ids) > top_k:
+        best = np.argpartition(-scores, top_k)[:top_k]
+        row_ids, scores = row_ids[best], scores[best]
+    order = np.argsort(-scores, kind='stable')
+    row_ids, scores = row_ids[order], scores[order]
+    if len(row_ids) < top_k:
+        extra = fallback[category[own]]
+        extra = extra[(extra != own) & ~np.isin(extra, row_ids)][:top_k - len(row_ids)]
+        row_ids = np.concatenate([row_ids, extra])
+        scores = np.concatenate([scores, np.zeros(len(extra))])
+    return row_ids, scores
+
+
+def compute_recommendations(top_k, block_size=2000, chunk_size=100_000, log=None):
+    if np is None or sparse is None:
+        raise ImproperlyConfigured('Building recommendations requires numpy and scipy.')
+    started = time.monotonic()
+    invest_items, invest_users = _load_pairs(Investment.objects.all(), 'funding_id', 'investor_id', chunk_size)
+    Through = Funding.interested_users.through
+    interest_items, interest_users = _load_pairs(Through.objects.all(), 'funding_id', 'user_id', chunk_size)
+    live_ids = np.fromiter(ActiveCampaignListing.objects.values_list('funding_id', flat=True), dtype=np.int64)
+    if log:
+        log(f'Loaded {len(invest_items)} investments and {len(interest_items)} interests in {time.monotonic() - started:.1f}s.')
+
+    items = np.unique(np.concatenate([invest_items, interest_items, live_ids]))
+    users, user_index = np.unique(np.concatenate([invest_users, interest_users]), return_inverse=True)
+    item_index = np.searchsorted(items, np.concatenate([invest_items, interest_items]))
+    weights = np.concatenate([
+        np.ones(len(invest_items)),
+        np.full(len(interest_items), settings.RECOMMENDATION_INTEREST_WEIGHT),
+    ])
+    matrix = sparse.csr_matrix((weights, (item_index, user_index)), shape=(len(items), len(users)))
+    # An investor who also showed interest still counts once.
+    matrix.data = np.minimum(matrix.data, 1.0)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    normalized = sparse.diags(1.0 / norms) @ matrix
+    transposed = normalized.T.tocsr()
+
+    categories = dict(Funding.objects.values_list('id', 'category').iterator(chunk_size=chunk_size))
+    labels, category = np.unique([categories.get(funding_id, '') for funding_id in items.tolist()], return_inverse=True)
+    live = np.isin(items, live_ids)
+    backers = np.asarray(matrix.sum(axis=1)).ravel()
+    fallback = []
+    for code in range(len(labels)):
+        candidates = np.flatnonzero(live & (category == code))
+        fallback.append(candidates[np.argsort(-backers[candidates], kind='stable')][:top_k + 1])
+
+    for start in range(0, len(items), block_size):
+        block = (normalized[start:start + block_size] @ transposed).tocsr()
+        for row in range(block.shape[0]):
+            own = start + row
+            span = slice(block.indptr[row], block.indptr[row + 1])
+            neighbours, scores = _top_neighbours(
+                block.indices[span], block.data[span], own, live, category, fallback, top_k
+            )
+            if len(neighbours):
+                yield int(items[own]), items[neighbours].tolist(), scores.tolist()
+    if log:
+        log(f'Scored {len(items)} campaigns in {time.monotonic() - started:.1f}s.')
+
+
+def build_recommendations(top_k=None, block_size=2000, batch_size=5000, log=None):
+    top_k = top_k or settings.RECOMMENDATIONS_TOP_K
+    written = 0
+    with transaction.atomic():
+        # Readers keep seeing the previous set until the new one commits.
+        CampaignRecommendation.objects.all().delete()
+        batch = []
+        for funding_id, neighbours, scores in compute_recommendations(top_k, block_size=block_size, log=log):
+            batch.extend(
+                CampaignRecommendation(funding_id=funding_id, recommended_id=neighbour, rank=rank, score=score)
+                for rank, (neighbour, score) in enumerate(zip(neighbours, scores), start=1)
+            )
+            if len(batch) >= batch_size:
+                CampaignRecommendation.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        CampaignRecommendation.objects.bulk_create(batch)
+        written += len(batch)
+        transaction.on_commit(bump_recommendations_version)
+    return written
@@ -0,0 +1,274 @@
+import gzip
+import json
+import os
+import time
+from datetime import date, timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import JobCheckpoint, Notification, NotificationArchive, ProfileSample, RequestSample
+
+TABLE = Notification._meta.db_table
+LEGACY_PARTITION = f'{TABLE}_legacy'
+DEFAULT_PARTITION = f'{TABLE}_default'
+COLUMNS = ('id', 'user_id', 'related_funding_id', 'message', 'is_read', 'created_at')
+
+
+def qn(name):
+    return connection.ops.quote_name(name)
+
+# ============================================================================
+# Monthly Partitions (PostgreSQL)
+# ============================================================================
+# main_app_notification becomes a table partitioned by month of created_at:
+# main_app_notification_pYYYYMM per month, a DEFAULT partition as a safety net,
+# and main_app_notification_legacy holding everything written before the
+# conversion. Old months can then be detached and dropped instead of deleted.
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(month, months):
+    years, index = divmod(month.month - 1 + months, 12)
+    return date(month.year + years, index + 1, 1)
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month:%Y%m}'
+
+
+def partitioning_supported():
+    return connection.vendor == 'postgresql'
+
+
+def is_partitioned():
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)', [TABLE])
+        row = cursor.fetchone()
+    return bool(row) and row[0] == 'p'
+
+
+def monthly_partitions():
+    # (name, first day, first day of the next month), oldest first.
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class parent ON parent.oid = pg_inherits.inhparent '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE parent.relname = %s ORDER BY child.relname',
+            [TABLE],
+        )
+        names = [name for name, in cursor.fetchall()]
+    prefix = f'{TABLE}_p'
+    partitions = []
+    for name in names:
+        suffix = name[len(prefix):]
+        if name.startswith(prefix) and len(suffix) == 6 and suffix.isdigit():
+            month = date(int(suffix[:4]), int(suffix[4:]), 1)
+            partitions.append((name, month, add_months(month, 1)))
+    return partitions
+
+
+def create_partitions(first_month, months):
+    existing = {name for name, _, _ in monthly_partitions()}
+    created = []
+    with connection.cursor() as cursor:
+        for offset in range(months):
+            month = add_months(first_month, offset)
+            name = partition_name(month)
+            if name in existing:
+                continue
+            cursor.execute(
+                f'CREATE TABLE {qn(name)} PARTITION OF {qn(TABLE)} FOR VALUES FROM (%s) TO (%s)',
+                [month, add_months(month, 1)],
+            )
+            created.append(name)
+    return created
+
+
+def convert_to_partitioned(months_ahead):
+    # One-off and blocking: run it in a maintenance window. The existing rows are not
+    # copied; the old table is attached as the partition for everything before this month.
+    first_month = month_start(timezone.now().date())
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {qn(TABLE)} IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(
+            'SELECT indexrelid::regclass::text FROM pg_index WHERE indrelid = %s::regclass AND NOT indisprimary',
+            [TABLE],
+        )
+        legacy_names = {name: (name + '_legacy')[:63] for name, in cursor.fetchall()}
+        cursor.execute(f'SELECT COALESCE(MAX(id), 0) + 1 FROM {qn(TABLE)}')
+        next_id = cursor.fetchone()[0]
+
+        # Free the original table, index and constraint names for the partitioned parent.
+        cursor.execute(f'ALTER TABLE {qn(TABLE)} RENAME TO {qn(LEGACY_PARTITION)}')
+        cursor.execute(f'ALTER TABLE {qn(LEGACY_PARTITION)} RENAME CONSTRAINT {qn(TABLE + "_pkey")} TO {qn(LEGACY_PARTITION + "_pkey")}')
+        for index_name, legacy_name in legacy_names.items():
+            cursor.execute(f'ALTER INDEX {qn(index_name)} RENAME TO {qn(legacy_name)}')
+        cursor.execute(f'ALTER TABLE {qn(LEGACY_PARTITION)} ALTER COLUMN id DROP IDENTITY IF EXISTS')
+        # Definitions are read from the renamed table, so each one names the legacy index
+        # and table and can be pointed back at the original names for the new parent.
+        cursor.execute(
+            'SELECT indexrelid::regclass::text, pg_get_indexdef(indexrelid) FROM pg_index '
+            'WHERE indrelid = %s::regclass AND NOT indisprimary',
+            [LEGACY_PARTITION],
+        )
+        legacy_definitions = dict(cursor.fetchall())
+
+        cursor.execute(
+            f'CREATE TABLE {qn(TABLE)} (LIKE {qn(LEGACY_PARTITION)} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)'
+        )
+        cursor.execute(f'ALTER TABLE {qn(TABLE)} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY (START WITH {int(next_id)})')
+        # The partition key has to be part of the primary key.
+        cursor.execute(f'ALTER TABLE {qn(TABLE)} ADD PRIMARY KEY (id, created_at)')
+        cursor.execute(
+            f'ALTER TABLE {qn(TABLE)} ADD CONSTRAINT {qn(TABLE + "_user_fk")} '
+            f'FOREIGN KEY (user_id) REFERENCES {qn("auth_user")} (id) DEFERRABLE INITIALLY DEFERRED'
+        )
+        cursor.execute(
+            f'ALTER TABLE {qn(TABLE)} ADD CONSTRAINT {qn(TABLE + "_funding_fk")} '
+            f'FOREIGN KEY (related_funding_id) REFERENCES {qn("main_app_funding")} (id) DEFERRABLE INITIALLY DEFERRED'
+        )
+        for index_name, legacy_name in legacy_names.items():
+            definition = legacy_definitions[legacy_name].replace(
+                f' INDEX {legacy_name} ON public.{LEGACY_PARTITION} ', f' INDEX {index_name} ON public.{TABLE} ', 1
+            )
+            if f' ON public.{TABLE} ' not in definition:
+                raise RuntimeError(f'Could not rewrite the definition of {legacy_name}: {definition}')
+            cursor.execute(definition)
+
+        cursor.execute(
+            f'ALTER TABLE {qn(TABLE)} ATTACH PARTITION {qn(LEGACY_PARTITION)} FOR VALUES FROM (MINVALUE) TO (%s)',
+            [first_month],
+        )
+        cursor.execute(f'CREATE TABLE {qn(DEFAULT_PARTITION)} PARTITION OF {qn(TABLE)} DEFAULT')
+        create_partitions(first_month, months_ahead + 1)
+
+# ============================================================================
+# Archival
+# ============================================================================
+# Read notifications past the cutoff are copied into compressed chunks and then
+# removed. Row-by-row removal happens in short transactions of chunk_size rows
+# claimed with SKIP LOCKED; a monthly partition that is entirely past the cutoff
+# and has no unread rows is copied without deleting anything and then dropped.
+
+def _row_dict(row):
+    record = dict(zip(COLUMNS, row))
+    record['created_at'] = record['created_at'].isoformat()
+    return record
+
+
+def _compress(rows):
+    lines = '\n'.join(json.dumps(_row_dict(row)) for row in rows)
+    return gzip.compress(lines.encode(), compresslevel=6)
+
+
+def write_archive_table(rows):
+    NotificationArchive.objects.create(
+        first_id=rows[0][0],
+        last_id=rows[-1][0],
+        row_count=len(rows),
+        oldest=min(row[5] for row in rows),
+        newest=max(row[5] for row in rows),
+        payload=_compress(rows),
+    )
+
+
+def archive_file_writer(directory):
+    os.makedirs(directory, exist_ok=True)
+
+    def write(rows):
+        # Called inside the transaction that deletes the rows: the chunk is made durable
+        # under a temporary name and only renamed into place once that transaction commits,
+        # so a rollback never leaves an archive of rows that are still live.
+        path = os.path.join(directory, f'notifications-{rows[0][0]}-{rows[-1][0]}.jsonl.gz')
+        partial = f'{path}.partial'
+        with open(partial, 'wb') as archive_file:
+            archive_file.write(_compress(rows))
+            archive_file.flush()
+            os.fsync(archive_file.fileno())
+        transaction.on_commit(lambda: os.replace(partial, path))
+    return write
+
+
+def archive_read_notifications(cutoff, write, chunk_size=5000, pause=0):
+    archived = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                Notification.objects.filter(is_read=True, created_at__lt=cutoff, id__gt=last_id)
+                .order_by('id')
+                .select_for_update(skip_locked=True)
+                .values_list(*COLUMNS)[:chunk_size]
+            )
+            if not rows:
+                return archived
+            write(rows)
+            Notification.objects.filter(id__in=[row[0] for row in rows]).delete()
+        last_id = rows[-1][0]
+        archived += len(rows)
+        if pause:
+            time.sleep(pause)
+
+
+def archive_partition(name, write, chunk_size=5000):
+    # Returns the number of rows archived, or None when the partition still has unread rows.
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {qn(name)} WHERE NOT is_read)')
+        if cursor.fetchone()[0]:
+            return None
+
+    checkpoint, _ = JobCheckpoint.objects.get_or_create(name=f'archive_partition:{name}')
+    archived = 0
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT {", ".join(COLUMNS)} FROM {qn(name)} WHERE id > %s ORDER BY id LIMIT %s',
+                [checkpoint.position, chunk_size],
+            )
+            rows = cursor.fetchall()
+        if not rows:
+            break
+        with transaction.atomic():
+            write(rows)
+            checkpoint.position = rows[-1][0]
+            checkpoint.save(update_fields=['position', 'updated_at'])
+        archived += len(rows)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {qn(TABLE)} DETACH PARTITION {qn(name)}')
+        cursor.execute(f'DROP TABLE {qn(name)}')
+        checkpoint.delete()
+    return archived
+
+# ============================================================================
+# Diagnostic Samples
+# ============================================================================
+# Instrumentation samples and profiles are only read for the admin reports, which cover the
+# last few days; anything older than the model's retention setting is deleted.
+
+SAMPLE_RETENTION = {
+    RequestSample: 'SQL_INSTRUMENTATION_RETENTION_DAYS',
+    ProfileSample: 'PROFILER_RETENTION_DAYS',
+}
+
+
+def prune_samples(model, cutoff, chunk_size=5000, pause=0):
+    pruned = 0
+    while True:
+        ids = list(model.objects.filter(created_at__lt=cutoff).order_by('id').values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return pruned
+        pruned += model.objects.filter(id__in=ids).delete()[0]
+        if pause:
+            time.sleep(pause)
+
+
+def prune_all_samples(chunk_size=5000, pause=0):
+    now = timezone.now()
+    return {
+        model: prune_samples(model, now - timedelta(days=getattr(settings, setting)), chunk_size, pause)
+        for model, setting in SAMPLE_RETENTION.items()
+    }
@@ -0,0 +1,108 @@
+import random
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+PIN_COOKIE = 'pin_primary'
+
+_use_replica = ContextVar('use_replica', default=False)
+_wrote = ContextVar('wrote', default=False)
+
+# ============================================================================
+# Read Replica Routing
+# ============================================================================
+# Writes always go to the primary ('default'). Reads only go to a replica while
+# a view marked with `replica_reads` is handling the request, the request has
+# not written anything yet, and the visitor is not pinned to the primary after
+# a recent write of their own.
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (
+            settings.DATABASE_REPLICAS
+            and model._meta.app_label == 'main_app'
+            and _use_replica.get()
+            and not _wrote.get()
+        ):
+            return random.choice(settings.DATABASE_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+def read_primary(model):
+    # For reads whose result is cached, where replica lag would outlive the request.
+    # Not routed through db_for_write, which would count the read as a write and pin the visitor.
+    return model._default_manager.db_manager('default')
+
+
+def replica_reads(view):
+    view.replica_reads = True
+    return view
+
+
+def pin_user(user_id):
+    cache.set(f'db:pinned:{user_id}', True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(request):
+    if request.COOKIES.get(PIN_COOKIE):
+        return True
+    return request.user.is_authenticated and bool(cache.get(f'db:pinned:{request.user.pk}'))
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        wrote = _wrote.set(False)
+        use_replica = _use_replica.set(False)
+        try:
+            response = self.get_response(request)
+            if _wrote.get():
+                self.pin(request.user, response)
+            return response
+        finally:
+            _use_replica.reset(use_replica)
+            _wrote.reset(wrote)
+
+    async def __acall__(self, request):
+        wrote = _wrote.set(False)
+        use_replica = _use_replica.set(False)
+        try:
+            response = await self.get_response(request)
+            if _wrote.get():
+                await sync_to_async(self.pin)(await request.auser(), response)
+            return response
+        finally:
+            _use_replica.reset(use_replica)
+            _wrote.reset(wrote)
+
+    def pin(self, user, response):
+        response.set_cookie(PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax')
+        if user.is_authenticated:
+            pin_user(user.pk)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'view_class', None)
+        wants_replica = getattr(view_func, 'replica_reads', False) or getattr(view_class, 'replica_reads', False)
+        if wants_replica and settings.DATABASE_REPLICAS and not is_pinned(request):
+            _use_replica.set(True)
@@ -0,0 +1,49 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db import connection
+from django.db.models import F, FloatField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Cast, Coalesce
+from .models import Company
+
+SEARCH_CONFIG = 'english'
+
+# ============================================================================
+# Campaign Search
+# ============================================================================
+
+def search_enabled():
+    return connection.vendor == 'postgresql'
+
+
+def update_search_vectors(fundings):
+    if not search_enabled():
+        return 0
+    company_name = Subquery(Company.objects.filter(pk=OuterRef('company_id')).values('company_name')[:1])
+    return fundings.update(search_vector=(
+        SearchVector('campaign_name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(Coalesce(company_name, Value('')), weight='B', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='C', config=SEARCH_CONFIG)
+    ))
+
+
+def search_fundings(queryset, query, funding_path=''):
+    # funding_path is the lookup from the queryset's model to Funding ('funding__' for listings).
+    if not search_enabled():
+        return queryset.filter(
+            Q(**{f'{funding_path}campaign_name__icontains': query})
+            | Q(**{f'{funding_path}company__company_name__icontains': query})
+        ).order_by('-end_date', '-pk')
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+    return (
+        queryset
+        .filter(
+            Q(**{f'{funding_path}search_vector': search_query})
+            | Q(**{f'{funding_path}campaign_name__trigram_similar': query})
+        )
+        # Both scores are real (float4) on PostgreSQL; as double precision they survive the
+        # round trip through the keyset cursor exactly, so page boundaries neither repeat nor skip rows.
+        .annotate(
+            rank=Cast(SearchRank(F(f'{funding_path}search_vector'), search_query), FloatField()),
+            similarity=Cast(TrigramSimilarity(f'{funding_path}campaign_name', query), FloatField()),
+        )
+        .order_by('-rank', '-similarity', '-pk')
+    )
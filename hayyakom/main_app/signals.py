@@ -0,0 +1,130 @@
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_migrate
+from django.dispatch import receiver
+from .campaign_cache import bump_campaigns_on_commit
+from .listings import refresh_listings_on_commit
+from .live import publish_progress
+from .models import Company, Funding, Investment, Milestone, Profile
+from .pulse import bump_pulse_version
+from .search import update_search_vectors
+
+# ============================================================================
+# Database Setup
+# ============================================================================
+
+@receiver(pre_migrate)
+def ensure_postgres_extensions(sender, using, **kwargs):
+    if sender.name != 'main_app' or connections[using].vendor != 'postgresql':
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+@receiver(post_migrate)
+def ensure_postgres_search_indexes(sender, using, **kwargs):
+    # The admin's case-insensitive search runs UPPER(message) LIKE UPPER('%...%'); a
+    # trigram index on that expression keeps it off a sequential scan of every notification.
+    if sender.name != 'main_app' or connections[using].vendor != 'postgresql':
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS notification_message_trgm_gin '
+            'ON main_app_notification USING gin (UPPER(message) gin_trgm_ops)'
+        )
+
+# ============================================================================
+# Search Vector Maintenance
+# ============================================================================
+
+SEARCHABLE_FIELDS = {'campaign_name', 'description', 'company'}
+
+@receiver(post_save, sender=Funding)
+def refresh_funding_search_vector(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not SEARCHABLE_FIELDS.intersection(update_fields):
+        return
+    update_search_vectors(Funding.objects.filter(pk=instance.pk))
+
+@receiver(post_save, sender=Company)
+def refresh_company_search_vectors(sender, instance, created, **kwargs):
+    if not created:
+        update_search_vectors(Funding.objects.filter(company=instance))
+
+# ============================================================================
+# Campaign Cache Invalidation
+# ============================================================================
+# Queryset .update() calls skip these signals and bump the campaigns themselves.
+
+@receiver([post_save, post_delete], sender=Funding)
+def bump_saved_funding(sender, instance, **kwargs):
+    bump_campaigns_on_commit([instance.pk])
+
+@receiver([post_save, post_delete], sender=Investment)
+@receiver([post_save, post_delete], sender=Milestone)
+def bump_campaign_of(sender, instance, **kwargs):
+    bump_campaigns_on_commit([instance.funding_id])
+
+@receiver(post_save, sender=Company)
+def bump_company_campaigns(sender, instance, created, **kwargs):
+    if not created:
+        bump_campaigns_on_commit(instance.funding_set.values_list('id', flat=True))
+
+@receiver(post_save, sender=Profile)
+@receiver(post_save, sender=User)
+def bump_owner_contact(sender, instance, created, update_fields=None, **kwargs):
+    # The owner's name, email and phone appear in the investor contact block.
+    if created or update_fields == frozenset({'last_login'}):
+        return
+    user = instance.user if sender is Profile else instance
+    bump_campaigns_on_commit(Funding.objects.filter(company__owner=user).values_list('id', flat=True))
+
+# ============================================================================
+# Weekly Pulse Invalidation
+# ============================================================================
+
+PULSE_FIELDS = {'status', 'reveal_date', 'campaign_name', 'description', 'company', 'interest_count'}
+
+@receiver(post_save, sender=Funding)
+def bump_pulse_for_funding(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or PULSE_FIELDS.intersection(update_fields):
+        transaction.on_commit(bump_pulse_version)
+
+@receiver(post_delete, sender=Funding)
+def bump_pulse_for_deleted_funding(sender, instance, **kwargs):
+    transaction.on_commit(bump_pulse_version)
+
+@receiver(post_save, sender=Company)
+def bump_pulse_for_company(sender, instance, created, **kwargs):
+    if not created:
+        transaction.on_commit(bump_pulse_version)
+
+# ============================================================================
+# Active Campaign Listings
+# ============================================================================
+
+@receiver(post_save, sender=Funding)
+def refresh_saved_funding_listing(sender, instance, **kwargs):
+    refresh_listings_on_commit([instance.pk])
+
+@receiver([post_save, post_delete], sender=Investment)
+def refresh_invested_listing(sender, instance, **kwargs):
+    refresh_listings_on_commit([instance.funding_id])
+
+@receiver(post_save, sender=Company)
+def refresh_company_listings(sender, instance, created, **kwargs):
+    if not created:
+        refresh_listings_on_commit(instance.funding_set.filter(listing__isnull=False).values_list('id', flat=True))
+
+# ============================================================================
+# Live Funding Progress
+# ============================================================================
+
+@receiver([post_save, post_delete], sender=Investment)
+def publish_invested_progress(sender, instance, **kwargs):
+    funding_id = instance.funding_id
+    transaction.on_commit(lambda: publish_progress(funding_id))
+
+@receiver(post_save, sender=Funding)
+def publish_saved_progress(sender, instance, created, **kwargs):
+    if not created:
+        funding_id = instance.pk
+        transaction.on_commit(lambda: publish_progress(funding_id))
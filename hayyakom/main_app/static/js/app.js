@@ -5,4 +5,42 @@ if (dateInput) {
     altInput: true,
     altFormat: "F j, Y",
   });
-}
\ No newline at end of file
+}
+document.querySelectorAll('.load-more').forEach((button) => {
+  button.addEventListener('click', async () => {
+    const target = document.getElementById(button.dataset.target);
+    const response = await fetch(`${button.dataset.url}?${button.dataset.query}`);
+    if (!response.ok) return;
+    target.insertAdjacentHTML('beforeend', await response.text());
+    watchProgress();
+    const nextQuery = response.headers.get('X-Next-Query');
+    if (nextQuery) {
+      button.dataset.query = nextQuery;
+    } else {
+      button.closest('.pagination').remove();
+    }
+  });
+});
+const liveProgressUrl = document.querySelector('meta[name="live-progress-url"]');
+let liveProgress = null;
+function watchProgress() {
+  const ids = [...new Set([...document.querySelectorAll('[data-live-progress]')].map((el) => el.dataset.liveProgress))];
+  if (!liveProgressUrl || !window.EventSource || !ids.length) return;
+  if (liveProgress) liveProgress.close();
+  const limit = Number(liveProgressUrl.dataset.maxSubscriptions) || ids.length;
+  liveProgress = new EventSource(`${liveProgressUrl.content}?ids=${ids.slice(0, limit).join(',')}`);
+  liveProgress.addEventListener('progress', (event) => {
+    const data = JSON.parse(event.data);
+    document.querySelectorAll(`[data-live-progress="${data.id}"]`).forEach((el) => {
+      const bar = el.querySelector('[data-progress-bar]');
+      const label = el.querySelector('[data-progress-label]');
+      if (bar) bar.style.width = `${data.progress_percentage}%`;
+      if (label) label.textContent = data.progress_percentage.toFixed(2);
+    });
+  });
+  // Served only over ASGI; a 204 from a WSGI deployment closes it for good.
+  liveProgress.onerror = () => {
+    if (liveProgress.readyState === EventSource.CLOSED) liveProgress = null;
+  };
+}
+watchProgress();
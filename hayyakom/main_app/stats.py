@@ -0,0 +1,168 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Sum, Value
+from django.utils import timezone
+from .interest import CHECKPOINT_NAME as INTEREST_FLUSH_CHECKPOINT
+from .models import DailyFundingStats, InterestClick, Investment, JobCheckpoint
+
+# ============================================================================
+# Daily Rollups
+# ============================================================================
+# `rollup_stats` folds Investment and InterestClick rows into DailyFundingStats.
+# Each source keeps an id watermark in a JobCheckpoint, so every run only reads
+# rows added since the last one. Rows younger than STATS_ROLLUP_LAG_SECONDS are
+# left for the next run: an id handed out by a transaction that has not
+# committed yet must not be skipped once a higher id has moved the watermark.
+
+def _investment_rows():
+    return Investment.objects.all()
+
+
+def _interest_rows():
+    # An interest is counted once, on the day of its first click: only clicks the
+    # flusher has already deduped are read, and any repeat of an earlier click is skipped.
+    flushed = JobCheckpoint.objects.filter(name=INTEREST_FLUSH_CHECKPOINT).values_list('position', flat=True).first()
+    earlier = InterestClick.objects.filter(
+        funding_id=OuterRef('funding_id'), user_id=OuterRef('user_id'), id__lt=OuterRef('id')
+    )
+    return InterestClick.objects.filter(id__lte=flushed or 0).exclude(Exists(earlier))
+
+
+SOURCES = {
+    'investments': (_investment_rows, 'rollup_stats:investments', F('amount')),
+    'interests': (_interest_rows, 'rollup_stats:interests', Value(0)),
+}
+
+
+def _claim(rows_for, amount, checkpoint, horizon, batch_size):
+    rows = list(
+        rows_for().filter(id__gt=checkpoint.position).order_by('id')
+        .values_list('id', 'funding_id', 'funding__category', 'created_at', amount)[:batch_size]
+    )
+    # Stop at the first row inside the lag window; everything after it waits too.
+    for index, row in enumerate(rows):
+        if row[3] > horizon:
+            return rows[:index]
+    return rows
+
+
+def _merge(deltas, key_field):
+    if not deltas:
+        return
+    existing = {
+        (getattr(row, key_field), row.day): row
+        for row in DailyFundingStats.objects.select_for_update().filter(
+            funding__isnull=key_field == 'category',
+            **{f'{key_field}__in': {key for key, _ in deltas}, 'day__in': {day for _, day in deltas}},
+        )
+    }
+    created, updated = [], []
+    for (key, day), (category, pledges, amount, interests) in deltas.items():
+        row = existing.get((key, day))
+        if row is None:
+            row = DailyFundingStats(day=day, category=category)
+            setattr(row, key_field, key)
+            created.append(row)
+        else:
+            updated.append(row)
+        row.pledges += pledges
+        row.amount += amount
+        row.interests += interests
+    DailyFundingStats.objects.bulk_create(created)
+    DailyFundingStats.objects.bulk_update(updated, ['pledges', 'amount', 'interests'])
+
+
+def rollup_source(name, batch_size=10000, lag_seconds=None):
+    rows_for, checkpoint_name, amount = SOURCES[name]
+    lag = settings.STATS_ROLLUP_LAG_SECONDS if lag_seconds is None else lag_seconds
+    horizon = timezone.now() - timedelta(seconds=lag)
+    rolled_up = 0
+    while True:
+        with transaction.atomic():
+            # The locked checkpoint row serialises concurrent runs.
+            JobCheckpoint.objects.get_or_create(name=checkpoint_name)
+            checkpoint = JobCheckpoint.objects.select_for_update().get(name=checkpoint_name)
+            rows = _claim(rows_for, amount, checkpoint, horizon, batch_size)
+            if not rows:
+                return rolled_up
+
+            per_funding = defaultdict(lambda: [None, 0, 0, 0])
+            per_category = defaultdict(lambda: [None, 0, 0, 0])
+            for _, funding_id, category, created_at, value in rows:
+                day = timezone.localdate(created_at)
+                for totals in (per_funding[funding_id, day], per_category[category, day]):
+                    totals[0] = category
+                    if name == 'investments':
+                        totals[1] += 1
+                        totals[2] += value
+                    else:
+                        totals[3] += 1
+            _merge(per_funding, 'funding_id')
+            _merge(per_category, 'category')
+
+            checkpoint.position = rows[-1][0]
+            checkpoint.save(update_fields=['position', 'updated_at'])
+        rolled_up += len(rows)
+
+
+def reset_rollups():
+    with transaction.atomic():
+        DailyFundingStats.objects.all().delete()
+        JobCheckpoint.objects.filter(name__in=[name for _, name, _ in SOURCES.values()]).delete()
+
+# ============================================================================
+# Owner Dashboard
+# ============================================================================
+
+def funding_velocity(company, days=30):
+    # Reads only DailyFundingStats; the request never touches Investment.
+    end = timezone.localdate()
+    start = end - timedelta(days=days - 1)
+    stats = DailyFundingStats.objects.filter(funding__company=company, day__gte=start)
+
+    by_day = {
+        row['day']: row
+        for row in stats.values('day').annotate(
+            pledges=Sum('pledges'), amount=Sum('amount'), interests=Sum('interests')
+        )
+    }
+    series = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        row = by_day.get(day, {})
+        series.append({
+            'day': day,
+            'pledges': row.get('pledges') or 0,
+            'amount': row.get('amount') or 0,
+            'interests': row.get('interests') or 0,
+        })
+    peak = max(point['amount'] for point in series) or 1
+    for point in series:
+        point['height'] = round(point['amount'] * 100 / peak)
+
+    campaigns = list(
+        stats.values('funding_id', 'funding__campaign_name', 'funding__category')
+        .annotate(pledges=Sum('pledges'), amount=Sum('amount'), interests=Sum('interests'))
+        .order_by('-amount')
+    )
+    # Each campaign's share of the money pledged in its category over the same window.
+    category_totals = dict(
+        DailyFundingStats.objects.filter(
+            funding__isnull=True, category__in={row['funding__category'] for row in campaigns}, day__gte=start
+        ).values('category').annotate(total=Sum('amount')).values_list('category', 'total')
+    )
+    for row in campaigns:
+        total = category_totals.get(row['funding__category']) or 0
+        row['daily_amount'] = row['amount'] / days
+        row['category_share'] = row['amount'] * 100 / total if total else 0
+
+    return {
+        'days': days,
+        'series': series,
+        'campaigns': campaigns,
+        'total_pledges': sum(point['pledges'] for point in series),
+        'total_amount': sum(point['amount'] for point in series),
+        'total_interests': sum(point['interests'] for point in series),
+    }
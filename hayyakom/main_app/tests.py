@@ -1,3 +1,701 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from unittest import mock
+import httpx
+import stripe
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from .admin import FundingAdmin
+from .campaign_cache import campaign_stamp
+from .fake_stripe import sign_payload
+from .forms import InvestmentForm
+from .instrumentation import worst_views
+from .interest import DatabaseInterestBuffer, MemoryInterestBuffer
+from .management.commands.benchmark_views import QUERY_BUDGETS
+from .models import (
+    Company, DailyFundingStats, Funding, InterestClick, Investment, Notification, NotificationFanout, PaymentEvent,
+    JobCheckpoint, Profile, ProfileSample, RequestSample, Reservation,
+)
+from .notifications import drain_fanout, mark_read, notify, notify_many, unread_count
+from .pagination import encode_cursor, paginate_keyset
+from .payments import (
+    InvalidWebhook, acreate_checkout_session, checkout_params, hold_capacity, parse_webhook, start_checkout,
+)
+from .profiler import profiled_views, targets as profiler_targets
+from .pulse import current_sunday, get_pulse_snapshot, pulse_version
+from .retention import COLUMNS, archive_file_writer, prune_all_samples
+from .routers import PIN_COOKIE
+from .search import search_fundings, update_search_vectors
+from .settlement import CHECKPOINT_NAME, settle_expired
+from .stats import rollup_source
+from .views import FundingUpdate
 
-# Create your tests here.
+HTTPXClient = stripe.HTTPXClient
+
+
+class AsyncStripeClientTests(TestCase):
+    def test_consecutive_checkouts_on_separate_event_loops(self):
+        # Under WSGI every async_to_sync call runs on a fresh loop that is closed afterwards.
+        clients = []
+
+        def handler(request):
+            return httpx.Response(200, json={'id': f'cs_test_{len(clients)}', 'object': 'checkout.session'})
+
+        def async_client(**kwargs):
+            client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            clients.append(client)
+            return client
+
+        def http_client(timeout):
+            return HTTPXClient(timeout=timeout, _lib=SimpleNamespace(AsyncClient=async_client))
+
+        with override_settings(STRIPE_BACKEND='stripe'), mock.patch.object(stripe, 'HTTPXClient', http_client):
+            first = async_to_sync(acreate_checkout_session)({'mode': 'payment'})
+            second = async_to_sync(acreate_checkout_session)({'mode': 'payment'})
+
+        self.assertEqual((first.id, second.id), ('cs_test_1', 'cs_test_2'))
+        self.assertEqual(len(clients), 2)
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET='whsec_test')
+class WebhookSignatureTests(TestCase):
+    payload = '{"id": "evt_1", "type": "checkout.session.completed"}'
+
+    def test_fresh_signature_is_accepted(self):
+        self.assertEqual(parse_webhook(self.payload, sign_payload(self.payload, 'whsec_test'))['id'], 'evt_1')
+
+    def test_replayed_signature_is_rejected(self):
+        signature = sign_payload(self.payload, 'whsec_test', timestamp=int(time.time()) - 3600)
+        with self.assertRaises(InvalidWebhook):
+            parse_webhook(self.payload, signature)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], STRIPE_BACKEND='fake', STRIPE_WEBHOOK_SECRET='whsec_test')
+class WebhookReplayTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        events_path = override_settings(FAKE_STRIPE_EVENTS_PATH=os.path.join(directory, 'events.jsonl'))
+        events_path.enable()
+        self.addCleanup(events_path.disable)
+
+        owner = User.objects.create_user('owner')
+        company = Company.objects.create(owner=owner, company_name='Acme', cr_number='1')
+        self.funding = Funding.objects.create(
+            company=company, campaign_name='Solar', description='Panels', goal=1000,
+            end_date=date(2030, 1, 1), status='In Process', is_approved=True,
+        )
+        request = RequestFactory().post('/')
+        request.user = User.objects.create_user('investor')
+        self.session = start_checkout(request, self.funding, 300)
+
+    def replay(self):
+        out = StringIO()
+        call_command('replay_stripe_events', stdout=out)
+        return out.getvalue()
+
+    def test_replay_records_investment_once(self):
+        self.assertIn('-> recorded', self.replay())
+        self.assertIn('-> already recorded', self.replay())
+        self.assertEqual(PaymentEvent.objects.count(), 1)
+        investment = Investment.objects.get()
+        self.assertEqual((investment.amount, investment.checkout_session_id), (300, self.session.id))
+        self.funding.refresh_from_db()
+        self.assertEqual((self.funding.raised_amount, self.funding.reserved_amount), (300, 0))
+
+    def test_rejected_events_fail_the_replay(self):
+        with override_settings(STRIPE_WEBHOOK_SECRET='whsec_other'), \
+                mock.patch('main_app.management.commands.replay_stripe_events.sign_payload',
+                           lambda payload, secret: sign_payload(payload, 'whsec_test')):
+            with self.assertRaises(CommandError):
+                self.replay()
+        self.assertFalse(Investment.objects.exists())
+
+
+class FundingCounterTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user('owner')
+        company = Company.objects.create(owner=owner, company_name='Acme', cr_number='1')
+        self.funding = Funding.objects.create(
+            company=company, campaign_name='Solar', description='Panels', goal=5000,
+            end_date=date(2030, 1, 1), status='In Process', is_approved=True,
+        )
+        self.investors = [User.objects.create_user(f'investor{index}') for index in range(3)]
+
+    def test_record_investment_updates_counters(self):
+        for investor in self.investors:
+            self.funding.record_investment(investor, 1000)
+        self.assertEqual((self.funding.raised_amount, self.funding.investor_count), (3000, 3))
+        self.assertEqual(self.funding.progress_percentage(), 60)
+
+    def test_reconcile_repairs_drift(self):
+        for investor in self.investors[:2]:
+            self.funding.record_investment(investor, 1000)
+        Funding.objects.filter(pk=self.funding.pk).update(raised_amount=9999, investor_count=0)
+        out = StringIO()
+        call_command('reconcile_funding_totals', '--dry-run', stdout=out)
+        self.assertIn('Found 1', out.getvalue())
+        call_command('reconcile_funding_totals', stdout=StringIO())
+        self.funding.refresh_from_db()
+        self.assertEqual((self.funding.raised_amount, self.funding.investor_count), (2000, 2))
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class FundingEditCounterTests(TestCase):
+    # The edit paths load the campaign, then save it; investments recorded in between must survive.
+
+    def setUp(self):
+        self.owner = User.objects.create_user('owner', password='pw')
+        company = Company.objects.create(owner=self.owner, company_name='Acme', cr_number='1')
+        self.funding = Funding.objects.create(
+            company=company, campaign_name='Solar', description='Panels', goal=1000,
+            end_date=date(2030, 1, 1), status='In Process', is_approved=True,
+        )
+        self.investor = User.objects.create_user('investor')
+
+    def invest_after_loading(self):
+        stale = Funding.objects.get(pk=self.funding.pk)
+        self.funding.record_investment(self.investor, 100)
+        return stale
+
+    def assert_counters_kept(self):
+        self.funding.refresh_from_db()
+        self.assertEqual((self.funding.raised_amount, self.funding.investor_count), (100, 1))
+
+    def test_edits_keep_concurrent_reservation(self):
+        stale = Funding.objects.get(pk=self.funding.pk)
+        self.assertIsNotNone(self.funding.reserve_capacity(self.investor, 300, timedelta(minutes=15)))
+        self.client.force_login(self.owner)
+        with mock.patch.object(FundingUpdate, 'get_object', return_value=stale):
+            self.client.post(f'/fundings/{self.funding.pk}/update/', {'campaign_name': 'Solar II', 'description': 'Panels', 'category': 'Other'})
+        self.funding.refresh_from_db()
+        self.assertEqual(self.funding.reserved_amount, 300)
+        self.assertEqual(self.funding.remaining_capacity(), 700)
+
+    def test_owner_edit_keeps_concurrent_investment(self):
+        self.client.force_login(self.owner)
+        url = f'/fundings/{self.funding.pk}/update/'
+        self.assertEqual(self.client.get(url).status_code, 200)
+        stale = self.invest_after_loading()
+        with mock.patch.object(FundingUpdate, 'get_object', return_value=stale):
+            response = self.client.post(url, {'campaign_name': 'Solar II', 'description': 'Panels', 'category': 'Other'})
+        self.assertEqual(response.status_code, 302)
+        self.assert_counters_kept()
+        self.assertEqual(Funding.objects.get(pk=self.funding.pk).campaign_name, 'Solar II')
+
+    def test_admin_edit_keeps_concurrent_investment(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='pw'))
+        url = f'/admin/main_app/funding/{self.funding.pk}/change/'
+        form = self.client.get(url).context['adminform'].form
+        self.assertNotIn('raised_amount', form.fields)
+        self.assertNotIn('reserved_amount', form.fields)
+        data = {name: value for name, value in form.initial.items() if name in form.fields and value is not None}
+        data['interested_users'] = []
+        data['campaign_name'] = 'Solar II'
+        stale = self.invest_after_loading()
+        with mock.patch.object(FundingAdmin, 'get_object', return_value=stale):
+            response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 302)
+        self.assert_counters_kept()
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class ReservationTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user('owner')
+        company = Company.objects.create(owner=owner, company_name='Acme', cr_number='1')
+        self.funding = Funding.objects.create(
+            company=company, campaign_name='Solar', description='Panels', goal=5000,
+            end_date=date(2030, 1, 1), status='In Process', is_approved=True,
+        )
+        self.investor = User.objects.create_user('investor')
+        self.other = User.objects.create_user('other')
+
+    def test_capacity_cannot_be_held_twice(self):
+        self.assertIsNotNone(hold_capacity(self.investor, self.funding, 3000))
+        self.assertIsNone(hold_capacity(self.other, self.funding, 3000))
+        self.assertEqual(self.funding.remaining_capacity(), 2000)
+
+    def test_investor_can_retry_for_capacity_they_hold(self):
+        hold_capacity(self.investor, self.funding, 5000)
+        self.assertTrue(InvestmentForm({'amount': 5000}, funding=self.funding, investor=self.investor).is_valid())
+        self.assertFalse(InvestmentForm({'amount': 5000}, funding=self.funding, investor=self.other).is_valid())
+        self.assertIsNotNone(hold_capacity(self.investor, self.funding, 5000))
+        self.assertEqual(Reservation.objects.filter(status='Held').count(), 1)
+
+    def test_cancel_releases_the_hold(self):
+        reservation = hold_capacity(self.investor, self.funding, 3000)
+        url = f'/investment/cancel/?reservation={reservation.pk}'
+        self.client.force_login(self.other)
+        self.client.get(url)
+        self.assertEqual(Reservation.objects.get(pk=reservation.pk).status, 'Held')
+        self.client.force_login(self.investor)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(Reservation.objects.get(pk=reservation.pk).status, 'Released')
+        self.funding.refresh_from_db()
+        self.assertEqual(self.funding.reserved_amount, 0)
+
+    @override_settings(RESERVATION_TTL_MINUTES=30)
+    def test_checkout_expiry_leaves_stripe_its_minimum(self):
+        reservation = hold_capacity(self.investor, self.funding, 3000)
+        params = checkout_params(RequestFactory().get('/'), self.funding, 3000, reservation)
+        self.assertGreater(params['expires_at'] - time.time(), 30 * 60)
+
+
+class SettlementTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user('owner')
+        company = Company.objects.create(owner=owner, company_name='Acme', cr_number='1')
+        self.today = date(2030, 6, 1)
+        self.investor = User.objects.create_user('investor')
+        self.fundings = []
+        for index in range(5):
+            funding = Funding.objects.create(
+                company=company, campaign_name=f'Campaign {index}', description='Panels', goal=1000,
+                end_date=self.today - timedelta(days=1), status='In Process', is_approved=True,
+            )
+            # Even campaigns reach their goal, odd ones fall short.
+            funding.record_investment(self.investor, 1000 if index % 2 == 0 else 400)
+            self.fundings.append(funding)
+        self.running = Funding.objects.create(
+            company=company, campaign_name='Running', description='Panels', goal=1000,
+            end_date=self.today, status='In Process', is_approved=True,
+        )
+
+    def assert_settled(self):
+        statuses = dict(Funding.objects.values_list('campaign_name', 'status'))
+        self.assertEqual(statuses, {
+            'Campaign 0': 'Completed', 'Campaign 1': 'Failed', 'Campaign 2': 'Completed',
+            'Campaign 3': 'Failed', 'Campaign 4': 'Completed', 'Running': 'In Process',
+        })
+        investments = dict(Investment.objects.values_list('funding__campaign_name', 'status'))
+        self.assertEqual(investments['Campaign 0'], 'Collected')
+        self.assertEqual(investments['Campaign 1'], 'Returned')
+        self.assertEqual(Notification.objects.filter(user=self.investor).count(), 5)
+
+    def test_settles_in_chunks_and_resets_checkpoint(self):
+        self.assertEqual(settle_expired(self.today, chunk_size=2), (3, 2))
+        self.assert_settled()
+        self.assertEqual(JobCheckpoint.objects.get(name=CHECKPOINT_NAME).position, 0)
+        self.assertEqual(settle_expired(self.today, chunk_size=2), (0, 0))
+
+    def test_resumed_run_sweeps_rows_left_behind(self):
+        # A crashed worker advanced the checkpoint past campaigns it never committed.
+        JobCheckpoint.objects.create(name=CHECKPOINT_NAME, position=self.fundings[2].pk)
+        self.assertEqual(settle_expired(self.today, chunk_size=2), (3, 2))
+        self.assert_settled()
+
+    def test_command_settles_due_campaigns(self):
+        JobCheckpoint.objects.create(name=CHECKPOINT_NAME, position=self.running.pk)
+        with mock.patch('main_app.management.commands.update_campaign_statuses.timezone.now',
+                        return_value=timezone.make_aware(datetime.combine(self.today, datetime.min.time()))):
+            call_command('update_campaign_statuses', '--restart', '--chunk-size', '2', stdout=StringIO())
+        self.assert_settled()
+
+
+class InterestFlushTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user('owner')
+        company = Company.objects.create(owner=owner, company_name='Acme', cr_number='1')
+        self.funding = Funding.objects.create(
+            company=company, campaign_name='Solar', description='Panels', goal=1000,
+            end_date=date(2030, 1, 1), status='In Pulse', is_approved=True,
+        )
+        self.investor = User.objects.create_user('investor')
+
+    def test_flush_bumps_campaign_stamp(self):
+        before = campaign_stamp(self.funding.pk)['version']
+        buffer = DatabaseInterestBuffer()
+        buffer.push(self.funding.pk, self.investor.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(buffer.flush(lag_seconds=0), 1)
+        self.assertNotEqual(campaign_stamp(self.funding.pk)['version'], before)
+        self.assertEqual(Funding.objects.get(pk=self.funding.pk).interest_count, 1)
+
+    def test_flush_waits_out_lag_and_prunes_repeat_clicks(self):
+        buffer = DatabaseInterestBuffer()
+        for _ in range(3):
+            buffer.push(self.funding.pk, self.investor.pk)
+        self.assertEqual(buffer.flush(lag_seconds=60), 0)
+        self.assertEqual(InterestClick.objects.count(), 3)
+        self.assertEqual(buffer.flush(lag_seconds=0), 1)
+        self.assertEqual(InterestClick.objects.count(), 1)
+        buffer.push(self.funding.pk, self.investor.pk)
+        self.assertEqual(buffer.flush(lag_seconds=0), 0)
+        self.assertEqual(InterestClick.objects.count(), 1)
+
+    def test_rollup_counts_each_interest_once(self):
+        buffer = DatabaseInterestBuffer()
+        for _ in range(3):
+            buffer.push(self.funding.pk, self.investor.pk)
+        InterestClick.objects.bulk_create([InterestClick(funding=self.funding, user=self.investor)] * 2)
+        self.assertEqual(rollup_source('interests', lag_seconds=0), 0)
+        buffer.flush(lag_seconds=0)
+        buffer.push(self.funding.pk, self.investor.pk)
+        rollup_source('interests', lag_seconds=0)
+        stats = DailyFundingStats.objects.get(funding=self.funding)
+        self.assertEqual(stats.interests, 1)
+
+    def test_memory_buffer_keeps_clicks_when_flush_fails(self):
+        buffer = MemoryInterestBuffer()
+        buffer.clicks.append((self.funding.pk, self.investor.pk))
+        with mock.patch('main_app.interest.apply_interest', side_effect=RuntimeError('database down')):
+            with self.assertLogs('main_app.interest', 'ERROR'):
+                buffer.flush_quietly()
+        self.assertEqual(buffer.pending_for(self.investor.pk, {self.funding.pk}), {self.funding.pk})
+        self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(buffer.clicks, [])
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class PulseSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.sunday = current_sunday(date.today())
+        owner = User.objects.create_user('owner')
+        company = Company.objects.create(owner=owner, company_name='Acme', cr_number='1')
+        self.funding = Funding.objects.create(
+            company=company, campaign_name='Solar', description='Panels', goal=1000,
+            end_date=date(2030, 1, 1), status='In Pulse', is_approved=True, reveal_date=self.sunday,
+        )
+
+    def names(self):
+        return [row['campaign_name'] for row in get_pulse_snapshot(self.sunday)]
+
+    def test_editing_a_campaign_refreshes_the_snapshot(self):
+        self.assertEqual(self.names(), ['Solar'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.funding.campaign_name = 'Solar II'
+            self.funding.save(update_fields=['campaign_name'])
+        self.assertEqual(self.names(), ['Solar II'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.funding.delete()
+        self.assertEqual(self.names(), [])
+
+    def test_add_to_next_pulse_refreshes_the_snapshot(self):
+        self.assertEqual(self.names(), ['Solar'])
+        before = pulse_version()
+        self.client.force_login(User.objects.create_superuser('admin', password='pw'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/admin/main_app/funding/', {'action': 'add_to_next_pulse', '_selected_action': [self.funding.pk]})
+        self.assertNotEqual(pulse_version(), before)
+        self.assertEqual(Funding.objects.get(pk=self.funding.pk).status, 'Pending Pulse')
+        self.assertEqual(self.names(), [])
+
+
+@override_settings(
+    ALLOWED_HOSTS=['testserver'], SQL_INSTRUMENTATION_SAMPLE_RATE=0,
+    PROFILER_SAMPLE_RATE=0, PROFILER_TARGET_POLL_SECONDS=float('inf'),
+)
+class ViewQueryCountTests(TestCase):
+    # The counts do not grow with the number of rows; each stays within benchmark_views' budget.
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user('owner')
+        Profile.objects.create(user=owner, role='Owner')
+        company = Company.objects.create(owner=owner, company_name='Acme', cr_number='1')
+        sunday = current_sunday(date.today())
+        fundings = [
+            Funding.objects.create(
+                company=company, campaign_name=f'Campaign {index}', description='Panels', goal=100000,
+                end_date=date(2030, 1, 1), status='In Process', is_approved=True, category='Technology',
+            )
+            for index in range(5)
+        ] + [
+            Funding.objects.create(
+                company=company, campaign_name=f'Pulse {index}', description='Early', goal=100000,
+                end_date=date(2030, 1, 1), status='In Pulse', is_approved=True, reveal_date=sunday,
+            )
+            for index in range(3)
+        ]
+        cls.investor = User.objects.create_user('investor')
+        Profile.objects.create(user=cls.investor, role='Investor')
+        for index in range(8):
+            backer = cls.investor if index == 0 else User.objects.create_user(f'backer{index}')
+            for funding in fundings[:5]:
+                funding.record_investment(backer, 2000)
+        cls.funding = fundings[0]
+        call_command('rebuild_listings', stdout=StringIO())
+
+    def setUp(self):
+        cache.clear()
+        profiler_targets.load()
+
+    def assert_view_queries(self, name, url, count, user=None):
+        if user is not None:
+            self.client.force_login(user)
+        # The first request fills the caches the benchmark also warms up.
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertLessEqual(count, QUERY_BUDGETS[name])
+        with self.assertNumQueries(count):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_home(self):
+        self.assert_view_queries('home', '/', 1)
+        self.assert_view_queries('home_category', '/?category=Technology', 1)
+
+    def test_funding_detail_anonymous(self):
+        self.assert_view_queries('funding_detail_anonymous', f'/fundings/{self.funding.pk}/', 2)
+
+    def test_funding_list(self):
+        self.assert_view_queries('funding_list_investor', '/fundings/', 5, self.investor)
+
+    def test_weekly_pulse(self):
+        self.assert_view_queries('weekly_pulse_anonymous', '/pulse/', 0)
+        self.assert_view_queries('weekly_pulse_investor', '/pulse/', 5, self.investor)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], LIVE_MAX_SUBSCRIPTIONS=7)
+class LiveProgressTests(TestCase):
+    def test_pages_render_the_subscription_limit(self):
+        self.assertContains(self.client.get('/'), 'data-max-subscriptions="7"')
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class CampaignApiETagTests(TestCase):
+    setUp = InterestFlushTests.setUp
+
+    def test_flushed_interest_invalidates_detail_etag(self):
+        url = f'/api/v1/campaigns/{self.funding.pk}/?fields=id,interest_count'
+        first = self.client.get(url)
+        self.assertEqual(first.json()['interest_count'], 0)
+        buffer = DatabaseInterestBuffer()
+        buffer.push(self.funding.pk, self.investor.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            buffer.flush(lag_seconds=0)
+        second = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()['interest_count'], 1)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class ReplicaPinTests(TestCase):
+    def test_read_only_request_is_not_pinned(self):
+        # The pulse snapshot is read with read_primary on a cache miss.
+        cache.clear()
+        response = self.client.get('/pulse/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user('reader')
+        created_at = timezone.now()
+        # Pairs share a timestamp, so pages have to break ties on id.
+        Notification.objects.bulk_create([
+            Notification(user=self.reader, message=f'Update {index}', created_at=created_at - timedelta(minutes=index // 2))
+            for index in range(11)
+        ])
+        self.notifications = Notification.objects.filter(user=self.reader).order_by('-created_at', '-id')
+
+    def page(self, query=''):
+        return paginate_keyset(self.notifications, RequestFactory().get(f'/notifications/?{query}'), per_page=4)
+
+    def test_pages_forward_and_back(self):
+        expected = list(self.notifications.values_list('pk', flat=True))
+        pages = [self.page()]
+        while pages[-1].has_next:
+            pages.append(self.page(pages[-1].next_query))
+        self.assertEqual([n.pk for page in pages for n in page], expected)
+        self.assertEqual([len(page) for page in pages], [4, 4, 3])
+        self.assertFalse(pages[0].has_previous)
+
+        back = self.page(pages[-1].previous_query)
+        self.assertEqual([n.pk for n in back], [n.pk for n in pages[1]])
+        self.assertEqual([n.pk for n in self.page(back.previous_query)], [n.pk for n in pages[0]])
+
+    def test_bad_cursors_fall_back_to_the_first_page(self):
+        first = [n.pk for n in self.page()]
+        newest = self.notifications.first()
+        for values in (
+            ['yesterday', newest.pk],
+            [{'dt': 5}, newest.pk],
+            [{'dt': '2024-13-45T00:00:00'}, newest.pk],
+            [{'dt': newest.created_at.isoformat()}, 'abc'],
+            [{'dt': newest.created_at.isoformat()}, 10 ** 30],
+            [None, newest.pk],
+            [newest.pk],
+        ):
+            cursor = encode_cursor('next', values)
+            with self.subTest(values=values):
+                self.assertEqual([n.pk for n in self.page(f'cursor={cursor}')], first)
+        self.assertEqual([n.pk for n in self.page('cursor=%%%')], first)
+
+        self.client.force_login(self.reader)
+        response = self.client.get(f"/notifications/?cursor={encode_cursor('next', ['yesterday', 'abc'])}")
+        self.assertEqual(response.status_code, 200)
+
+
+class SearchPaginationTests(TestCase):
+    def test_pages_cover_tied_results_once(self):
+        owner = User.objects.create_user('owner')
+        company = Company.objects.create(owner=owner, company_name='Acme', cr_number='1')
+        # Identical text gives every campaign the same rank and similarity; only the pk breaks ties.
+        Funding.objects.bulk_create([
+            Funding(company=company, campaign_name='Solar farm', description='Solar panels', goal=1000,
+                    end_date=date(2030, 1, 1), status='In Process', is_approved=True)
+            for _ in range(23)
+        ])
+        Funding.objects.create(
+            company=company, campaign_name='Solar farm expansion', description='More solar panels', goal=1000,
+            end_date=date(2030, 1, 1), status='In Process', is_approved=True,
+        )
+        update_search_vectors(Funding.objects.all())
+
+        seen = []
+        query = 'q=solar'
+        for _ in range(10):
+            request = RequestFactory().get(f'/fundings/?{query}')
+            page = paginate_keyset(search_fundings(Funding.objects.all(), 'solar farm'), request, per_page=5)
+            seen.extend(funding.pk for funding in page)
+            if not page.has_next:
+                break
+            query = page.next_query
+        self.assertEqual(len(seen), 24)
+        self.assertCountEqual(seen, Funding.objects.values_list('pk', flat=True))
+
+
+class UnreadCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user('reader')
+
+    def notify(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return notify(self.reader, 'Hello')
+
+    def test_writes_invalidate_cached_count(self):
+        self.assertEqual(unread_count(self.reader.pk), 0)
+        first = self.notify()
+        self.notify()
+        with self.assertNumQueries(1):
+            self.assertEqual(unread_count(self.reader.pk), 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(unread_count(self.reader.pk), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            mark_read(self.reader.pk, [first])
+        self.assertEqual(unread_count(self.reader.pk), 1)
+
+    def test_write_during_recount_is_not_lost(self):
+        real_filter = Notification.objects.filter
+
+        def count_then_write(**kwargs):
+            # The count is taken, then a notification commits before it is cached.
+            count = real_filter(**kwargs).count()
+            self.notify()
+            return mock.Mock(count=lambda: count)
+
+        with mock.patch('main_app.notifications.read_primary', return_value=mock.Mock(filter=count_then_write)):
+            self.assertEqual(unread_count(self.reader.pk), 0)
+        self.assertEqual(unread_count(self.reader.pk), 1)
+
+
+class NotificationFanoutTests(TestCase):
+    def test_deferred_fanout_rebuilds_audience_when_draining(self):
+        owner = User.objects.create_user('owner')
+        company = Company.objects.create(owner=owner, company_name='Acme', cr_number='1')
+        funding = Funding.objects.create(
+            company=company, campaign_name='Solar', description='Panels', goal=1000,
+            end_date=date(2030, 1, 1), status='In Pulse', is_approved=True,
+        )
+        users = [User.objects.create_user(f'investor{index}') for index in range(5)]
+        funding.interested_users.add(*users[:4])
+        with override_settings(NOTIFICATION_DEFER_THRESHOLD=2, NOTIFICATION_BATCH_SIZE=3):
+            self.assertIsNone(notify_many('interested', 'Early access is open.', funding))
+            fanout = NotificationFanout.objects.get()
+            self.assertEqual((fanout.audience, fanout.related_funding_id), ('interested', funding.pk))
+            drain_fanout(fanout.pk)
+        self.assertCountEqual(Notification.objects.values_list('user_id', flat=True), [user.pk for user in users[:4]])
+
+
+class ArchiveFileWriterTests(TestCase):
+    def setUp(self):
+        Notification.objects.create(user=User.objects.create_user('reader'), message='Read me', is_read=True)
+        self.rows = list(Notification.objects.values_list(*COLUMNS))
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def archives(self):
+        return [name for name in os.listdir(self.directory) if name.endswith('.jsonl.gz')]
+
+    def test_rolled_back_chunk_leaves_no_archive(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            archive_file_writer(self.directory)(self.rows)
+            raise RuntimeError('delete failed')
+        self.assertEqual(self.archives(), [])
+
+    def test_committed_chunk_is_renamed_into_place(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            archive_file_writer(self.directory)(self.rows)
+        self.assertEqual(len(self.archives()), 1)
+
+
+class RequestSampleTests(TestCase):
+    def sample(self, view_name, db_time_ms, n_plus_one=(), days_old=0):
+        sample = RequestSample.objects.create(
+            view_name=view_name, method='GET', path='/', status_code=200, query_count=int(db_time_ms),
+            db_time_ms=db_time_ms, total_time_ms=db_time_ms * 2, n_plus_one=list(n_plus_one),
+        )
+        if days_old:
+            RequestSample.objects.filter(pk=sample.pk).update(created_at=sample.created_at - timedelta(days=days_old))
+
+    def test_worst_views_aggregates_in_the_database(self):
+        self.sample('home', 2)
+        self.sample('home', 4, n_plus_one=[{'sql': 'SELECT 1', 'count': 9}])
+        self.sample('funding_detail', 10)
+        self.sample('funding_detail', 500, days_old=30)
+        with self.assertNumQueries(1):
+            report = worst_views(days=7)
+        self.assertEqual([row['view_name'] for row in report], ['funding_detail', 'home'])
+        home = report[1]
+        self.assertEqual((home['samples'], home['avg_db_ms'], home['max_queries'], home['n_plus_one_samples']), (2, 3, 4, 1))
+
+    @override_settings(SQL_INSTRUMENTATION_RETENTION_DAYS=14)
+    def test_old_samples_are_pruned(self):
+        self.sample('home', 2)
+        self.sample('home', 2, days_old=20)
+        self.assertEqual(prune_all_samples(chunk_size=1)[RequestSample], 1)
+        self.assertEqual(RequestSample.objects.count(), 1)
+
+
+class ProfileSampleTests(TestCase):
+    def profile(self, view_name, duration_ms, stacks, days_old=0):
+        sample = ProfileSample.objects.create(
+            view_name=view_name, method='GET', path='/', status_code=200, trigger='header',
+            duration_ms=duration_ms, interval_ms=5, sample_count=sum(stacks.values()), stacks=stacks,
+        )
+        if days_old:
+            ProfileSample.objects.filter(pk=sample.pk).update(created_at=sample.created_at - timedelta(days=days_old))
+
+    def test_profiled_views_limits_stacks_read(self):
+        self.profile('home', 10, {'view;render': 3, 'view;query': 1})
+        self.profile('home', 30, {'view;render': 2})
+        self.profile('funding_detail', 5, {'view;query': 4})
+        self.profile('funding_detail', 900, {'view;old': 50}, days_old=30)
+        with self.assertNumQueries(3):
+            report = profiled_views(days=7, stack_profiles=1)
+        self.assertEqual([row['view_name'] for row in report], ['home', 'funding_detail'])
+        home = report[0]
+        self.assertEqual((home['profiles'], home['avg_ms'], home['samples']), (2, 20, 6))
+        self.assertEqual(home['hottest'], [{'frame': 'render', 'share': 100}])
+
+    @override_settings(PROFILER_RETENTION_DAYS=14)
+    def test_old_profiles_are_pruned(self):
+        self.profile('home', 10, {'view': 1})
+        self.profile('home', 10, {'view': 1}, days_old=20)
+        self.assertEqual(prune_all_samples()[ProfileSample], 1)
+        self.assertEqual(ProfileSample.objects.count(), 1)
@@ -1,11 +1,13 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     # --- General Site URLs ---
     path('', views.home, name='home'),
+    path('campaigns/more/', views.home_more, name='home_more'),
     path('profile/', views.profile, name='profile'),
     path('notifications/', views.NotificationList.as_view(), name='notification_list'),
+    path('notifications/more/', views.NotificationFragment.as_view(), name='notification_more'),
     # --- Funding Campaign URLs ---
     path('fundings/', views.FundingList.as_view(), name='funding_list'),
     path('fundings/create/', views.FundingCreate.as_view(), name='funding_create'),
@@ -20,6 +22,10 @@ urlpatterns = [
     path('fundings/<int:funding_id>/add_investment/', views.add_investment, name='add_investment'),
     path('investment/success/', views.investment_success, name='investment_success'),
     path('investment/cancel/', views.investment_cancel, name='investment_cancel'),
+    path('fundings/<int:funding_id>/investments/export/', views.export_campaign_investments, name='export_campaign_investments'),
+    path('investment/export/', views.export_portfolio, name='export_portfolio'),
+    path('fundings/progress/live/', views.funding_progress_stream, name='funding_progress_stream'),
+    path('payments/webhook/', views.stripe_webhook, name='stripe_webhook'),
     # --- Roadmap & Milestone URLs ---
     path('fundings/<int:funding_id>/manage_roadmap/', views.manage_roadmap, name='manage_roadmap'),
     path('milestones/<int:milestone_id>/complete/', views.mark_milestone_complete, name='mark_milestone_complete'),
@@ -28,4 +34,9 @@ urlpatterns = [
     path('pulse/<int:funding_id>/show_interest/', views.show_interest, name='show_interest'),
     # --- Auth URLs ---
     path('accounts/signup/', views.signup, name='signup'),
-]
\ No newline at end of file
+    # --- JSON API (v1) ---
+    path('api/v1/campaigns/', api.campaign_list, name='api_campaign_list'),
+    path('api/v1/campaigns/<int:pk>/', api.campaign_detail, name='api_campaign_detail'),
+    path('api/v1/pulse/', api.pulse, name='api_pulse'),
+    path('api/v1/me/investments/', api.portfolio, name='api_portfolio'),
+]
@@ -1,59 +1,89 @@
 # --- Imports ---
-import stripe
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.conf import settings
-from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import PermissionDenied
-from django.db.models import Q
-from django.http import Http404
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError, connection
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition, require_POST
 from django.views.generic import ListView, DetailView
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
-from .models import Funding, Company, Investment, Milestone, Profile, Notification
+from .exports import EXPORT_FORMATS, stream_investments
+from .campaign_cache import campaign_etag, campaign_last_modified, campaign_stamp, is_campaign_investor
+from .models import ActiveCampaignListing, Funding, Company, Investment, Milestone, Profile, Notification
+from .notifications import mark_read, notify, notify_many
+from .payments import InvalidWebhook, astart_checkout, cancel_checkout, parse_webhook, record_event
+from .pagination import KeysetPaginationMixin, apaginate_keyset, paginate_keyset
+from .interest import get_interest_buffer
+from .live import current_progress, get_broker, sse_event
+from .pulse import current_sunday, get_pulse_snapshot
+from .recommendations import recommended_for_investor, similar_campaigns
+from .routers import replica_reads
+from .search import search_fundings
+from .stats import funding_velocity
 from django.utils import timezone
-from datetime import timedelta
 from .forms import (
     CustomSignUpForm, InvestmentForm, UserUpdateForm, 
     ProfileUpdateForm, FundingFilterForm, MilestoneForm
 )
 
-# --- Global Configurations ---
-stripe.api_key = settings.STRIPE_SECRET_KEY
-BHD_TO_USD_RATE = 2.65265
-
 # ============================================================================
 # home page
 # ============================================================================
 
-def home(request):
-    fundings = Funding.objects.filter(status='In Process', is_approved=True)
+def active_fundings_page(request):
+    listings = ActiveCampaignListing.objects.all()
     
     query = request.GET.get('query')
     category = request.GET.get('category')
 
+    if category:
+        listings = listings.filter(category=category)
+
     if query:
-        fundings = fundings.filter(
-            Q(campaign_name__icontains=query) | Q(company__company_name__icontains=query)
-        ).distinct()
+        listings = search_fundings(listings, query, funding_path='funding__')
+    else:
+        listings = listings.order_by('-end_date', '-pk')
 
-    if category:
-        fundings = fundings.filter(category=category)
+    return apaginate_keyset(listings, request)
+
+# Async views render through sync_to_async: context processors and templates still use the sync ORM.
+arender = sync_to_async(render)
+
+async def aget_user(request):
+    # Resolve the user once and share it with the templates and context processors.
+    request.user = await request.auser()
+    return request.user
 
+@replica_reads
+async def home(request):
     form = FundingFilterForm(request.GET)
     context = {
-        'fundings': fundings.order_by('-end_date'),
+        'fundings': await active_fundings_page(request),
         'form': form
     }
-    return render(request, 'home.html', context)
+    return await arender(request, 'home.html', context)
+
+@replica_reads
+async def home_more(request):
+    page = await active_fundings_page(request)
+    response = await arender(request, 'partials/funding_cards.html', {'fundings': page})
+    response['X-Next-Query'] = page.next_query
+    return response
 
 
 # ============================================================================
 # Funding Campaign Views
 # ============================================================================
 
-class FundingList(LoginRequiredMixin, ListView):
+class FundingList(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Funding
     template_name = 'fundings/index.html'
 
@@ -61,25 +91,32 @@ class FundingList(LoginRequiredMixin, ListView):
         try:
             profile = self.request.user.profile
         except Profile.DoesNotExist:
-            return Funding.objects.filter(status='In Process', is_approved=True)
+            return Funding.objects.filter(status='In Process', is_approved=True).order_by('-end_date', '-id')
 
         if profile.role == 'Owner':
             try:
-                return Funding.objects.filter(company=self.request.user.company).order_by('-end_date')
+                return Funding.objects.filter(company=self.request.user.company).order_by('-end_date', '-id')
             except Company.DoesNotExist:
-                return Funding.objects.none()
+                return Funding.objects.none().order_by('-id')
         else:
-            return Funding.objects.none()
+            return Funding.objects.none().order_by('-id')
             
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         if self.request.user.is_authenticated and self.request.user.profile.role == 'Investor':
-            context['my_investments'] = Investment.objects.filter(investor=self.request.user).order_by('-id')
+            investments = Investment.objects.filter(investor=self.request.user).select_related('funding').order_by('-id')
+            context['my_investments'] = paginate_keyset(investments, self.request)
+            context['recommendations'] = recommended_for_investor(self.request.user)
         return context
 
+@method_decorator(condition(etag_func=campaign_etag, last_modified_func=campaign_last_modified), name='get')
 class FundingDetail(DetailView):
     model = Funding
     template_name = 'fundings/detail.html'
+    replica_reads = True
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('company__owner__profile')
 
     def get_object(self, queryset=None):
         obj = super().get_object(queryset=queryset)
@@ -89,11 +126,17 @@ class FundingDetail(DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        # Milestones and investments are lazy: they only run when their cached fragment is stale.
         is_investor = False
         if self.request.user.is_authenticated:
-            if self.object.investment_set.filter(investor=self.request.user).exists():
-                is_investor = True
+            is_investor = is_campaign_investor(self.object, self.request.user)
+            if self.request.user.pk == self.object.company.owner_id:
+                # The full list is a streaming export; the page only shows the latest pledges.
+                context['investments'] = self.object.investment_set.select_related('investor').order_by('-id')[:settings.FUNDING_DETAIL_INVESTOR_ROWS]
         context['is_investor'] = is_investor
+        context['campaign_version'] = campaign_stamp(self.object.pk)['version']
+        context['fragment_timeout'] = settings.FUNDING_FRAGMENT_CACHE_TIMEOUT
+        context['similar_campaigns'] = similar_campaigns(self.object.pk)
         return context
 
 class FundingCreate(LoginRequiredMixin, CreateView):
@@ -105,10 +148,10 @@ class FundingCreate(LoginRequiredMixin, CreateView):
     def form_valid(self, form):
         form.instance.company = self.request.user.company
         response = super().form_valid(form)
-        Notification.objects.create(
-            user=self.request.user,
-            message=f"Your new campaign '{self.object.campaign_name}' has been successfully submitted for admin review.",
-            related_funding=self.object
+        notify(
+            self.request.user,
+            f"Your new campaign '{self.object.campaign_name}' has been successfully submitted for admin review.",
+            self.object
         )
         return response
 
@@ -121,6 +164,12 @@ class FundingUpdate(LoginRequiredMixin, UpdateView):
     def get_queryset(self):
         queryset = super().get_queryset()
         return queryset.filter(company=self.request.user.company)
+
+    def form_valid(self, form):
+        # Only the edited columns; the counters move concurrently through F() updates.
+        self.object = form.save(commit=False)
+        self.object.save(update_fields=self.fields)
+        return redirect(self.get_success_url())
 # ============================================================================
 # Company Views
 # ============================================================================
@@ -129,6 +178,12 @@ class CompanyDetail(LoginRequiredMixin, DetailView):
     model = Company
     template_name = 'company/company_detail.html' 
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if self.request.user.pk == self.object.owner_id:
+            context['velocity'] = funding_velocity(self.object, days=settings.STATS_DASHBOARD_DAYS)
+        return context
+
 class CompanyCreate(LoginRequiredMixin, CreateView):
     model = Company
     fields = ['company_name', 'cr_number']
@@ -158,10 +213,9 @@ class CompanyDelete(LoginRequiredMixin, DeleteView):
     
     def post(self, request, *args, **kwargs):
         company = self.get_object()
-        for funding in company.funding_set.all():
-            if funding.total_invested() > 0:
-                messages.error(request, 'Cannot delete company with active investments in its campaigns.')
-                return redirect('company_detail', pk=company.pk)
+        if company.funding_set.filter(raised_amount__gt=0).exists():
+            messages.error(request, 'Cannot delete company with active investments in its campaigns.')
+            return redirect('company_detail', pk=company.pk)
         
         messages.success(request, f'Company "{company.company_name}" has been deleted.')
         return super().post(request, *args, **kwargs)
@@ -172,94 +226,132 @@ class CompanyDelete(LoginRequiredMixin, DeleteView):
 # ============================================================================
 
 @login_required
-def add_investment(request, funding_id):
-    funding = get_object_or_404(Funding, id=funding_id)
+async def add_investment(request, funding_id):
+    funding = await aget_object_or_404(Funding, id=funding_id)
+    user = await aget_user(request)
 
     if funding.status == 'Completed':
         messages.error(request, 'This funding campaign has already been completed and is no longer accepting investments.')
         return redirect('funding_detail', pk=funding_id)
 
-    if Investment.objects.filter(investor=request.user, funding=funding).exists():
+    if await Investment.objects.filter(investor=user, funding=funding).aexists():
         messages.error(request, 'You have already invested in this campaign.')
         return redirect('funding_detail', pk=funding_id)
 
-    form = InvestmentForm(request.POST or None, funding=funding)
+    form = InvestmentForm(request.POST or None, funding=funding, investor=user)
     if request.method == 'POST':
-        if form.is_valid():
+        if await sync_to_async(form.is_valid)():
             amount_in_bhd = form.cleaned_data.get('amount')
-            amount_in_usd = amount_in_bhd * BHD_TO_USD_RATE
-            amount_in_cents = int(amount_in_usd * 100)
-            
             try:
-                checkout_session = stripe.checkout.Session.create(
-                    line_items=[{
-                        'price_data': {
-                            'currency': 'usd',
-                            'product_data': {'name': f"Investment in: {funding.campaign_name}"},
-                            'unit_amount': amount_in_cents,
-                        },
-                        'quantity': 1,
-                    }],
-                    mode='payment',
-                    success_url=request.build_absolute_uri('/investment/success/') + f'?session_id={{CHECKOUT_SESSION_ID}}&funding_id={funding_id}&amount={amount_in_bhd}',
-                    cancel_url=request.build_absolute_uri('/investment/cancel/'),
-                )
+                checkout_session = await astart_checkout(request, user, funding, amount_in_bhd)
+                if checkout_session is None:
+                    messages.error(request, 'Other investors are completing checkout for the remaining amount. Please try a smaller amount or check back shortly.')
+                    return redirect(funding.get_absolute_url())
                 return redirect(checkout_session.url, code=303)
             except Exception as e:
                 messages.error(request, f"Something went wrong with the payment process: {e}")
                 return redirect(funding.get_absolute_url())
     
-    return render(request, 'investment/investment_form.html', {'form': form, 'funding': funding})
+    return await arender(request, 'investment/investment_form.html', {'form': form, 'funding': funding})
 
-def investment_success(request):
+@login_required
+async def investment_success(request):
+    # Investments are recorded by the Stripe webhook; this page only reads local state.
     session_id = request.GET.get('session_id')
-    funding_id = request.GET.get('funding_id')
-    amount_str = request.GET.get('amount')
-    
+    investment = None
+    if session_id:
+        investment = await Investment.objects.select_related('funding').filter(
+            checkout_session_id=session_id, investor=await aget_user(request)
+        ).afirst()
+    return await arender(request, 'investment/success.html', {'investment': investment})
+
+@csrf_exempt
+@require_POST
+def stripe_webhook(request):
     try:
-        session = stripe.checkout.Session.retrieve(session_id)
-        
-        if session.payment_status == 'paid':
-            if not Investment.objects.filter(investor=request.user, funding_id=funding_id).exists():
-                funding = get_object_or_404(Funding, id=funding_id)
-                current_total_invested = funding.total_invested()
-                new_investment_amount = int(amount_str)
-                new_investment = Investment.objects.create(
-                    investor=request.user,
-                    funding=funding,
-                    amount=new_investment_amount
-                )
-                owner = funding.company.owner
-                investor_name = request.user.first_name
-                Notification.objects.create(
-                    user=owner,
-                    message=f"{investor_name} invested {new_investment.amount} BD in your campaign '{funding.campaign_name}'.",
-                    related_funding=funding
-                )
-                Notification.objects.create(
-                    user=request.user,
-                    message=f"Thank you! Your investment of {new_investment.amount} BD in '{funding.campaign_name}' has been confirmed.",
-                    related_funding=funding
-                )
-                new_total = current_total_invested + new_investment_amount
-
-                if new_total >= funding.goal and funding.status != 'Completed':
-                    funding.status = 'Completed'
-                    funding.save()
-                else:
-                    messages.success(request, 'Your investment was successful!')
-            else:
-                messages.info(request, 'This investment has already been recorded.')
-        else:
-            messages.error(request, 'Payment was not successful. Please try again.')   
-    except Exception as e:
-        messages.error(request, f"An error occurred while verifying your payment: {e}")
-
-    return render(request, 'investment/success.html')
+        event = parse_webhook(request.body.decode(), request.headers.get('Stripe-Signature', ''))
+    except InvalidWebhook:
+        return HttpResponseBadRequest('Invalid Stripe signature.')
+    record_event(event)
+    return HttpResponse(status=200)
 
 def investment_cancel(request):
+    reservation_id = request.GET.get('reservation', '')
+    if request.user.is_authenticated and reservation_id.isdigit():
+        cancel_checkout(request.user, int(reservation_id))
     return render(request, 'investment/cancel.html')
 
+@login_required
+def export_campaign_investments(request, funding_id):
+    funding = get_object_or_404(Funding.objects.select_related('company'), id=funding_id)
+    if request.user.pk != funding.company.owner_id and not request.user.is_staff:
+        raise PermissionDenied
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest('Unsupported export format.')
+    investments = Investment.objects.filter(funding=funding)
+    return stream_investments(request, investments, f'campaign-{funding.pk}-investments', export_format)
+
+@login_required
+def export_portfolio(request):
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest('Unsupported export format.')
+    investments = Investment.objects.filter(investor=request.user)
+    return stream_investments(request, investments, 'my-investments', export_format)
+
+# ============================================================================
+# Live Funding Progress
+# ============================================================================
+
+def _progress_snapshot(funding_ids):
+    # Subscribed first, so nothing committed after this read is missed; the connection
+    # is released because the stream may stay open for hours.
+    try:
+        return current_progress(funding_ids)
+    finally:
+        connection.close()
+
+
+async def funding_progress_stream(request):
+    # Server-Sent Events: the current progress of each ?ids= campaign, then every
+    # committed change. Waiting streams hold no thread and no DB connection.
+    if not isinstance(request, ASGIRequest):
+        # A worker thread per open stream would starve WSGI; pages keep the rendered values.
+        return HttpResponse(status=204)
+    try:
+        funding_ids = {int(value) for value in request.GET.get('ids', '').split(',') if value}
+    except ValueError:
+        return HttpResponseBadRequest('ids must be campaign ids.')
+    if not funding_ids or len(funding_ids) > settings.LIVE_MAX_SUBSCRIPTIONS:
+        return HttpResponseBadRequest('Too many or no campaigns requested.')
+
+    subscription = get_broker().subscribe(funding_ids)
+    try:
+        snapshot = await sync_to_async(_progress_snapshot)(funding_ids)
+    except Exception:
+        get_broker().unsubscribe(subscription)
+        raise
+
+    async def events():
+        try:
+            yield 'retry: 5000\n\n'
+            for funding_id, progress in snapshot.items():
+                yield sse_event(funding_id, progress)
+            while True:
+                updates = await subscription.next_updates(settings.LIVE_HEARTBEAT_SECONDS)
+                if not updates:
+                    yield ': keep-alive\n\n'
+                for funding_id, progress in updates.items():
+                    yield sse_event(funding_id, progress)
+        finally:
+            get_broker().unsubscribe(subscription)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 # ============================================================================
 # User & Profile Views
 # ============================================================================
@@ -308,14 +400,25 @@ def profile(request):
 # Notification & Roadmap Views
 # ============================================================================
 
-class NotificationList(LoginRequiredMixin, ListView):
+class NotificationList(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Notification
     template_name = 'notifications/notification_list.html'
 
     def get_queryset(self):
-        queryset = super().get_queryset().filter(user=self.request.user).order_by('-created_at')
-        queryset.filter(is_read=False).update(is_read=True)
-        return queryset
+        return super().get_queryset().filter(user=self.request.user).select_related('related_funding').order_by('-created_at', '-id')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        mark_read(self.request.user.pk, context['page'].object_list)
+        return context
+
+class NotificationFragment(NotificationList):
+    template_name = 'partials/notification_items.html'
+
+    def render_to_response(self, context, **response_kwargs):
+        response = super().render_to_response(context, **response_kwargs)
+        response['X-Next-Query'] = context['page'].next_query
+        return response
 
 @login_required
 def manage_roadmap(request, funding_id):
@@ -339,45 +442,55 @@ def manage_roadmap(request, funding_id):
 
 @login_required
 def mark_milestone_complete(request, milestone_id):
-    milestone = get_object_or_404(Milestone, id=milestone_id)
-    if request.user != milestone.funding.company.owner:
+    milestone = get_object_or_404(Milestone.objects.select_related('funding__company'), id=milestone_id)
+    funding = milestone.funding
+    if request.user.pk != funding.company.owner_id:
         raise PermissionDenied
 
     if request.method == 'POST':
         milestone.is_complete = True
         milestone.save()
-        investments = milestone.funding.investment_set.all()
-        for investment in investments:
-            Notification.objects.create(
-                user=investment.investor,
-                message=f"A milestone has been completed for '{milestone.funding.campaign_name}': {milestone.title}",
-                related_funding=milestone.funding
-                )
+        notify_many(
+            'investors',
+            f"A milestone has been completed for '{funding.campaign_name}': {milestone.title}",
+            funding
+        )
         messages.success(request, f'Milestone "{milestone.title}" marked as complete!')
-    return redirect('manage_roadmap', funding_id=milestone.funding.id)
+    return redirect('manage_roadmap', funding_id=funding.id)
 # ============================================================================
 # Weekly pulse
 # ============================================================================
-def weekly_pulse(request):
+@replica_reads
+async def weekly_pulse(request):
 
     today = timezone.now().date()
-    days_since_sunday = (today.weekday() + 1) % 7
-    current_sunday = today - timedelta(days=days_since_sunday)
-    
-    pulse_campaigns = Funding.objects.filter(
-        status='In Pulse',
-        reveal_date=current_sunday
-    )
+    sunday = current_sunday(today)
+    pulse_campaigns = await sync_to_async(get_pulse_snapshot)(sunday)
+
+    interested_ids = set()
+    user = await aget_user(request)
+    if user.is_authenticated and pulse_campaigns:
+        campaign_ids = [campaign['id'] for campaign in pulse_campaigns]
+        interested_ids = {
+            campaign_id async for campaign_id in user.interested_campaigns.filter(
+                id__in=campaign_ids
+            ).values_list('id', flat=True)
+        }
+        interested_ids |= await sync_to_async(get_interest_buffer().pending_for)(user.pk, campaign_ids)
 
     context = {
         'pulse_campaigns': pulse_campaigns,
+        'interested_ids': interested_ids,
         'today': today,
-        'current_sunday': current_sunday,
+        'current_sunday': sunday,
     }
-    return render(request, 'pulse/weekly_pulse.html', context)
+    return await arender(request, 'pulse/weekly_pulse.html', context)
 @login_required
 def show_interest(request, funding_id):
     if request.method == 'POST':
-        funding = get_object_or_404(Funding, id=funding_id)
-        funding.interested_users.add(request.user)
+        # Buffered and acknowledged at once; `flush_interest` applies it to the campaign.
+        try:
+            get_interest_buffer().push(funding_id, request.user.pk)
+        except IntegrityError:
+            raise Http404("Campaign not found.")
     return redirect('weekly_pulse')
\ No newline at end of file